@@ -3936,6 +3936,10 @@ def save_to_database(case_id, all_fees_table):
     """
     Save the fee data to Azure SQL Database
 
+    The client and all fee types are resolved (and created if missing) with one MERGE each,
+    the fee rows are written with a single executemany, and everything is committed in one
+    transaction, so the number of round trips no longer grows with the number of fees.
+
     Args:
         case_id (str): The RDN case ID
         all_fees_table (list): List of fee entries to store
@@ -3951,70 +3955,93 @@ def save_to_database(case_id, all_fees_table):
         return False
 
     try:
+        # Run everything in a single transaction
+        conn.autocommit = False
         cursor = conn.cursor()
 
         # Get client ID from RDN_Client table based on client name in the fee data
         # If we don't have client name info, create a placeholder entry
-        client_name = config.get('current_case_info', {}).get('clientName', 'Unknown Client')
-
-        # Check if client exists, if not insert it
-        cursor.execute("SELECT id FROM dbo.RDN_Client WHERE client_name = ?", client_name)
+        client_name = (config.get('current_case_info') or {}).get('clientName', 'Unknown Client')
+
+        # Resolve or insert the client in one statement
+        cursor.execute("""
+            MERGE dbo.RDN_Client WITH (HOLDLOCK) AS target
+            USING (VALUES (?)) AS source (client_name)
+            ON target.client_name = source.client_name
+            WHEN MATCHED THEN
+                UPDATE SET target.client_name = source.client_name
+            WHEN NOT MATCHED THEN
+                INSERT (client_name) VALUES (source.client_name)
+            OUTPUT inserted.id;
+        """, client_name)
         client_row = cursor.fetchone()
+        client_id = client_row[0] if client_row else 1  # Default to 1 if still not found
 
-        if client_row:
-            client_id = client_row[0]
-        else:
-            cursor.execute("INSERT INTO dbo.RDN_Client (client_name) VALUES (?)", client_name)
-            conn.commit()
-            cursor.execute("SELECT id FROM dbo.RDN_Client WHERE client_name = ?", client_name)
-            client_row = cursor.fetchone()
-            client_id = client_row[0] if client_row else 1  # Default to 1 if still not found
-
-        # Track how many fees we insert
-        inserted_count = 0
-
-        # Insert each fee into the FeeDetails22 table
+        # Parse the fee rows and collect the distinct fee types they use. Names are compared
+        # casefolded, as the database collation is case-insensitive: two spellings in one MERGE
+        # would hit the same row twice
+        fee_rows = []
+        fee_types = {}
         for fee in all_fees_table:
-            try:
-                fee_type = fee.get('category', 'Unknown')
-
-                # Check if fee type exists, if not insert it
-                cursor.execute("SELECT id FROM dbo.FeeType WHERE fee_type_name = ?", fee_type)
-                fee_type_row = cursor.fetchone()
-
-                if fee_type_row:
-                    fee_type_id = fee_type_row[0]
-                else:
-                    cursor.execute("INSERT INTO dbo.FeeType (fee_type_name, fee_type_code) VALUES (?, ?)",
-                                  fee_type, fee_type[:10] if len(fee_type) > 10 else fee_type)
-                    conn.commit()
-                    cursor.execute("SELECT id FROM dbo.FeeType WHERE fee_type_name = ?", fee_type)
-                    fee_type_row = cursor.fetchone()
-                    fee_type_id = fee_type_row[0] if fee_type_row else 1  # Default to 1 if still not found
-
-                # Extract amount without $ sign
-                amount_str = fee.get('amount', '$0.00').replace('$', '').replace(',', '')
-                try:
-                    amount = float(amount_str)
-                except ValueError:
-                    amount = 0.0
-
-                # Insert the fee details
-                cursor.execute("""
-                    INSERT INTO dbo.FeeDetails2 (client_id, ft_id, amount)
-                    VALUES (?, ?, ?)
-                """, client_id, fee_type_id, amount)
+            fee_type = str(fee.get('category') or 'Unknown').strip() or 'Unknown'
+            fee_type_key = fee_type.casefold()
 
-                inserted_count += 1
-            except Exception as e:
-                log(f"Error inserting fee record: {str(e)}", "error")
+            # Extract amount without $ sign
+            amount_str = str(fee.get('amount', '$0.00')).replace('$', '').replace(',', '')
+            try:
+                amount = float(amount_str)
+            except ValueError:
+                amount = 0.0
+
+            fee_rows.append((fee_type_key, amount))
+            fee_types.setdefault(fee_type_key, fee_type)
+
+        # Resolve or insert all fee types with one MERGE per batch of 1000
+        # (SQL Server allows at most 2100 parameters per statement)
+        fee_type_ids = {}
+        fee_type_names = list(fee_types.values())
+        for start in range(0, len(fee_type_names), 1000):
+            batch = fee_type_names[start:start + 1000]
+            values_sql = ", ".join(["(?, ?)"] * len(batch))
+            params = []
+            for fee_type in batch:
+                params.extend([fee_type, fee_type[:10] if len(fee_type) > 10 else fee_type])
+
+            cursor.execute(f"""
+                MERGE dbo.FeeType WITH (HOLDLOCK) AS target
+                USING (VALUES {values_sql}) AS source (fee_type_name, fee_type_code)
+                ON target.fee_type_name = source.fee_type_name
+                WHEN MATCHED THEN
+                    UPDATE SET target.fee_type_name = source.fee_type_name
+                WHEN NOT MATCHED THEN
+                    INSERT (fee_type_name, fee_type_code) VALUES (source.fee_type_name, source.fee_type_code)
+                OUTPUT inserted.id, inserted.fee_type_name;
+            """, params)
+            for fee_type_id, fee_type_name in cursor.fetchall():
+                fee_type_ids.setdefault(fee_type_name.strip().casefold(), fee_type_id)
+
+        # Insert all fee details in one batch
+        rows = [
+            (client_id, fee_type_ids.get(fee_type_key, 1), amount)  # Default to 1 if still not found
+            for fee_type_key, amount in fee_rows
+        ]
+        if rows:
+            cursor.fast_executemany = True
+            cursor.executemany("""
+                INSERT INTO dbo.FeeDetails2 (client_id, ft_id, amount)
+                VALUES (?, ?, ?)
+            """, rows)
 
         conn.commit()
-        log(f"Successfully saved {inserted_count} fee records to database")
+        log(f"Successfully saved {len(rows)} fee records to database")
         return True
 
     except Exception as e:
         log(f"Database error: {str(e)}", "error")
+        try:
+            conn.rollback()
+        except Exception as rollback_error:
+            log(f"Error rolling back fee save: {str(rollback_error)}", "error")
         return False
 
     finally:
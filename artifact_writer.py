@@ -0,0 +1,121 @@
+"""
+Artifact Writer - Moves debug artifact writes off the scraping event loop onto a writer thread
+
+Writes are queued on a bounded queue. When the queue is full a write is dropped and counted
+at once, so a slow disk never stalls the event loop the extraction runs on. Callers off the
+event loop can set put_timeout_seconds to wait that long for room before dropping. Pending
+writes are flushed at interpreter exit.
+"""
+
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+
+
+class ArtifactWriter:
+    """Bounded queue of artifact writes served by a single background thread"""
+
+    def __init__(self, max_pending=256, put_timeout_seconds=0):
+        self.max_pending = max_pending
+        self.put_timeout_seconds = put_timeout_seconds
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="artifact-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, description, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) to run on the writer thread; returns False if it was dropped"""
+        if self._closed:
+            fn(*args, **kwargs)
+            return True
+        try:
+            if self.put_timeout_seconds > 0:
+                self._queue.put((description, fn, args, kwargs), timeout=self.put_timeout_seconds)
+            else:
+                self._queue.put_nowait((description, fn, args, kwargs))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped == 1 or dropped % 100 == 0:
+                logging.warning(f"Artifact queue full, dropped {description} ({dropped} dropped so far)")
+            return False
+
+    def write_file(self, path, data):
+        """Queue writing bytes or text to path"""
+        mode = 'wb' if isinstance(data, bytes) else 'w'
+        return self.submit(path, self._write_file, path, data, mode)
+
+    def write_json(self, path, obj, indent=2):
+        """Queue serializing obj to a JSON file; pass a copy if the caller keeps mutating it"""
+        return self.submit(path, self._write_json, path, obj, indent)
+
+    @staticmethod
+    def _write_file(path, data, mode):
+        with open(path, mode, **({} if mode == 'wb' else {'encoding': 'utf-8'})) as f:
+            f.write(data)
+
+    @staticmethod
+    def _write_json(path, obj, indent):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, indent=indent)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                description, fn, args, kwargs = item
+                try:
+                    fn(*args, **kwargs)
+                    with self._lock:
+                        self.written += 1
+                except Exception as e:
+                    with self._lock:
+                        self.failed += 1
+                    logging.error(f"Error writing artifact {description}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout=10):
+        """Wait up to timeout seconds for queued writes to finish; returns whether the queue drained"""
+        deadline = time.time() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=10):
+        """Flush pending writes and stop the writer thread; later writes run inline"""
+        if self._closed:
+            return
+        drained = self.flush(timeout)
+        self._closed = True
+        if drained:
+            self._queue.put(None)
+        else:
+            logging.warning(f"Artifact writer closed with {self._queue.qsize()} writes still pending")
+
+    def status(self):
+        """Return queue depth and write counts as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                "pending": self._queue.qsize(),
+                "maxPending": self.max_pending,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed
+            }
@@ -0,0 +1,145 @@
+"""
+Browser Tracing - Playwright traces of extraction runs, kept only for slow or failed runs
+
+Tracing is started on each run's browser context. When the run ends, the trace is written to
+disk only if the run failed or took longer than slow_seconds, and discarded otherwise. Only
+the newest keep trace files are kept, so the directory acts as a ring buffer of outliers.
+Saved traces open with `playwright show-trace <file>` or at trace.playwright.dev.
+
+Settings come from the playwright_tracing config section; JAMI_PLAYWRIGHT_TRACE (on/off) and
+JAMI_PLAYWRIGHT_TRACE_SLOW_SECONDS override it.
+"""
+
+import os
+import time
+import logging
+import threading
+
+
+class BrowserTrace:
+    """A trace being recorded on one browser context"""
+
+    def __init__(self, context, name):
+        self.context = context
+        self.name = name
+        self.started = time.monotonic()
+        self.stopped = False
+
+
+class BrowserTracer:
+    """Starts Playwright tracing per run and decides at the end whether the trace is kept"""
+
+    def __init__(self, enabled=True, directory=os.path.join('debug', 'traces'), slow_seconds=90, keep=20,
+                 screenshots=True, snapshots=True, sources=False):
+        self.enabled = enabled
+        self.directory = directory
+        self.slow_seconds = slow_seconds
+        self.keep = max(1, int(keep))
+        self.screenshots = screenshots
+        self.snapshots = snapshots
+        self.sources = sources
+        self.started = 0
+        self.saved = 0
+        self.discarded = 0
+        self.last_saved = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Build the tracer from the playwright_tracing config section and JAMI_PLAYWRIGHT_TRACE* variables"""
+        enabled = config.get('enabled', True)
+        if 'JAMI_PLAYWRIGHT_TRACE' in os.environ:
+            enabled = os.environ['JAMI_PLAYWRIGHT_TRACE'].lower() in ('1', 'true', 'on', 'yes')
+        return cls(
+            enabled=enabled,
+            directory=config.get('directory', os.path.join('debug', 'traces')),
+            slow_seconds=float(os.environ.get('JAMI_PLAYWRIGHT_TRACE_SLOW_SECONDS', config.get('slow_seconds', 90))),
+            keep=config.get('keep', 20),
+            screenshots=config.get('screenshots', True),
+            snapshots=config.get('snapshots', True),
+            sources=config.get('sources', False)
+        )
+
+    async def start(self, context, name):
+        """Start tracing the context; returns the BrowserTrace, or None if tracing is off or failed to start"""
+        if not self.enabled:
+            return None
+        try:
+            await context.tracing.start(screenshots=self.screenshots, snapshots=self.snapshots, sources=self.sources)
+        except Exception as e:
+            logging.warning(f"Could not start Playwright tracing: {str(e)}")
+            return None
+        with self._lock:
+            self.started += 1
+        return BrowserTrace(context, name)
+
+    async def finish(self, trace, failed=False):
+        """
+        Stop tracing, saving the trace if the run failed or was slow
+
+        Returns:
+            str: Path of the saved trace, or None if it was discarded
+        """
+        if trace is None or trace.stopped:
+            return None
+        trace.stopped = True
+        elapsed = time.monotonic() - trace.started
+        path = None
+        try:
+            if failed or elapsed >= self.slow_seconds:
+                os.makedirs(self.directory, exist_ok=True)
+                stamp = time.strftime('%Y%m%d_%H%M%S')
+                path = os.path.join(self.directory, f"{trace.name}_{stamp}_{'failed' if failed else 'slow'}.zip")
+                await trace.context.tracing.stop(path=path)
+            else:
+                await trace.context.tracing.stop()
+        except Exception as e:
+            logging.warning(f"Could not stop Playwright tracing: {str(e)}")
+            return None
+
+        with self._lock:
+            if path:
+                self.saved += 1
+                self.last_saved = path
+            else:
+                self.discarded += 1
+        if path:
+            logging.info(f"Saved Playwright trace of {'failed' if failed else 'slow'} run ({elapsed:.1f}s) to {path}")
+            self._prune()
+        return path
+
+    def traces(self):
+        """Saved trace files, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.zip'):
+                    stat = entry.stat()
+                    files.append({"name": entry.name, "size": stat.st_size, "mtime": stat.st_mtime})
+        files.sort(key=lambda item: item["mtime"], reverse=True)
+        return files
+
+    def _prune(self):
+        """Delete all but the newest keep traces"""
+        for item in self.traces()[self.keep:]:
+            try:
+                os.remove(os.path.join(self.directory, item["name"]))
+            except OSError as e:
+                logging.warning(f"Could not remove old trace {item['name']}: {str(e)}")
+
+    def status(self):
+        """Return the tracer settings and counts as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "directory": self.directory,
+                "slowSeconds": self.slow_seconds,
+                "keep": self.keep,
+                "started": self.started,
+                "saved": self.saved,
+                "discarded": self.discarded,
+                "lastSaved": self.last_saved,
+                "files": [item["name"] for item in self.traces()]
+            }
@@ -0,0 +1,157 @@
+"""
+Circuit Breaker - Fails fast when a remote dependency such as the Azure SQL database is unreachable
+"""
+
+import logging
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Tracks consecutive failures of a dependency and short-circuits calls while it is down.
+
+    The breaker trips (opens) after `failure_threshold` consecutive failures. While open,
+    every call is rejected immediately. If a `probe` function is given, a background thread
+    calls it every `probe_interval` seconds and closes the breaker once it succeeds. Without
+    a probe, the breaker lets a single trial call through after `reset_timeout` seconds.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=30, probe=None, probe_interval=30):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+        self.probe_interval = probe_interval
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._last_error = None
+        self._last_failure_at = None
+        self._last_success_at = None
+        self._rejected_calls = 0
+        self._trip_count = 0
+        self._probe_thread = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow_request(self):
+        """Return True if a call to the dependency should be attempted"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.OPEN and self.probe is None:
+                # No background probe - let one trial call through once the timeout has passed
+                if time.time() - self._opened_at >= self.reset_timeout:
+                    self._state = self.HALF_OPEN
+                    logging.info(f"Circuit '{self.name}' half-open, allowing a trial call")
+                    return True
+
+            self._rejected_calls += 1
+            return False
+
+    def record_success(self):
+        """Record a successful call and close the circuit"""
+        with self._lock:
+            if self._state != self.CLOSED:
+                logging.info(f"Circuit '{self.name}' closed again after successful call")
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._last_success_at = time.time()
+
+    def record_failure(self, error=None):
+        """Record a failed call, tripping the circuit once the threshold is reached"""
+        with self._lock:
+            self._consecutive_failures += 1
+            self._last_failure_at = time.time()
+            if error is not None:
+                self._last_error = str(error)
+
+            should_trip = (self._state == self.HALF_OPEN or
+                           (self._state == self.CLOSED and self._consecutive_failures >= self.failure_threshold))
+            if not should_trip:
+                return
+
+            self._state = self.OPEN
+            self._opened_at = time.time()
+            self._trip_count += 1
+            logging.warning(f"Circuit '{self.name}' opened after {self._consecutive_failures} consecutive failures: {self._last_error}")
+
+        self._start_probe()
+
+    def call(self, func, *args, **kwargs):
+        """Call func through the breaker, raising CircuitOpenError while the circuit is open"""
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def status(self):
+        """Return the breaker state as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self._state,
+                "consecutiveFailures": self._consecutive_failures,
+                "failureThreshold": self.failure_threshold,
+                "openedAt": self._format_time(self._opened_at),
+                "lastFailureAt": self._format_time(self._last_failure_at),
+                "lastSuccessAt": self._format_time(self._last_success_at),
+                "lastError": self._last_error,
+                "rejectedCalls": self._rejected_calls,
+                "tripCount": self._trip_count
+            }
+
+    def _start_probe(self):
+        """Start the background probe thread if a probe is configured and none is running"""
+        if self.probe is None:
+            return
+        with self._lock:
+            if self._probe_thread is not None and self._probe_thread.is_alive():
+                return
+            self._probe_thread = threading.Thread(
+                target=self._probe_loop,
+                name=f"circuit-probe-{self.name}",
+                daemon=True
+            )
+            self._probe_thread.start()
+
+    def _probe_loop(self):
+        """Probe the dependency until it responds, then close the circuit"""
+        while self.state == self.OPEN:
+            time.sleep(self.probe_interval)
+            try:
+                self.probe()
+            except Exception as e:
+                with self._lock:
+                    self._last_error = str(e)
+                    self._last_failure_at = time.time()
+                logging.info(f"Circuit '{self.name}' probe failed: {str(e)}")
+                continue
+            self.record_success()
+
+    @staticmethod
+    def _format_time(timestamp):
+        if timestamp is None:
+            return None
+        return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(timestamp))
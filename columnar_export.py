@@ -0,0 +1,303 @@
+"""
+Columnar Export - Writes case, fee and update data as CSV or Parquet for bulk ingestion
+
+Amounts are typed as floats and update dates are normalized to timestamps. Batches are
+processed a chunk of cases at a time and appended to the output files, optionally
+partitioned into client=<name>/dt=<YYYY-MM-DD> directories.
+
+Usage:
+    python columnar_export.py --format parquet --out exports/columnar --partition-by client,date --all
+"""
+
+import os
+import io
+import re
+import sys
+import logging
+import argparse
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from result_store import ResultStore
+
+TABLES = ("cases", "fees", "updates")
+FORMATS = ("csv", "parquet")
+PARTITION_KEYS = ("client", "date")
+
+# Directory names for partition keys; kept distinct from column names so readers that
+# infer Hive partitions don't clash with the updates table's own date column
+PARTITION_DIRS = {"client": "client", "date": "dt"}
+
+# Column types per table: string, float, int or timestamp
+COLUMNS = {
+    "cases": {
+        "case_id": "string",
+        "client_name": "string",
+        "lien_holder": "string",
+        "order_to": "string",
+        "fee_id": "string",
+        "fee_type": "string",
+        "db_amount": "float",
+        "total_fees": "float",
+        "update_count": "int",
+        "extracted_at": "timestamp"
+    },
+    "fees": {
+        "case_id": "string",
+        "client_name": "string",
+        "description": "string",
+        "category": "string",
+        "amount": "float",
+        "amount_str": "string",
+        "status": "string",
+        "source": "string",
+        "confidence": "float"
+    },
+    "updates": {
+        "case_id": "string",
+        "client_name": "string",
+        "date": "timestamp",
+        "details": "string",
+        "fee_type": "string",
+        "amount": "float",
+        "amount_str": "string",
+        "status": "string",
+        "confidence": "float"
+    }
+}
+
+
+def require_dependencies(fmt):
+    """Raise a RuntimeError naming the missing package if the format can't be written"""
+    if pd is None:
+        raise RuntimeError("pandas is required for CSV/Parquet export (pip install pandas)")
+    if fmt == "parquet" and pa is None:
+        raise RuntimeError("pyarrow is required for Parquet export (pip install pyarrow)")
+
+
+def arrow_schema(table):
+    types = {"string": pa.string(), "float": pa.float64(), "int": pa.int64(), "timestamp": pa.timestamp('ns')}
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS[table].items()])
+
+
+def case_rows(case_id, case_data, meta, updates):
+    """Flatten one stored case result into row dicts for each table"""
+    db_data = (meta or {}).get('db_data') or {}
+    client_name = case_data.get('clientName')
+    fees = case_data.get('fees', [])
+    extracted_at = (meta or {}).get('extractedAt')
+
+    return {
+        "cases": [{
+            "case_id": case_id,
+            "client_name": client_name,
+            "lien_holder": case_data.get('lienHolder'),
+            "order_to": case_data.get('orderTo'),
+            "fee_id": db_data.get('fdId'),
+            "fee_type": db_data.get('feeTypeName'),
+            "db_amount": db_data.get('amount'),
+            "total_fees": sum(fee.get('amount', 0) for fee in fees),
+            "update_count": len(updates),
+            "extracted_at": pd.Timestamp(extracted_at, unit='s') if extracted_at else None
+        }],
+        "fees": [{
+            "case_id": case_id,
+            "client_name": client_name,
+            "description": fee.get('description'),
+            "category": fee.get('category'),
+            "amount": fee.get('amount'),
+            "amount_str": fee.get('amountStr'),
+            "status": fee.get('status'),
+            "source": fee.get('source'),
+            "confidence": fee.get('confidence')
+        } for fee in fees],
+        "updates": [{
+            "case_id": case_id,
+            "client_name": client_name,
+            "date": update.get('date'),
+            "details": update.get('details'),
+            "fee_type": update.get('feeType'),
+            "amount": update.get('amount'),
+            "amount_str": update.get('amountStr'),
+            "status": update.get('status'),
+            "confidence": update.get('feeTypeConfidence')
+        } for update in updates],
+        "extracted_at": extracted_at
+    }
+
+
+def to_frame(table, rows):
+    """Build a DataFrame with the table's column types; unparseable amounts and dates become null"""
+    df = pd.DataFrame(rows, columns=list(COLUMNS[table]))
+    for name, kind in COLUMNS[table].items():
+        if kind == "float":
+            df[name] = pd.to_numeric(df[name], errors='coerce').astype('float64')
+        elif kind == "int":
+            df[name] = pd.to_numeric(df[name], errors='coerce').astype('int64')
+        elif kind == "timestamp":
+            df[name] = pd.to_datetime(df[name], errors='coerce', format='mixed')
+        else:
+            df[name] = df[name].astype('string')
+    return df
+
+
+def partition_slug(value):
+    # Missing client names come through the string dtype as pd.NA, which has no truth value
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', '' if pd.isna(value) else str(value)).strip('_')
+    return slug or 'unknown'
+
+
+def render_table(case_id, case_data, meta, updates, table, fmt):
+    """Render a single table of one case to CSV or Parquet bytes"""
+    require_dependencies(fmt)
+    df = to_frame(table, case_rows(case_id, case_data, meta, updates)[table])
+    if fmt == "csv":
+        return df.to_csv(index=False, date_format='%Y-%m-%dT%H:%M:%S').encode('utf-8')
+    output = io.BytesIO()
+    pq.write_table(pa.Table.from_pandas(df, schema=arrow_schema(table), preserve_index=False), output)
+    return output.getvalue()
+
+
+class ColumnarWriter:
+    """Appends DataFrame chunks to per-table (and optionally per-partition) CSV or Parquet files"""
+
+    def __init__(self, out_dir, fmt="csv", partition_by=()):
+        require_dependencies(fmt)
+        unknown = set(partition_by) - set(PARTITION_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown partition keys: {', '.join(sorted(unknown))}")
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.partition_by = tuple(partition_by)
+        self.files = []
+        self._parquet_writers = {}
+
+    def _path(self, table, partition):
+        parts = [self.out_dir, table] + [f"{PARTITION_DIRS[key]}={value}" for key, value in zip(self.partition_by, partition)]
+        directory = os.path.join(*parts)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"part-0000.{self.fmt}")
+
+    def write(self, table, df, fallback_date=None):
+        """Append a chunk; updates partition on their own date, other tables on the extraction date"""
+        if df.empty:
+            return
+        if not self.partition_by:
+            self._append(table, (), df)
+            return
+
+        keys = []
+        if "client" in self.partition_by:
+            keys.append(df["client_name"].map(partition_slug))
+        if "date" in self.partition_by:
+            dates = df["date"] if table == "updates" else fallback_date
+            keys.append(dates.dt.strftime('%Y-%m-%d').fillna('unknown'))
+        for partition, group in df.groupby(keys, dropna=False):
+            if not isinstance(partition, tuple):
+                partition = (partition,)
+            self._append(table, partition, group)
+
+    def _append(self, table, partition, df):
+        path = self._path(table, partition)
+        if self.fmt == "csv":
+            new_file = path not in self.files
+            df.to_csv(path, mode='w' if new_file else 'a', header=new_file, index=False, date_format='%Y-%m-%dT%H:%M:%S')
+        else:
+            writer = self._parquet_writers.get(path)
+            if writer is None:
+                writer = pq.ParquetWriter(path, arrow_schema(table))
+                self._parquet_writers[path] = writer
+            writer.write_table(pa.Table.from_pandas(df, schema=arrow_schema(table), preserve_index=False))
+        if path not in self.files:
+            self.files.append(path)
+
+    def close(self):
+        for writer in self._parquet_writers.values():
+            writer.close()
+        self._parquet_writers = {}
+        return self.files
+
+
+def export_cases(store, case_ids, out_dir, fmt="csv", partition_by=(), tables=TABLES, chunk_size=50, on_chunk=None):
+    """
+    Export stored case results a chunk of cases at a time
+
+    Args:
+        store (ResultStore): Where the extracted case results are stored
+        case_ids (list): Cases to export
+        on_chunk (callable): Called with (cases_done, total) after each chunk is written
+
+    Returns:
+        dict: The files written, the number of cases exported and the case IDs with no stored result
+    """
+    writer = ColumnarWriter(out_dir, fmt, partition_by)
+    exported = 0
+    missing = []
+    try:
+        for start in range(0, len(case_ids), chunk_size):
+            chunk_rows = {table: [] for table in tables}
+            extraction_dates = {table: [] for table in tables}
+            for case_id in case_ids[start:start + chunk_size]:
+                case_data = store.get(case_id, 'case_data')
+                if case_data is None:
+                    missing.append(case_id)
+                    continue
+                rows = case_rows(case_id, case_data, store.get(case_id, 'meta'), store.get(case_id, 'updates', []))
+                for table in tables:
+                    chunk_rows[table].extend(rows[table])
+                    extraction_dates[table].extend([rows["extracted_at"]] * len(rows[table]))
+                exported += 1
+
+            for table in tables:
+                df = to_frame(table, chunk_rows[table])
+                fallback_date = pd.to_datetime(pd.Series(extraction_dates[table], dtype='float64'), unit='s')
+                writer.write(table, df, fallback_date=fallback_date)
+            if on_chunk is not None:
+                on_chunk(min(start + chunk_size, len(case_ids)), len(case_ids))
+    finally:
+        files = writer.close()
+
+    logging.info(f"Exported {exported} cases as {fmt} into {len(files)} files under {out_dir}")
+    return {"files": files, "cases": exported, "missing": missing}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export stored case results as CSV or Parquet")
+    parser.add_argument('case_ids', nargs='*', help="Case IDs to export")
+    parser.add_argument('--all', action='store_true', help="Export every stored case")
+    parser.add_argument('--results', default=os.path.join('data', 'results.db'), help="Result store path")
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--out', default=os.path.join('exports', 'columnar'), help="Output directory")
+    parser.add_argument('--partition-by', default='', help="Comma-separated partition keys: client, date")
+    parser.add_argument('--tables', default=','.join(TABLES), help="Comma-separated tables to export")
+    parser.add_argument('--chunk-size', type=int, default=50, help="Cases per written chunk")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    store = ResultStore(args.results)
+    case_ids = store.result_ids() if args.all else args.case_ids
+    if not case_ids:
+        parser.error("give case IDs or --all")
+    result = export_cases(
+        store,
+        case_ids,
+        args.out,
+        fmt=args.format,
+        partition_by=[key for key in args.partition_by.split(',') if key],
+        tables=[table for table in args.tables.split(',') if table],
+        chunk_size=args.chunk_size
+    )
+    for path in result["files"]:
+        sys.stdout.write(f"{path}\n")
+    if result["missing"]:
+        sys.stdout.write(f"No stored result for: {', '.join(result['missing'])}\n")
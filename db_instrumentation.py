@@ -0,0 +1,289 @@
+"""
+DB Instrumentation - Times every SQL statement and connection acquisition
+
+Connections opened through QueryStats.connect() are wrapped so that each cursor execute
+records the statement fingerprint, parameter count, rows returned and wall time. The
+aggregated statistics feed the slow-query report, and QueryStats.capture() collects the
+queries of a single case run for its trace.
+"""
+
+import re
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Normalize a statement so that queries differing only in literals share a fingerprint"""
+    sql = STRING_LITERAL.sub("?", sql)
+    sql = NUMBER_LITERAL.sub("?", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+def count_params(params):
+    if params is None:
+        return 0
+    if isinstance(params, (list, tuple)):
+        return len(params)
+    return 1
+
+
+class InstrumentedCursor:
+    """Cursor proxy that times execute calls and counts fetched rows"""
+
+    def __init__(self, cursor, stats, backend):
+        self._cursor = cursor
+        self._stats = stats
+        self._backend = backend
+        self._record = None
+
+    def execute(self, sql, *params):
+        # pyodbc accepts parameters either as one sequence or as positional arguments
+        if len(params) == 1:
+            params = params[0]
+        return self._timed(self._cursor.execute, sql, params, params)
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        params = seq_of_params[0] if seq_of_params else None
+        return self._timed(self._cursor.executemany, sql, params, seq_of_params, batch_size=len(seq_of_params))
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone, single=True)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def fetchmany(self, *args):
+        return self._fetch(lambda: self._cursor.fetchmany(*args))
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _timed(self, method, sql, params, call_params, batch_size=None):
+        self._stats.finish(self._record)
+        start = time.perf_counter()
+        error = None
+        try:
+            if call_params is None or (isinstance(call_params, (list, tuple)) and not call_params and batch_size is None):
+                result = method(sql)
+            else:
+                result = method(sql, call_params)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._record = self._stats.start_record(self._backend, sql, count_params(params), elapsed_ms, error, batch_size)
+            if error is not None:
+                self._stats.finish(self._record)
+                self._record = None
+        return self if result is self._cursor else result
+
+    def _fetch(self, method, single=False):
+        start = time.perf_counter()
+        rows = method()
+        if self._record is not None:
+            self._record["fetchMs"] += (time.perf_counter() - start) * 1000
+            if single:
+                self._record["rows"] += 1 if rows is not None else 0
+            else:
+                self._record["rows"] += len(rows) if rows else 0
+        return rows
+
+    def close(self):
+        self._stats.finish(self._record)
+        self._record = None
+        return self._cursor.close()
+
+
+class InstrumentedConnection:
+    """Connection proxy that hands out instrumented cursors"""
+
+    def __init__(self, conn, stats, backend, acquire_ms):
+        self._conn = conn
+        self._stats = stats
+        self._backend = backend
+        self._cursors = []
+        self.acquire_ms = acquire_ms
+
+    def cursor(self):
+        cursor = InstrumentedCursor(self._conn.cursor(), self._stats, self._backend)
+        self._cursors.append(cursor)
+        return cursor
+
+    def close(self):
+        # Flush the last statement of every cursor so its row count is recorded
+        for cursor in self._cursors:
+            self._stats.finish(cursor._record)
+            cursor._record = None
+        return self._conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class QueryStats:
+    """Aggregated per-statement statistics and a recent slow-query log"""
+
+    def __init__(self, slow_query_ms=500, slow_log_size=100):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self._statements = {}
+        self._slow_queries = deque(maxlen=slow_log_size)
+        self._connections = {"count": 0, "totalMs": 0.0, "maxMs": 0.0, "errors": 0}
+        self._local = threading.local()
+
+    def connect(self, connect, backend):
+        """Open a connection with connect(), timing acquisition and wrapping it for instrumentation"""
+        start = time.perf_counter()
+        try:
+            conn = connect()
+        except Exception:
+            with self._lock:
+                self._connections["errors"] += 1
+            raise
+        acquire_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self._connections["count"] += 1
+            self._connections["totalMs"] += acquire_ms
+            self._connections["maxMs"] = max(self._connections["maxMs"], acquire_ms)
+
+        capture = getattr(self._local, "capture", None)
+        if capture is not None:
+            capture["connections"].append({"backend": backend, "acquireMs": round(acquire_ms, 2)})
+        return InstrumentedConnection(conn, self, backend, acquire_ms)
+
+    def start_record(self, backend, sql, param_count, elapsed_ms, error, batch_size):
+        """Create the record for an executed statement; rows are added as they are fetched"""
+        record = {
+            "backend": backend,
+            "fingerprint": fingerprint(sql),
+            "params": param_count,
+            "batchSize": batch_size,
+            "executeMs": elapsed_ms,
+            "fetchMs": 0.0,
+            "rows": 0,
+            "error": str(error) if error is not None else None,
+            "startedAt": time.time() - elapsed_ms / 1000
+        }
+        capture = getattr(self._local, "capture", None)
+        if capture is not None:
+            capture["queries"].append(record)
+        return record
+
+    def finish(self, record):
+        """Fold a completed statement into the aggregates"""
+        if record is None or record.get("finished"):
+            return
+        record["finished"] = True
+        wall_ms = record["executeMs"] + record["fetchMs"]
+        record["wallMs"] = round(wall_ms, 2)
+
+        with self._lock:
+            stats = self._statements.setdefault(record["fingerprint"], {
+                "fingerprint": record["fingerprint"],
+                "backend": record["backend"],
+                "count": 0,
+                "totalMs": 0.0,
+                "maxMs": 0.0,
+                "rows": 0,
+                "errors": 0,
+                "params": record["params"]
+            })
+            stats["count"] += 1
+            stats["totalMs"] += wall_ms
+            stats["maxMs"] = max(stats["maxMs"], wall_ms)
+            stats["rows"] += record["rows"]
+            if record["error"]:
+                stats["errors"] += 1
+
+            if wall_ms >= self.slow_query_ms:
+                self._slow_queries.append({
+                    "fingerprint": record["fingerprint"],
+                    "wallMs": round(wall_ms, 2),
+                    "rows": record["rows"],
+                    "params": record["params"],
+                    "at": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record["startedAt"]))
+                })
+
+        if wall_ms >= self.slow_query_ms:
+            logging.warning(f"Slow query ({wall_ms:.0f} ms, {record['rows']} rows): {record['fingerprint'][:200]}")
+
+    @contextmanager
+    def capture(self):
+        """Collect the connections and queries made by the current thread, e.g. for one case run"""
+        capture = {"connections": [], "queries": []}
+        previous = getattr(self._local, "capture", None)
+        self._local.capture = capture
+        try:
+            yield capture
+        finally:
+            self._local.capture = previous
+
+    def summarize(self, capture):
+        """Turn a capture into a compact per-run DB trace"""
+        queries = []
+        for record in capture["queries"]:
+            self.finish(record)
+            queries.append({
+                "fingerprint": record["fingerprint"],
+                "params": record["params"],
+                "rows": record["rows"],
+                "wallMs": record["wallMs"],
+                "error": record["error"],
+                "startedAt": record["startedAt"]
+            })
+        connect_ms = sum(c["acquireMs"] for c in capture["connections"])
+        query_ms = sum(q["wallMs"] for q in queries)
+        return {
+            "connections": len(capture["connections"]),
+            "connectMs": round(connect_ms, 2),
+            "queryCount": len(queries),
+            "queryMs": round(query_ms, 2),
+            "totalMs": round(connect_ms + query_ms, 2),
+            "queries": queries
+        }
+
+    def report(self, limit=20):
+        """Return the aggregated slow-query report"""
+        with self._lock:
+            statements = sorted(self._statements.values(), key=lambda s: s["totalMs"], reverse=True)
+            connections = dict(self._connections)
+            slow_queries = list(self._slow_queries)
+
+        return {
+            "slowQueryMs": self.slow_query_ms,
+            "connections": {
+                "count": connections["count"],
+                "errors": connections["errors"],
+                "totalMs": round(connections["totalMs"], 2),
+                "avgMs": round(connections["totalMs"] / connections["count"], 2) if connections["count"] else 0,
+                "maxMs": round(connections["maxMs"], 2)
+            },
+            "statements": [
+                {
+                    "fingerprint": s["fingerprint"],
+                    "backend": s["backend"],
+                    "count": s["count"],
+                    "params": s["params"],
+                    "rows": s["rows"],
+                    "errors": s["errors"],
+                    "totalMs": round(s["totalMs"], 2),
+                    "avgMs": round(s["totalMs"] / s["count"], 2),
+                    "maxMs": round(s["maxMs"], 2)
+                }
+                for s in statements[:limit]
+            ],
+            "slowQueries": slow_queries[::-1]
+        }
@@ -0,0 +1,110 @@
+"""
+Debug Capture - Decides which debug screenshots and HTML dumps a browser run takes
+
+Levels:
+    off      no captures at all
+    errors   only captures taken on error paths (CAPTCHA, failed login, extraction errors)
+    sampled  every capture for one in every sample_every extraction runs, errors always
+    full     every capture on every run
+
+The level comes from the debug_capture config section, overridden by JAMI_DEBUG_CAPTURE.
+Screenshots can be taken as JPEG and clipped to the top of the viewport to make them cheaper.
+"""
+
+import os
+import logging
+import threading
+import contextvars
+
+LEVELS = ("off", "errors", "sampled", "full")
+
+# Whether the extraction run in the current task takes its non-error captures
+_run_enabled = contextvars.ContextVar('debug_capture_run', default=None)
+
+
+class CapturePolicy:
+    """Capture level plus screenshot format options, with counts of captures taken and skipped"""
+
+    def __init__(self, level="full", sample_every=10, image_format="png", jpeg_quality=60, clip_height=None):
+        if level not in LEVELS:
+            logging.warning(f"Unknown debug capture level '{level}', using 'full'")
+            level = "full"
+        self.level = level
+        self.sample_every = max(1, int(sample_every))
+        self.image_format = image_format if image_format in ("png", "jpeg") else "png"
+        self.jpeg_quality = jpeg_quality
+        self.clip_height = clip_height
+        self.taken = 0
+        self.skipped = 0
+        self._runs = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Build the policy from the debug_capture config section and JAMI_DEBUG_* environment variables"""
+        return cls(
+            level=os.environ.get('JAMI_DEBUG_CAPTURE', config.get('level', 'full')).lower(),
+            sample_every=os.environ.get('JAMI_DEBUG_SAMPLE_EVERY', config.get('sample_every', 10)),
+            image_format=config.get('image_format', 'png'),
+            jpeg_quality=config.get('jpeg_quality', 60),
+            clip_height=config.get('clip_height')
+        )
+
+    def start_run(self):
+        """Decide whether the extraction run starting in this task takes its regular captures"""
+        with self._lock:
+            self._runs += 1
+            run_number = self._runs
+        if self.level == "full":
+            enabled = True
+        elif self.level == "sampled":
+            enabled = (run_number - 1) % self.sample_every == 0
+        else:
+            enabled = False
+        _run_enabled.set(enabled)
+        return enabled
+
+    def allows(self, error=False):
+        """Return whether a capture may be taken now, counting the decision"""
+        if self.level == "off":
+            allowed = False
+        elif error:
+            allowed = True
+        else:
+            enabled = _run_enabled.get()
+            allowed = self.level == "full" if enabled is None else enabled
+        with self._lock:
+            if allowed:
+                self.taken += 1
+            else:
+                self.skipped += 1
+        return allowed
+
+    def screenshot_name(self, name):
+        """Swap the .png extension for .jpg when screenshots are taken as JPEG"""
+        if self.image_format == "jpeg" and name.endswith('.png'):
+            return name[:-4] + '.jpg'
+        return name
+
+    def screenshot_options(self, page):
+        """Keyword arguments for page.screenshot() matching the configured format and clip"""
+        options = {"type": self.image_format}
+        if self.image_format == "jpeg":
+            options["quality"] = self.jpeg_quality
+        viewport = page.viewport_size
+        if self.clip_height and viewport:
+            options["clip"] = {"x": 0, "y": 0, "width": viewport["width"], "height": min(self.clip_height, viewport["height"])}
+        return options
+
+    def status(self):
+        """Return the policy and capture counts as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                "level": self.level,
+                "sampleEvery": self.sample_every,
+                "imageFormat": self.image_format,
+                "clipHeight": self.clip_height,
+                "runs": self._runs,
+                "taken": self.taken,
+                "skipped": self.skipped
+            }
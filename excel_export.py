@@ -0,0 +1,253 @@
+"""
+Excel Export - Streams billing workbooks to disk with xlsxwriter in constant-memory mode
+
+Rows are written as they are produced and column widths are tracked in the same pass, so
+memory use stays flat regardless of how many updates a case has.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+import xlsxwriter
+
+# Widths are sized to content, capped so long details don't produce unreadable columns
+MAX_COLUMN_WIDTH = 50
+
+SUMMARY_HEADERS = ["Item", "Value"]
+FEE_HEADERS = ["Description", "Category", "Amount", "Status", "Source", "Confidence", "Notes"]
+UPDATE_HEADERS = ["Date", "Details", "Fee Type", "Amount", "Status", "Confidence", "Page", "Additional Info"]
+FEE_SUMMARY_HEADERS = ["Fee Category", "Total Amount", "Count", "Details"]
+BATCH_SUMMARY_HEADERS = ["Case ID", "Client Name", "Lien Holder", "Order To", "Fee ID", "Fee Type",
+                         "Database Amount", "Total Fees", "Updates"]
+
+
+class WorkbookCache:
+    """LRU cache of rendered workbooks keyed by a hash of their input data, bounded by total bytes"""
+
+    def __init__(self, max_bytes=50 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def status(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+class StreamingSheet:
+    """Writes rows to a worksheet in order while tracking the widest value of selected columns"""
+
+    def __init__(self, workbook, title, headers, sized_columns=(), fixed_widths=None):
+        self.worksheet = workbook.add_worksheet(title)
+        self.sized_columns = set(sized_columns)
+        self.fixed_widths = fixed_widths or {}
+        self.widths = {}
+        self.row = 0
+        self.write_row(headers)
+
+    def write_row(self, values):
+        for col in self.sized_columns:
+            if col < len(values):
+                self.widths[col] = max(self.widths.get(col, 0), len(str(values[col])))
+        self.worksheet.write_row(self.row, 0, values)
+        self.row += 1
+
+    def write_rows(self, rows):
+        for values in rows:
+            self.write_row(values)
+
+    def close(self):
+        """Apply the column widths collected while writing"""
+        for col, width in self.widths.items():
+            self.worksheet.set_column(col, col, min(width + 2, MAX_COLUMN_WIDTH))
+        for col, width in self.fixed_widths.items():
+            self.worksheet.set_column(col, col, width)
+
+
+def extra_notes(item):
+    """Compile additional fee-specific fields into a notes string"""
+    notes = []
+    if 'dailyRate' in item:
+        notes.append(f"Daily Rate: {item['dailyRate']}")
+    if 'storageDays' in item:
+        notes.append(f"Storage Days: {item['storageDays']}")
+    if 'vehicleYear' in item and 'vehicleMake' in item:
+        notes.append(f"Vehicle: {item['vehicleYear']} {item['vehicleMake']}")
+    return "; ".join(notes)
+
+
+def summary_rows(case_data, db_data):
+    return [
+        ["Case ID", case_data['caseId']],
+        ["Client Name", case_data['clientName']],
+        ["Lien Holder", case_data['lienHolder']],
+        ["Order To", case_data['orderTo']],
+        ["", ""],
+        ["Database Information", ""],
+        ["Fee ID", db_data['fdId']],
+        ["Fee Type", db_data['feeTypeName']],
+        ["Amount", db_data['amount']],
+        ["", ""],
+        ["Total Fees", sum(fee['amount'] for fee in case_data['fees'])]
+    ]
+
+
+def fee_rows(fees):
+    for fee in fees:
+        yield [
+            fee.get('description', ''),
+            fee.get('category', ''),
+            fee.get('amount', 0),
+            fee.get('status', ''),
+            fee.get('source', ''),
+            fee.get('confidence', ''),
+            extra_notes(fee)
+        ]
+
+
+def update_rows(updates):
+    for update in updates:
+        yield [
+            update.get('date', ''),
+            update.get('details', ''),
+            update.get('feeType', ''),
+            update.get('amount', 0),
+            update.get('status', ''),
+            update.get('feeTypeConfidence', ''),
+            update.get('page', ''),
+            extra_notes(update)
+        ]
+
+
+def fee_category_rows(fees):
+    """Group fees by category with totals, counts and the first three fee descriptions"""
+    fee_categories = {}
+    for fee in fees:
+        category = fee.get('category', 'Unknown')
+        if category not in fee_categories:
+            fee_categories[category] = {
+                'total': 0,
+                'count': 0,
+                'details': []
+            }
+
+        fee_categories[category]['total'] += fee.get('amount', 0)
+        fee_categories[category]['count'] += 1
+        fee_categories[category]['details'].append(
+            f"{fee.get('description','')[:50]}... ({fee.get('amountStr', '')})"
+        )
+
+    for category, data in fee_categories.items():
+        yield [category, data['total'], data['count'], "; ".join(data['details'][:3])]
+
+
+def write_case_workbook(target, case_data, db_data, updates):
+    """
+    Write the single-case billing workbook (Summary, Fees, Updates and Fee Summary sheets)
+
+    Args:
+        target: File path or binary file object to write the workbook to
+    """
+    workbook = xlsxwriter.Workbook(target, {'constant_memory': True})
+    try:
+        summary_sheet = StreamingSheet(workbook, "Summary", SUMMARY_HEADERS)
+        summary_sheet.write_rows(summary_rows(case_data, db_data))
+        summary_sheet.close()
+
+        fees_sheet = StreamingSheet(workbook, "Fees", FEE_HEADERS, sized_columns=(0, 1, 3, 4, 6))
+        fees_sheet.write_rows(fee_rows(case_data['fees']))
+        fees_sheet.close()
+
+        updates_sheet = StreamingSheet(workbook, "Updates", UPDATE_HEADERS, sized_columns=(0, 1, 2, 4, 7))
+        updates_sheet.write_rows(update_rows(updates))
+        updates_sheet.close()
+
+        fee_summary_sheet = StreamingSheet(workbook, "Fee Summary", FEE_SUMMARY_HEADERS, fixed_widths={0: 40, 3: 40})
+        fee_summary_sheet.write_rows(fee_category_rows(case_data['fees']))
+        fee_summary_sheet.close()
+    finally:
+        workbook.close()
+    logging.info(f"Wrote workbook for case {case_data['caseId']}: {len(case_data['fees'])} fees, {updates_sheet.row - 1} updates")
+
+
+def write_batch_workbook(target, cases, on_case=None):
+    """
+    Write one workbook covering many cases, with every row keyed by case ID
+
+    Cases are consumed one at a time and each is written to all four sheets before the next
+    is loaded, so only a single case is held in memory.
+
+    Args:
+        target: File path or binary file object to write the workbook to
+        cases: Iterable of (case_data, db_data, updates) tuples
+        on_case (callable): Called with (index, case_id) after each case is written
+    """
+    workbook = xlsxwriter.Workbook(target, {'constant_memory': True})
+    count = 0
+    try:
+        summary_sheet = StreamingSheet(workbook, "Summary", BATCH_SUMMARY_HEADERS, sized_columns=(0, 1, 2, 3, 5))
+        fees_sheet = StreamingSheet(workbook, "Fees", ["Case ID"] + FEE_HEADERS, sized_columns=(0, 1, 2, 4, 5, 7))
+        updates_sheet = StreamingSheet(workbook, "Updates", ["Case ID"] + UPDATE_HEADERS, sized_columns=(0, 1, 2, 3, 5, 8))
+        fee_summary_sheet = StreamingSheet(workbook, "Fee Summary", ["Case ID"] + FEE_SUMMARY_HEADERS,
+                                           sized_columns=(0,), fixed_widths={1: 40, 4: 40})
+
+        for case_data, db_data, updates in cases:
+            case_id = case_data['caseId']
+            fees = case_data.get('fees', [])
+            db_data = db_data or {}
+            summary_sheet.write_row([
+                case_id,
+                case_data.get('clientName', ''),
+                case_data.get('lienHolder', ''),
+                case_data.get('orderTo', ''),
+                db_data.get('fdId', ''),
+                db_data.get('feeTypeName', ''),
+                db_data.get('amount', ''),
+                sum(fee.get('amount', 0) for fee in fees),
+                len(updates)
+            ])
+            fees_sheet.write_rows([case_id] + row for row in fee_rows(fees))
+            updates_sheet.write_rows([case_id] + row for row in update_rows(updates))
+            fee_summary_sheet.write_rows([case_id] + row for row in fee_category_rows(fees))
+            count += 1
+            if on_case is not None:
+                on_case(count, case_id)
+
+        for sheet in (summary_sheet, fees_sheet, updates_sheet, fee_summary_sheet):
+            sheet.close()
+    finally:
+        workbook.close()
+    logging.info(f"Wrote batch workbook covering {count} cases")
+    return count
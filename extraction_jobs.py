@@ -0,0 +1,171 @@
+"""
+Extraction Jobs - Runs case extractions (and batch exports) in background worker threads
+
+Each worker owns its own asyncio event loop, so Playwright runs outside the request thread.
+Jobs report stage-level progress that clients poll through the jobs API, and keep an ordered
+event log (stages and extracted updates) that can be streamed to clients as it grows.
+"""
+
+import time
+import uuid
+import queue
+import asyncio
+import logging
+import threading
+
+from log_setup import log_context
+
+# Stages reported by an extraction, in order
+STAGES = ["queued", "login", "case_page", "updates", "database", "done"]
+
+
+class ExtractionJob:
+    """State of a single background extraction"""
+
+    def __init__(self, case_id, target, artifacts=()):
+        self.id = uuid.uuid4().hex
+        self.case_id = case_id
+        self.target = target
+        self.artifacts = list(artifacts)
+        self.status = "queued"
+        self.stage = "queued"
+        self.message = "Waiting for a worker"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stage_times = {"queued": self.created_at}
+        self.percent = None
+        self.events = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def emit(self, event, data):
+        """Append an event to the job's log and wake any streaming readers"""
+        with self._changed:
+            self.events.append((event, data))
+            self._changed.notify_all()
+
+    def progress(self, stage, message=None, percent=None):
+        """Record that the job reached a stage; jobs other than extractions may pass their own percent"""
+        with self._lock:
+            self.stage = stage
+            if percent is not None:
+                self.percent = percent
+            self.stage_times.setdefault(stage, time.time())
+            if message:
+                self.message = message
+        self.emit("stage", {"stage": stage, "message": message})
+        logging.info(f"Job {self.id} ({self.case_id}) reached stage '{stage}'" + (f": {message}" if message else ""))
+
+    def events_since(self, index, timeout=15):
+        """Wait up to timeout seconds for events after index; returns [] on timeout or once finished"""
+        with self._changed:
+            if len(self.events) <= index and not self.finished:
+                self._changed.wait(timeout)
+            return self.events[index:]
+
+    def finish(self, status, error=None):
+        """Mark the job done or failed and emit the matching final event"""
+        with self._changed:
+            self.error = error
+            self.finished_at = time.time()
+            self.status = status
+            self.events.append((status, {"error": error} if error else {}))
+            self._changed.notify_all()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self):
+        """Return the job state as a JSON-serializable dict"""
+        with self._lock:
+            if self.stage == "done":
+                progress = 100
+            elif self.percent is not None:
+                progress = self.percent
+            else:
+                stage_index = STAGES.index(self.stage) if self.stage in STAGES else 0
+                progress = round(100 * stage_index / (len(STAGES) - 1))
+            return {
+                "id": self.id,
+                "caseId": self.case_id,
+                "status": self.status,
+                "stage": self.stage,
+                "message": self.message,
+                "progress": progress,
+                "stageTimes": {stage: round(t - self.created_at, 2) for stage, t in self.stage_times.items()},
+                "error": self.error,
+                "createdAt": self.created_at,
+                "finishedAt": self.finished_at
+            }
+
+
+class JobManager:
+    """Queue of extraction jobs served by worker threads with their own event loops"""
+
+    def __init__(self, workers=2, retention_seconds=3600):
+        self.retention_seconds = retention_seconds
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        for index in range(max(1, int(workers))):
+            thread = threading.Thread(target=self._worker, name=f"extraction-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, case_id, target, artifacts=()):
+        """
+        Queue a job. target(job) must return a coroutine, which runs on the worker's event loop;
+        its return value becomes job.result. artifacts lists the files the job writes, which
+        retention leaves alone while the job is tracked
+        """
+        self._prune()
+        job = ExtractionJob(case_id, target, artifacts)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        logging.info(f"Queued extraction job {job.id} for case {case_id}")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Snapshot of the jobs currently tracked"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def in_flight(self):
+        """Number of queued or running jobs"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def _prune(self):
+        """Forget finished jobs older than the retention window"""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+    def _worker(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        while True:
+            job = self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                with log_context(job_id=job.id):
+                    job.result = loop.run_until_complete(job.target(job))
+                job.progress("done", "Extraction complete")
+                job.finish("done")
+            except Exception as e:
+                logging.exception(f"Extraction job {job.id} failed: {str(e)}")
+                job.finish("failed", str(e))
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,546 @@
+"""
+Fee Storage - Backends for the RDN_Client, Lienholder, FeeType and FeeDetails2 rate tables
+
+AzureSqlFeeStore queries the production Azure SQL database. SqliteFeeStore implements the
+same schema and lookup queries in a local SQLite file. It can be seeded from a CSV/JSON
+file for benchmarks and load tests, or kept in sync with Azure as a local read replica.
+"""
+
+import os
+import csv
+import json
+import decimal
+import time
+import logging
+import sqlite3
+import argparse
+import threading
+
+# Rate tables and the columns copied between backends, in foreign-key order
+RATE_TABLES = [
+    ("RDN_Client", ["id", "client_name"]),
+    ("Lienholder", ["id", "lienholder_name"]),
+    ("FeeType", ["id", "fee_type_name", "fee_type_code"]),
+    ("FeeDetails2", ["fd_id", "client_id", "lh_id", "ft_id", "amount"])
+]
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS RDN_Client (
+    id INTEGER PRIMARY KEY,
+    client_name TEXT NOT NULL COLLATE NOCASE
+);
+CREATE TABLE IF NOT EXISTS Lienholder (
+    id INTEGER PRIMARY KEY,
+    lienholder_name TEXT NOT NULL COLLATE NOCASE
+);
+CREATE TABLE IF NOT EXISTS FeeType (
+    id INTEGER PRIMARY KEY,
+    fee_type_name TEXT NOT NULL COLLATE NOCASE,
+    fee_type_code TEXT
+);
+CREATE TABLE IF NOT EXISTS FeeDetails2 (
+    fd_id INTEGER PRIMARY KEY,
+    client_id INTEGER REFERENCES RDN_Client(id),
+    lh_id INTEGER REFERENCES Lienholder(id),
+    ft_id INTEGER REFERENCES FeeType(id),
+    amount REAL
+);
+CREATE INDEX IF NOT EXISTS ix_client_name ON RDN_Client (client_name);
+CREATE INDEX IF NOT EXISTS ix_lienholder_name ON Lienholder (lienholder_name);
+CREATE INDEX IF NOT EXISTS ix_fee_type_name ON FeeType (fee_type_name);
+CREATE INDEX IF NOT EXISTS ix_fee_lookup ON FeeDetails2 (client_id, lh_id, ft_id);
+"""
+
+
+def portable_value(value):
+    """Convert driver-specific column values (pyodbc returns DECIMAL columns as Decimal) to plain Python types"""
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return value
+
+
+class FeeStore:
+    """Base class for fee rate storage; subclasses supply connections and SQL dialect details"""
+
+    name = "base"
+    table_prefix = ""
+    query_stats = None
+
+    def connect(self):
+        """Return a DB-API connection to the rate tables"""
+        raise NotImplementedError
+
+    def open_connection(self):
+        """Connect, wrapping the connection for per-query timing when instrumentation is enabled"""
+        if self.query_stats is None:
+            return self.connect()
+        return self.query_stats.connect(self.connect, self.name)
+
+    def select_sql(self, columns, table, where=None, limit=None):
+        """Build a SELECT statement for this backend's dialect"""
+        raise NotImplementedError
+
+    def list_tables(self, cursor):
+        """Return the names of the tables in the database"""
+        raise NotImplementedError
+
+    def status(self):
+        """Return backend details as a JSON-serializable dict"""
+        return {"backend": self.name}
+
+    def table(self, name):
+        return f"{self.table_prefix}{name}"
+
+    def export_rate_tables(self):
+        """Read every rate table, returning {table: (columns, rows)}"""
+        conn = self.open_connection()
+        try:
+            cursor = conn.cursor()
+            tables = {}
+            for table, columns in RATE_TABLES:
+                cursor.execute(self.select_sql(", ".join(columns), self.table(table)))
+                tables[table] = (columns, [tuple(portable_value(value) for value in row) for row in cursor.fetchall()])
+            return tables
+        finally:
+            conn.close()
+
+    def lookup_repo_fee(self, client_name, lienholder_name, fee_type_name):
+        """
+        Lookup repo fee based on client name, lienholder name, and fee type.
+        Based on the implementation from server-upgradedv2.py.
+
+        Connection errors are raised to the caller; query errors are logged and return None.
+
+        Returns:
+            dict: A dictionary containing fee details, or None if no matching fee is found
+        """
+        # Make sure we're using the correct variable names
+        case_client_name = client_name
+        case_lienholder_name = lienholder_name
+        case_repo_type = fee_type_name
+
+        conn = self.open_connection()
+
+        try:
+            cursor = conn.cursor()
+
+            # Step 1: Get foreign keys from names with enhanced diagnostics
+            logging.info("Getting foreign keys from names with enhanced diagnostics...")
+
+            # Check the database structure first to ensure tables exist
+            try:
+                table_names = self.list_tables(cursor)
+                logging.info(f"Database tables found: {', '.join(table_names[:10])}")
+
+                # Check if our required tables exist
+                missing_tables = [table for table, _ in RATE_TABLES if table not in table_names]
+                if missing_tables:
+                    logging.error(f"Required tables missing: {', '.join(missing_tables)}")
+            except Exception as schema_e:
+                logging.warning(f"Could not check schema: {str(schema_e)}")
+
+            # Get client ID - try exact match first, then partial match
+            try:
+                cursor.execute(self.select_sql("id", self.table("RDN_Client"), "client_name = ?", 1), [case_client_name])
+                client_row = cursor.fetchone()
+
+                if not client_row:
+                    logging.warning(f"Client '{case_client_name}' not found with exact match, trying partial match...")
+                    # Show sample clients for debugging
+                    cursor.execute(self.select_sql("id, client_name", self.table("RDN_Client"), limit=5))
+                    sample_clients = cursor.fetchall()
+                    if sample_clients:
+                        logging.info(f"Sample clients in database: {', '.join([c[1] for c in sample_clients])}")
+
+                    # Try partial match using keywords from client name
+                    client_keywords = case_client_name.split()
+                    if len(client_keywords) > 1:
+                        partial_name = f"%{client_keywords[0]}%{client_keywords[1]}%"
+                        cursor.execute(self.select_sql("id, client_name", self.table("RDN_Client"), "client_name LIKE ?", 1), [partial_name])
+                        partial_match = cursor.fetchone()
+                        if partial_match:
+                            client_id = partial_match[0]
+                            logging.info(f"Found client via partial match: {partial_match[1]} (ID: {client_id})")
+                        else:
+                            logging.error(f"No client match found for '{case_client_name}', even with partial matching")
+                            return None
+                    else:
+                        logging.error(f"Client name too short for effective partial matching: '{case_client_name}'")
+                        return None
+                else:
+                    client_id = client_row[0]
+                    logging.info(f"Found client via exact match (ID: {client_id})")
+            except Exception as client_e:
+                logging.error(f"Error during client lookup: {str(client_e)}")
+                return None
+
+            # Get lienholder ID - try exact match first, then partial match
+            try:
+                cursor.execute(self.select_sql("id", self.table("Lienholder"), "lienholder_name = ?", 1), [case_lienholder_name])
+                lienholder_row = cursor.fetchone()
+
+                if not lienholder_row:
+                    logging.warning(f"Lienholder '{case_lienholder_name}' not found with exact match, trying partial match...")
+                    # Show sample lienholders for debugging
+                    cursor.execute(self.select_sql("id, lienholder_name", self.table("Lienholder"), limit=5))
+                    sample_lienholders = cursor.fetchall()
+                    if sample_lienholders:
+                        logging.info(f"Sample lienholders in database: {', '.join([lh[1] for lh in sample_lienholders])}")
+
+                    # Try partial match using keywords from lienholder name
+                    lienholder_keywords = case_lienholder_name.split()
+                    if lienholder_keywords:
+                        partial_name = f"%{lienholder_keywords[0]}%"
+                        cursor.execute(self.select_sql("id, lienholder_name", self.table("Lienholder"), "lienholder_name LIKE ?", 1), [partial_name])
+                        partial_match = cursor.fetchone()
+                        if partial_match:
+                            lienholder_id = partial_match[0]
+                            logging.info(f"Found lienholder via partial match: {partial_match[1]} (ID: {lienholder_id})")
+                        else:
+                            logging.warning(f"No lienholder match found for '{case_lienholder_name}', will use Standard fallback")
+                            lienholder_id = None  # We'll handle this in the fallback logic
+                    else:
+                        logging.warning(f"Lienholder name too short for effective partial matching: '{case_lienholder_name}'")
+                        lienholder_id = None  # We'll handle this in the fallback logic
+                else:
+                    lienholder_id = lienholder_row[0]
+                    logging.info(f"Found lienholder via exact match (ID: {lienholder_id})")
+            except Exception as lienholder_e:
+                logging.error(f"Error during lienholder lookup: {str(lienholder_e)}")
+                lienholder_id = None  # We'll handle this in the fallback logic
+
+            # Get fee type ID - try exact match first, then partial match
+            try:
+                cursor.execute(self.select_sql("id", self.table("FeeType"), "fee_type_name = ?", 1), [case_repo_type])
+                fee_type_row = cursor.fetchone()
+
+                if not fee_type_row:
+                    logging.warning(f"Fee type '{case_repo_type}' not found with exact match, trying partial match...")
+                    # Show sample fee types for debugging
+                    cursor.execute(self.select_sql("id, fee_type_name", self.table("FeeType"), limit=5))
+                    sample_fee_types = cursor.fetchall()
+                    if sample_fee_types:
+                        logging.info(f"Sample fee types in database: {', '.join([ft[1] for ft in sample_fee_types])}")
+
+                    # Try partial match with keywords - 'Involuntary Repo' should match 'Involuntary' or 'Repo'
+                    fee_keywords = case_repo_type.split()
+                    if fee_keywords:
+                        partial_name = f"%{fee_keywords[0]}%"
+                        cursor.execute(self.select_sql("id, fee_type_name", self.table("FeeType"), "fee_type_name LIKE ?", 1), [partial_name])
+                        partial_match = cursor.fetchone()
+                        if partial_match:
+                            fee_type_id = partial_match[0]
+                            logging.info(f"Found fee type via partial match: {partial_match[1]} (ID: {fee_type_id})")
+                        else:
+                            logging.error(f"No fee type match found for '{case_repo_type}', even with partial matching")
+                            return None
+                    else:
+                        logging.error(f"Fee type name too short for effective partial matching: '{case_repo_type}'")
+                        return None
+                else:
+                    fee_type_id = fee_type_row[0]
+                    logging.info(f"Found fee type via exact match (ID: {fee_type_id})")
+            except Exception as fee_type_e:
+                logging.error(f"Error during fee type lookup: {str(fee_type_e)}")
+                return None
+
+            # Using parameterized query for safety
+            query = f"""
+                SELECT
+                    fd.fd_id,
+                    c.client_name,
+                    lh.lienholder_name,
+                    ft.fee_type_name,
+                    fd.amount
+                FROM {self.table('FeeDetails2')} fd
+                JOIN {self.table('RDN_Client')} c ON fd.client_id = c.id
+                JOIN {self.table('Lienholder')} lh ON fd.lh_id = lh.id
+                JOIN {self.table('FeeType')} ft ON fd.ft_id = ft.id
+                WHERE fd.client_id = ? AND fd.lh_id = ? AND fd.ft_id = ?
+            """
+
+            # Step 2: Check if a matching record exists and return it if found (primary logic)
+            if lienholder_id:
+                logging.info(f"Executing primary lookup query with params: [{client_id}, {lienholder_id}, {fee_type_id}]")
+                cursor.execute(query, [client_id, lienholder_id, fee_type_id])
+                row = cursor.fetchone()
+
+                if row:
+                    logging.info(f"Found matching fee record for specific lienholder '{case_lienholder_name}'")
+                    return {
+                        'fd_id': row[0],
+                        'client_name': row[1],
+                        'lienholder_name': row[2],
+                        'fee_type': row[3],
+                        'amount': row[4],
+                        'is_fallback': False
+                    }
+
+            # Step 3: If no record found, try with 'Standard' lienholder (fallback logic)
+            logging.info(f"No specific record found. Looking up 'Standard' lienholder as fallback...")
+            cursor.execute(self.select_sql("id", self.table("Lienholder"), "lienholder_name = ?", 1), ['Standard'])
+            standard_row = cursor.fetchone()
+
+            if not standard_row:
+                logging.error("'Standard' lienholder not found in database")
+                return None
+
+            standard_lienholder_id = standard_row[0]
+
+            # Look up using Standard lienholder
+            logging.info(f"Executing fallback lookup query with params: [{client_id}, {standard_lienholder_id}, {fee_type_id}]")
+            cursor.execute(query, [client_id, standard_lienholder_id, fee_type_id])
+            fallback_row = cursor.fetchone()
+
+            if fallback_row:
+                logging.info(f"Found fallback fee using 'Standard' lienholder")
+                return {
+                    'fd_id': fallback_row[0],
+                    'client_name': fallback_row[1],
+                    'lienholder_name': fallback_row[2] + " (Standard Fallback)",
+                    'fee_type': fallback_row[3],
+                    'amount': fallback_row[4],
+                    'is_fallback': True,
+                    'message': f"Lienholder '{case_lienholder_name}' specific fee not found. Using Standard amount."
+                }
+
+            logging.warning("No fee record found with either specific lienholder or fallback")
+            return None
+
+        except Exception as e:
+            logging.error(f"Error looking up repo fee: {str(e)}")
+            import traceback
+            logging.error(traceback.format_exc())
+            return None
+
+        finally:
+            if conn:
+                conn.close()
+
+
+class AzureSqlFeeStore(FeeStore):
+    """Rate tables in the Azure SQL database, reached through the app's connection function"""
+
+    name = "azure"
+    table_prefix = "dbo."
+
+    def __init__(self, connect):
+        self._connect = connect
+
+    def connect(self):
+        return self._connect()
+
+    def select_sql(self, columns, table, where=None, limit=None):
+        top = f"TOP {int(limit)} " if limit else ""
+        sql = f"SELECT {top}{columns} FROM {table}"
+        if where:
+            sql += f" WHERE {where}"
+        return sql
+
+    def list_tables(self, cursor):
+        cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE='BASE TABLE'")
+        return [row[0] for row in cursor.fetchall()]
+
+
+class SqliteFeeStore(FeeStore):
+    """Local SQLite copy of the rate tables, usable standalone or as a read replica of Azure"""
+
+    name = "sqlite"
+
+    def __init__(self, path, seed_file=None):
+        self.path = path
+        self.last_sync_at = None
+        self.last_sync_error = None
+        self.row_counts = {}
+        self._sync_thread = None
+        self._sync_stop = threading.Event()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self.connect()
+        try:
+            conn.executescript(SQLITE_SCHEMA)
+            conn.commit()
+            self._count_rows(conn)
+        finally:
+            conn.close()
+        fee_count = self.row_counts["FeeDetails2"]
+
+        # Only seed an empty database so restarts don't duplicate rows
+        if seed_file and fee_count == 0:
+            self.load_seed(seed_file)
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def select_sql(self, columns, table, where=None, limit=None):
+        sql = f"SELECT {columns} FROM {table}"
+        if where:
+            sql += f" WHERE {where}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return sql
+
+    def list_tables(self, cursor):
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        return [row[0] for row in cursor.fetchall()]
+
+    def _count_rows(self, conn):
+        """Refresh the cached row counts; they only change when the store is seeded or synced"""
+        self.row_counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table, _ in RATE_TABLES}
+
+    def status(self):
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "rowCounts": dict(self.row_counts),
+            "replicaSync": self._sync_thread is not None,
+            "lastSyncAt": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.last_sync_at)) if self.last_sync_at else None,
+            "lastSyncError": self.last_sync_error
+        }
+
+    def load_seed(self, seed_file):
+        """
+        Load fee rows from a CSV or JSON seed file.
+
+        Each row needs client_name, lienholder_name, fee_type_name and amount
+        (fee_type_code is optional). A JSON seed is a list of such objects.
+        """
+        if seed_file.lower().endswith('.json'):
+            with open(seed_file, 'r', encoding='utf-8') as f:
+                rows = json.load(f)
+        else:
+            with open(seed_file, 'r', encoding='utf-8', newline='') as f:
+                rows = list(csv.DictReader(f))
+
+        conn = self.connect()
+        try:
+            ids = {"RDN_Client": {}, "Lienholder": {}, "FeeType": {}}
+
+            def resolve(table, column, value, extra=None):
+                key = value.lower()
+                if key not in ids[table]:
+                    row = conn.execute(f"SELECT id FROM {table} WHERE {column} = ?", [value]).fetchone()
+                    if row:
+                        ids[table][key] = row[0]
+                    elif extra:
+                        ids[table][key] = conn.execute(
+                            f"INSERT INTO {table} ({column}, fee_type_code) VALUES (?, ?)", [value, extra]
+                        ).lastrowid
+                    else:
+                        ids[table][key] = conn.execute(f"INSERT INTO {table} ({column}) VALUES (?)", [value]).lastrowid
+                return ids[table][key]
+
+            fee_rows = []
+            for row in rows:
+                fee_type_name = row['fee_type_name'].strip()
+                fee_rows.append((
+                    resolve("RDN_Client", "client_name", row['client_name'].strip()),
+                    resolve("Lienholder", "lienholder_name", row['lienholder_name'].strip()),
+                    resolve("FeeType", "fee_type_name", fee_type_name, row.get('fee_type_code') or fee_type_name[:10]),
+                    float(str(row['amount']).replace('$', '').replace(',', ''))
+                ))
+
+            conn.executemany("INSERT INTO FeeDetails2 (client_id, lh_id, ft_id, amount) VALUES (?, ?, ?, ?)", fee_rows)
+            conn.commit()
+            self._count_rows(conn)
+        finally:
+            conn.close()
+
+        logging.info(f"Loaded {len(fee_rows)} fee rows from seed file {seed_file}")
+        return len(fee_rows)
+
+    def sync_from(self, source):
+        """Replace the local rate tables with a copy of the source store's tables"""
+        tables = source.export_rate_tables()
+
+        conn = self.connect()
+        try:
+            # Children first when deleting, parents first when inserting
+            for table, _ in reversed(RATE_TABLES):
+                conn.execute(f"DELETE FROM {table}")
+            for table, _ in RATE_TABLES:
+                columns, rows = tables[table]
+                placeholders = ", ".join(["?"] * len(columns))
+                conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                                 [tuple(portable_value(value) for value in row) for row in rows])
+            conn.commit()
+            self._count_rows(conn)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        self.last_sync_at = time.time()
+        self.last_sync_error = None
+        logging.info(f"Synced rate tables from {source.name}: " +
+                     ", ".join(f"{table}={len(tables[table][1])}" for table, _ in RATE_TABLES))
+
+    def start_sync(self, source, interval_seconds):
+        """Sync from the source store now and then every interval_seconds in a background thread"""
+        def sync_loop():
+            while not self._sync_stop.is_set():
+                try:
+                    self.sync_from(source)
+                except Exception as e:
+                    self.last_sync_error = str(e)
+                    logging.warning(f"Rate table sync from {source.name} failed: {str(e)}")
+                self._sync_stop.wait(interval_seconds)
+
+        self._sync_thread = threading.Thread(target=sync_loop, name="fee-store-sync", daemon=True)
+        self._sync_thread.start()
+
+    def stop_sync(self):
+        self._sync_stop.set()
+
+
+def create_fee_store(storage_config, azure_connect, query_stats=None):
+    """
+    Create the fee store selected by the "storage" section of config.json
+
+    Args:
+        storage_config (dict): The storage section of the app config
+        azure_connect (callable): Returns a connection to the Azure SQL database
+        query_stats (QueryStats): Optional collector that times every query the store runs
+    """
+    backend = storage_config.get('backend', 'azure')
+    if backend == 'sqlite':
+        store = SqliteFeeStore(
+            storage_config.get('sqlite_path', os.path.join('data', 'fee_rates.db')),
+            seed_file=storage_config.get('seed_file') or None
+        )
+        store.query_stats = query_stats
+        if storage_config.get('sync_from_azure', False):
+            source = AzureSqlFeeStore(azure_connect)
+            source.query_stats = query_stats
+            store.start_sync(source, storage_config.get('sync_interval_seconds', 900))
+        logging.info(f"Using SQLite fee store at {store.path}")
+        return store
+
+    logging.info("Using Azure SQL fee store")
+    store = AzureSqlFeeStore(azure_connect)
+    store.query_stats = query_stats
+    return store
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manage the local SQLite fee rate store")
+    parser.add_argument('--db', default=os.path.join('data', 'fee_rates.db'), help="SQLite database path")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    seed_parser = subparsers.add_parser('seed', help="Load fee rows from a CSV or JSON seed file")
+    seed_parser.add_argument('seed_file')
+    lookup_parser = subparsers.add_parser('lookup', help="Look up a repo fee")
+    lookup_parser.add_argument('client_name')
+    lookup_parser.add_argument('lienholder_name')
+    lookup_parser.add_argument('fee_type_name')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    store = SqliteFeeStore(args.db)
+    if args.command == 'seed':
+        store.load_seed(args.seed_file)
+    else:
+        print(json.dumps(store.lookup_repo_fee(args.client_name, args.lienholder_name, args.fee_type_name), indent=2))
@@ -0,0 +1,127 @@
+"""
+Log Setup - Structured application logging through a queue, so callers never wait on disk I/O
+
+Records are put on an in-memory queue by a QueueHandler and written to the log file by a
+QueueListener thread, one JSON object per line (or the classic text format). The case ID and
+job ID of the code that logged are attached from context variables. Levels can be set per
+logger, and JAMI_LOG_LEVEL overrides the root level.
+"""
+
+import os
+import copy
+import json
+import queue
+import atexit
+import logging
+import contextlib
+import contextvars
+import logging.handlers
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+case_id_var = contextvars.ContextVar('log_case_id', default=None)
+job_id_var = contextvars.ContextVar('log_job_id', default=None)
+
+
+@contextlib.contextmanager
+def log_context(case_id=None, job_id=None):
+    """Attach a case ID and/or job ID to every record logged inside the block"""
+    tokens = []
+    if case_id is not None:
+        tokens.append((case_id_var, case_id_var.set(str(case_id))))
+    if job_id is not None:
+        tokens.append((job_id_var, job_id_var.set(job_id)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copy the context case and job IDs onto the record in the thread that logged it"""
+
+    def filter(self, record):
+        record.case_id = case_id_var.get()
+        record.job_id = job_id_var.get()
+        return True
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that merges the message arguments in the calling thread (they may be mutated
+    later) but leaves JSON encoding and the timestamp to the listener thread
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the same timestamp format as the text log"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName
+        }
+        if getattr(record, 'case_id', None) is not None:
+            entry["caseId"] = record.case_id
+        if getattr(record, 'job_id', None) is not None:
+            entry["jobId"] = record.job_id
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(config, default_path='jami_billing.log'):
+    """
+    Route the root logger through a queue to the log file
+
+    Args:
+        config (dict): The logging config section: path, format ("json" or "text"),
+                       level and levels (per-logger overrides)
+
+    Returns:
+        QueueListener: The running listener; it is stopped (and the queue drained) at exit
+    """
+    file_handler = logging.FileHandler(config.get('path', default_path), encoding='utf-8')
+    if config.get('format', 'json') == 'json':
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(os.environ.get('JAMI_LOG_LEVEL', config.get('level', 'INFO')).upper())
+    for name, level in config.get('levels', {}).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+
+    def stop_listener():
+        # QueueListener.stop() raises if the listener was already stopped
+        if getattr(listener, '_thread', None) is not None:
+            listener.stop()
+
+    atexit.register(stop_listener)
+    return listener
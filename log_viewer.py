@@ -0,0 +1,274 @@
+"""
+Log Viewer - Paginated, filterable reads of the application log without loading the whole file
+
+The log is divided into blocks of roughly block_size bytes, aligned on line boundaries. A small
+JSON sidecar next to the log records each block's byte range, first timestamp and which levels
+occur in it, so level-filtered reads skip blocks with nothing to show. The sidecar is extended
+incrementally as the log grows and rebuilt if the log is truncated or replaced.
+
+Both the JSON-lines format and the older text format are understood, so logs written before
+the switch to JSON stay readable.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+
+ENTRY_PATTERN = re.compile(rb'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) - (\S+) - ([A-Z]+) - ?(.*)$')
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+LEVEL_BITS = {level: 1 << index for index, level in enumerate(LEVELS)}
+
+
+def parse_entry(line):
+    """
+    Parse the first line of a log entry, in either the JSON or the text format, into a dict;
+    returns None for continuation lines such as traceback frames
+    """
+    if line.startswith(b'{'):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(record, dict) or "level" not in record:
+            return None
+        message = record.get("message", "")
+        if record.get("exc"):
+            message += "\n" + record["exc"]
+        entry = {
+            "timestamp": record.get("ts"),
+            "logger": record.get("logger"),
+            "level": record["level"],
+            "message": message
+        }
+        for key in ("caseId", "jobId"):
+            if key in record:
+                entry[key] = record[key]
+        return entry
+    match = ENTRY_PATTERN.match(line)
+    if not match:
+        return None
+    return {
+        "timestamp": match.group(1).decode(),
+        "logger": match.group(2).decode(errors='replace'),
+        "level": match.group(3).decode(),
+        "message": match.group(4).decode(errors='replace')
+    }
+
+
+def level_mask(min_level):
+    """Bit mask of min_level and every more severe level"""
+    if min_level is None:
+        return None
+    index = LEVELS.index(min_level.upper())
+    return sum(LEVEL_BITS[level] for level in LEVELS[index:])
+
+
+class LogViewer:
+    """Reads entries of one log file by byte offset or from the end, backed by a block index"""
+
+    def __init__(self, path, block_size=256 * 1024, index_path=None):
+        self.path = path
+        self.block_size = block_size
+        self.index_path = index_path or f"{path}.idx"
+        self._lock = threading.Lock()
+        self._index = None
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            if index.get("blockSize") == self.block_size:
+                return index
+        except (FileNotFoundError, ValueError):
+            pass
+        return {"blockSize": self.block_size, "head": None, "size": 0, "blocks": []}
+
+    def _head(self, f):
+        f.seek(0)
+        return f.read(64).hex()
+
+    def refresh(self):
+        """Index any complete blocks written since the last call; returns the index"""
+        with self._lock:
+            if self._index is None:
+                self._index = self._load_index()
+            index = self._index
+            if not os.path.exists(self.path):
+                return index
+
+            size = os.path.getsize(self.path)
+            with open(self.path, 'rb') as f:
+                head = self._head(f)
+                if size < index["size"] or (index["head"] is not None and head != index["head"]):
+                    logging.info(f"{self.path} was truncated or replaced, rebuilding its index")
+                    index.update(head=None, size=0, blocks=[])
+                index["head"] = head
+
+                position = index["size"]
+                changed = False
+                while size - position >= self.block_size:
+                    f.seek(position)
+                    data = f.read(self.block_size)
+                    cut = data.rfind(b'\n')
+                    if cut < 0:
+                        # A single line longer than a block; extend to its end
+                        data += f.readline()
+                        cut = len(data) - 1
+                    data = data[:cut + 1]
+                    mask = 0
+                    first_timestamp = None
+                    for line in data.split(b'\n'):
+                        entry = parse_entry(line)
+                        if entry:
+                            mask |= LEVEL_BITS.get(entry["level"], 0)
+                            if first_timestamp is None:
+                                first_timestamp = entry["timestamp"]
+                    index["blocks"].append([position, position + len(data), mask, first_timestamp])
+                    position += len(data)
+                    changed = True
+                index["size"] = position
+
+            if changed:
+                try:
+                    with open(self.index_path, 'w') as f:
+                        json.dump(index, f)
+                except OSError as e:
+                    logging.warning(f"Could not save log index {self.index_path}: {str(e)}")
+            return index
+
+    def _ranges(self, index, size):
+        """Yield (start, end, mask) for indexed blocks and the unindexed tail; a mask of None is unknown"""
+        for start, end, mask, _ in index["blocks"]:
+            yield start, end, mask
+        if size > index["size"]:
+            yield index["size"], size, None
+
+    @staticmethod
+    def _read_entries(f, start, end, mask, case_id):
+        """Return the entries whose first line starts in [start, end) and match the filters"""
+        f.seek(start)
+        offset = start
+        entries = []
+        current = None
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            entry = parse_entry(line.rstrip(b'\r\n'))
+            if entry:
+                if current is not None:
+                    entries.append(current)
+                    current = None
+                if offset >= end:
+                    break
+                current = {"offset": offset, **entry}
+            elif current is not None:
+                current["message"] += "\n" + line.rstrip(b'\r\n').decode(errors='replace')
+            elif offset >= end:
+                break
+            offset += len(line)
+        if current is not None:
+            entries.append(current)
+
+        return [
+            entry for entry in entries
+            if (mask is None or LEVEL_BITS.get(entry["level"], 0) & mask)
+            and (case_id is None or entry.get("caseId") == str(case_id) or str(case_id) in entry["message"])
+        ]
+
+    def page(self, offset=0, limit=200, level=None, case_id=None):
+        """
+        Read up to limit entries starting at byte offset
+
+        Returns:
+            dict: entries, nextOffset (pass back to read the following page, None at the end)
+                  and the log size in bytes
+        """
+        index = self.refresh()
+        mask = level_mask(level)
+        if not os.path.exists(self.path):
+            return {"entries": [], "nextOffset": None, "size": 0}
+        size = os.path.getsize(self.path)
+
+        entries = []
+        with open(self.path, 'rb') as f:
+            # Start at the first line beginning at or after offset
+            if offset > 0:
+                f.seek(offset - 1)
+                if f.read(1) != b'\n':
+                    f.readline()
+                offset = f.tell()
+
+            for start, end, block_mask in self._ranges(index, size):
+                if end <= offset:
+                    continue
+                if mask is not None and block_mask is not None and not block_mask & mask:
+                    continue
+                entries.extend(self._read_entries(f, max(start, offset), end, mask, case_id))
+                if len(entries) >= limit:
+                    break
+
+        entries = entries[:limit]
+        next_offset = entries[-1]["offset"] + 1 if entries and len(entries) == limit else None
+        return {"entries": entries, "nextOffset": next_offset, "size": size}
+
+    def tail(self, limit=200, level=None, case_id=None):
+        """Read the last limit matching entries, oldest first"""
+        index = self.refresh()
+        mask = level_mask(level)
+        if not os.path.exists(self.path):
+            return {"entries": [], "size": 0}
+        size = os.path.getsize(self.path)
+
+        entries = []
+        with open(self.path, 'rb') as f:
+            for start, end, block_mask in reversed(list(self._ranges(index, size))):
+                if mask is not None and block_mask is not None and not block_mask & mask:
+                    continue
+                entries = self._read_entries(f, start, end, mask, case_id) + entries
+                if len(entries) >= limit:
+                    break
+        return {"entries": entries[-limit:] if limit > 0 else [], "size": size}
+
+
+class DebugFileListing:
+    """Cached listing of loose files in a directory, rescanned when it changes or the cache expires"""
+
+    def __init__(self, directory, extensions=('.png', '.jpg', '.html', '.json'), ttl_seconds=30):
+        self.directory = directory
+        self.extensions = extensions
+        self.ttl_seconds = ttl_seconds
+        self._files = []
+        self._scanned_at = 0
+        self._directory_mtime = None
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(self.extensions):
+                    stat = entry.stat()
+                    files.append({"name": entry.name, "size": stat.st_size, "mtime": stat.st_mtime})
+        files.sort(key=lambda item: item["mtime"], reverse=True)
+        return files
+
+    def files(self):
+        """All matching files, newest first"""
+        with self._lock:
+            if not os.path.isdir(self.directory):
+                return []
+            directory_mtime = os.path.getmtime(self.directory)
+            if directory_mtime != self._directory_mtime or time.time() - self._scanned_at > self.ttl_seconds:
+                self._files = self._scan()
+                self._scanned_at = time.time()
+                self._directory_mtime = directory_mtime
+            return self._files
+
+    def page(self, offset=0, limit=100):
+        files = self.files()
+        return {"files": files[offset:offset + limit], "total": len(files)}
@@ -0,0 +1,294 @@
+"""
+Memory Profile - Opt-in tracemalloc profiling of extraction stages and a process RSS trend
+
+When enabled, tracemalloc is started and a snapshot is taken at the start and end of each
+profiled stage (the stages timed through metrics.time_stage). Each stage records how much
+traced memory it left allocated, its peak, and the allocation sites that grew the most. The
+stages of one extraction are collected into a run report, written as JSON under debug/memory
+and kept in memory for /api/memory. A background thread samples the process RSS into a
+rolling trend, so growth across runs shows up even outside profiled stages.
+
+Open stages are held weakly, and the stages a run leaves open are dropped when the run ends,
+so a stage that is never ended does not keep its snapshot alive.
+
+tracemalloc counts allocations of every thread, so stages of runs executing concurrently see
+each other's allocations. Tracing also slows allocation-heavy code down noticeably, so this
+is meant to be switched on while investigating (memory_profile.enabled or JAMI_MEMORY_PROFILE).
+"""
+
+import os
+import json
+import time
+import logging
+import weakref
+import threading
+import contextlib
+import contextvars
+import tracemalloc
+from collections import deque
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DEFAULT_STAGES = ("extraction", "browser_launch", "login", "case_page_load", "case_parse",
+                  "updates_tab", "all_click", "dollar_records", "db_lookup", "export")
+
+# Stage records of the run executing in the current task
+_run_stages = contextvars.ContextVar('memory_profile_run', default=None)
+# Stages started by that run, dropped when it ends if they are still open
+_run_open = contextvars.ContextVar('memory_profile_open', default=None)
+
+_profiler = None
+
+
+def process_rss():
+    """Resident set size of this process in bytes, or None where it cannot be read"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class StageMemory:
+    """Memory state at the start of one profiled stage"""
+
+    def __init__(self, stage, snapshot, traced):
+        self.stage = stage
+        self.snapshot = snapshot
+        self.traced = traced
+        self.peak = traced
+        self.rss = process_rss()
+
+
+class MemoryProfiler:
+    """Takes tracemalloc snapshots around stages and keeps run reports and the RSS trend"""
+
+    def __init__(self, enabled=False, stages=DEFAULT_STAGES, frames=1, top=10, directory=os.path.join('debug', 'memory'),
+                 keep_runs=20, rss_interval_seconds=30, rss_history=720):
+        self.enabled = enabled
+        self.stages = set(stages)
+        self.frames = max(1, int(frames))
+        self.top = top
+        self.directory = directory
+        self.rss_interval_seconds = rss_interval_seconds
+        self.runs = deque(maxlen=keep_runs)
+        self.rss_trend = deque(maxlen=rss_history)
+        self._filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ]
+        self._open = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Build the profiler from the memory_profile config section and JAMI_MEMORY_PROFILE"""
+        enabled = config.get('enabled', False)
+        if 'JAMI_MEMORY_PROFILE' in os.environ:
+            enabled = os.environ['JAMI_MEMORY_PROFILE'].lower() in ('1', 'true', 'on', 'yes')
+        return cls(
+            enabled=enabled,
+            stages=config.get('stages', DEFAULT_STAGES),
+            frames=config.get('frames', 1),
+            top=config.get('top', 10),
+            directory=config.get('directory', os.path.join('debug', 'memory')),
+            keep_runs=config.get('keep_runs', 20),
+            rss_interval_seconds=config.get('rss_interval_seconds', 30),
+            rss_history=config.get('rss_history', 720)
+        )
+
+    def start(self):
+        """Start tracemalloc and the RSS sampler if profiling is enabled"""
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            logging.info(f"tracemalloc started ({self.frames} frame(s) per allocation)")
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._sample_rss, name="rss-sampler", daemon=True)
+            self._thread.start()
+
+    def _sample_rss(self):
+        while True:
+            rss = process_rss()
+            if rss is not None:
+                traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+                with self._lock:
+                    self.rss_trend.append((round(time.time(), 1), rss, traced))
+            time.sleep(self.rss_interval_seconds)
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(self._filters)
+
+    def _fold_peak(self):
+        """
+        Credit the traced peak since the last reset to every open stage, then reset it, so each
+        stage's peak covers exactly its own interval even when stages nest; returns the current size
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        for state in self._open:
+            state.peak = max(state.peak, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def start_stage(self, stage):
+        """Snapshot memory as a profiled stage starts; returns None for stages that are not profiled"""
+        if not self.enabled or stage not in self.stages or not tracemalloc.is_tracing():
+            return None
+        snapshot = self._snapshot()
+        with self._lock:
+            state = StageMemory(stage, snapshot, self._fold_peak())
+            self._open.add(state)
+        run_open = _run_open.get()
+        if run_open is not None:
+            run_open.append(state)
+        return state
+
+    def end_stage(self, state):
+        """Compare memory with the stage start, add the record to the current run and return it"""
+        if state is None:
+            return None
+        with self._lock:
+            if state not in self._open:
+                # Already ended, or dropped when its run ended
+                return None
+            current = self._fold_peak()
+            self._open.discard(state)
+        stats = self._snapshot().compare_to(state.snapshot, 'lineno')
+        rss = process_rss()
+        record = {
+            "stage": state.stage,
+            "deltaBytes": current - state.traced,
+            "tracedBytes": current,
+            "peakBytes": state.peak,
+            "rssBytes": rss,
+            "rssDeltaBytes": rss - state.rss if rss is not None and state.rss is not None else None,
+            "topSites": [
+                {
+                    "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "sizeDiffBytes": stat.size_diff,
+                    "countDiff": stat.count_diff,
+                    "sizeBytes": stat.size
+                }
+                for stat in stats[:self.top] if stat.size_diff > 0
+            ]
+        }
+        stages = _run_stages.get()
+        if stages is not None:
+            stages.append(record)
+        return record
+
+    @contextlib.contextmanager
+    def track_run(self, case_id):
+        """Collect the stage records of the enclosed extraction into a run report"""
+        if not self.enabled:
+            yield None
+            return
+        stages = []
+        run_open = []
+        token = _run_stages.set(stages)
+        open_token = _run_open.set(run_open)
+        started = time.time()
+        rss_start = process_rss()
+        try:
+            yield stages
+        finally:
+            _run_stages.reset(token)
+            _run_open.reset(open_token)
+            self._drop_open(run_open)
+            rss_end = process_rss()
+            report = {
+                "caseId": str(case_id),
+                "startedAt": started,
+                "rssStartBytes": rss_start,
+                "rssEndBytes": rss_end,
+                "stages": stages
+            }
+            with self._lock:
+                self.runs.append(report)
+            self._write(report)
+
+    def _drop_open(self, states):
+        """Forget stages that were started but never ended, releasing their snapshots"""
+        with self._lock:
+            stale = [state for state in states if state in self._open]
+            for state in stale:
+                self._open.discard(state)
+                state.snapshot = None
+        if stale:
+            logging.debug(f"Dropped {len(stale)} memory stage(s) left open: " + ", ".join(state.stage for state in stale))
+
+    def _write(self, report):
+        path = os.path.join(self.directory, f"memory_{report['caseId']}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+        except OSError as e:
+            logging.warning(f"Could not write memory report {path}: {str(e)}")
+            return
+        # Keep as many reports on disk as in memory
+        reports = sorted((name for name in os.listdir(self.directory) if name.startswith('memory_')),
+                         key=lambda name: os.path.getmtime(os.path.join(self.directory, name)), reverse=True)
+        for name in reports[self.runs.maxlen:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+        growth = [(record["stage"], record["deltaBytes"]) for record in report["stages"]]
+        logging.info(f"Memory report for case {report['caseId']} written to {path}: "
+                     + ", ".join(f"{stage} {delta / 1024:+.0f} KB" for stage, delta in growth))
+
+    def top_sites(self, limit=20):
+        """Largest allocation sites currently traced"""
+        if not tracemalloc.is_tracing():
+            return []
+        return [
+            {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "sizeBytes": stat.size, "count": stat.count}
+            for stat in self._snapshot().statistics('lineno')[:limit]
+        ]
+
+    def status(self, history=False):
+        """Return the profiler state as a JSON-serializable dict, with the RSS trend and run reports if history is set"""
+        tracing = tracemalloc.is_tracing()
+        traced, peak = tracemalloc.get_traced_memory() if tracing else (None, None)
+        status = {
+            "enabled": self.enabled,
+            "tracing": tracing,
+            "tracedBytes": traced,
+            "peakBytes": peak,
+            "rssBytes": process_rss()
+        }
+        if history:
+            with self._lock:
+                trend = list(self.rss_trend)
+                runs = list(self.runs)
+            status["rssTrend"] = [{"time": t, "rssBytes": rss, "tracedBytes": traced_bytes} for t, rss, traced_bytes in trend]
+            status["runs"] = runs
+        return status
+
+
+def configure(config):
+    """Create and start the process-wide memory profiler from the memory_profile config section"""
+    global _profiler
+    _profiler = MemoryProfiler.from_config(config)
+    _profiler.start()
+    return _profiler
+
+
+def start_stage(stage):
+    """Stage-start hook used by metrics.StageTimer; a no-op unless memory profiling is configured"""
+    return _profiler.start_stage(stage) if _profiler is not None else None
+
+
+def end_stage(state):
+    return _profiler.end_stage(state) if state is not None else None
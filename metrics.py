@@ -0,0 +1,239 @@
+"""
+Metrics - In-process counters, gauges and histograms rendered in the Prometheus text format
+
+Pipeline code records into the module-level metrics below (mostly through time_stage), and
+other components expose their own state through callbacks registered with the registry, which
+are read only when /metrics is scraped.
+"""
+
+import time
+import bisect
+import functools
+import threading
+
+import run_trace
+import memory_profile
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base for labelled metrics; values are keyed by the tuple of label values"""
+
+    type = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f"{self.name}{format_labels(self.labels, key)} {format_value(value)}" for key, value in values]
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f"{self.name}{format_labels(self.labels, key)} {format_value(value)}" for key, value in values]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self._values[key] = series
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        with self._lock:
+            values = sorted((key, dict(series, counts=list(series["counts"]))) for key, series in self._values.items())
+        lines = self.header()
+        for key, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series["counts"]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(self.labels + ('le',), key + (format_value(float(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {format_value(round(series['sum'], 6))}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {series['count']}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """Counter or gauge whose samples come from callback(), a list of (labels dict, value)"""
+
+    def __init__(self, name, help_text, callback, type="gauge", labels=()):
+        super().__init__(name, help_text, labels)
+        self.type = type
+        self.callback = callback
+
+    def render(self):
+        lines = self.header()
+        for labels, value in self.callback():
+            lines.append(f"{self.name}{format_labels(self.labels, self._key(labels))} {format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def callback(self, name, help_text, callback, type="gauge", labels=()):
+        """Register a metric read from callback() at scrape time"""
+        return self.register(CallbackMetric(name, help_text, callback, type, labels))
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f"# {metric.name} unavailable: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "jami_stage_duration_seconds", "Time spent in each extraction and export pipeline stage", ["stage"]
+))
+STAGE_FAILURES = REGISTRY.register(Counter(
+    "jami_stage_failures_total", "Pipeline stages that failed (raised, or ended without reaching their goal)", ["stage"]
+))
+EXTRACTIONS = REGISTRY.register(Counter(
+    "jami_extractions_total", "Case extractions by outcome (success, failure)", ["result"]
+))
+EXPORTS = REGISTRY.register(Counter(
+    "jami_exports_total", "Exports generated by format", ["format"]
+))
+RESULT_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "jami_result_cache_lookups_total", "Stored-result freshness checks by outcome (hit, miss)", ["result"]
+))
+
+
+class StageTimer:
+    """
+    Times one stage into the stage histogram, and as a span of the current run trace if there
+    is one; with memory profiling on, the stage's memory growth is recorded too (outside the
+    timed interval). Use as a context manager or call stop() where the stage ends
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.memory = memory_profile.start_stage(stage)
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.span = run_trace.start_span(stage, kind="stage")
+
+    def stop(self, failed=False, status=None, **attrs):
+        if self.seconds is None:
+            self.seconds = time.perf_counter() - self.started
+            STAGE_SECONDS.observe(self.seconds, stage=self.stage)
+            if failed:
+                STAGE_FAILURES.inc(stage=self.stage)
+            memory = memory_profile.end_stage(self.memory)
+            if memory is not None:
+                attrs.update(memDeltaBytes=memory["deltaBytes"], memPeakBytes=memory["peakBytes"])
+            run_trace.end_span(self.span, status or ("error" if failed else "ok"), **attrs)
+        return self.seconds
+
+    def fail(self, exc):
+        """Stop the stage as failed by exc, unless it already ended"""
+        return self.stop(failed=True, status=run_trace.outcome(exc), error=str(exc)[:200])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.stop()
+        else:
+            self.fail(exc)
+        return False
+
+
+def time_stage(stage):
+    """Start timing a pipeline stage"""
+    return StageTimer(stage)
+
+
+def timed_stage(stage):
+    """Decorator timing every call of a function as the given stage"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with time_stage(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,202 @@
+"""
+Profiling - Opt-in sampling profiler for request hot paths, writing flame-graph stacks
+
+A profiled block registers its thread with a shared sampler thread, which reads the thread's
+stack every interval_ms through sys._current_frames(). When the block ends, the samples are
+written to the profile directory in the collapsed-stack format ("outer;inner;leaf count" per
+line), which flamegraph.pl, speedscope and inferno read directly. Nested profiled blocks on
+the same thread are part of the outer profile. Only the newest keep profiles are kept.
+Profile whole phases (a request, a job, a parsing pass) rather than small functions: a call
+shorter than the sampling interval rarely gets a sample at all.
+
+Profiling is off unless enabled in the profiling config section or by JAMI_PROFILE; when on,
+a sample_rate fraction of calls is profiled (JAMI_PROFILE_SAMPLE_RATE). A request can also
+ask for a profile by sending the profiling header, which works even while sampling is off.
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import threading
+import contextlib
+from collections import Counter
+
+
+class ProfileSession:
+    """Stack samples of one profiled block"""
+
+    def __init__(self, name, thread_id):
+        self.name = name
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.stacks = Counter()
+
+
+def collapse_stack(frame):
+    """Render a frame's stack, outermost call first, as one collapsed-stack line"""
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Profiles selected blocks by sampling their thread's stack from a background thread"""
+
+    def __init__(self, enabled=False, sample_rate=0.05, interval_ms=5, directory=os.path.join('debug', 'profiles'),
+                 keep=200, header='X-Jami-Profile', allow_header=True):
+        self.enabled = enabled
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        self.interval_seconds = max(1, int(interval_ms)) / 1000
+        self.directory = directory
+        self.keep = max(1, int(keep))
+        self.header = header
+        self.allow_header = allow_header
+        self.profiles_written = 0
+        self.samples = 0
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Build the profiler from the profiling config section and JAMI_PROFILE* environment variables"""
+        enabled = config.get('enabled', False)
+        if 'JAMI_PROFILE' in os.environ:
+            enabled = os.environ['JAMI_PROFILE'].lower() in ('1', 'true', 'on', 'yes')
+        return cls(
+            enabled=enabled,
+            sample_rate=os.environ.get('JAMI_PROFILE_SAMPLE_RATE', config.get('sample_rate', 0.05)),
+            interval_ms=os.environ.get('JAMI_PROFILE_INTERVAL_MS', config.get('interval_ms', 5)),
+            directory=config.get('directory', os.path.join('debug', 'profiles')),
+            keep=config.get('keep', 200),
+            header=config.get('header', 'X-Jami-Profile'),
+            allow_header=config.get('allow_header', True)
+        )
+
+    def requested(self, headers):
+        """Return whether request headers ask for this request to be profiled"""
+        if not self.allow_header:
+            return False
+        return str(headers.get(self.header, '')).lower() in ('1', 'true', 'on', 'yes')
+
+    def should_profile(self, force=False):
+        """Decide whether to profile a call: always when forced, else a sample_rate fraction while enabled"""
+        if force:
+            return True
+        return self.enabled and self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, name, force=False):
+        """
+        Start profiling this thread if the call is selected and no profile is running on it yet;
+        returns the session to pass to stop(), or None
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            if thread_id in self._sessions:
+                return None
+        if not self.should_profile(force):
+            return None
+
+        session = ProfileSession(name, thread_id)
+        with self._lock:
+            self._sessions[thread_id] = session
+            self._ensure_sampler()
+            self._wake.set()
+        return session
+
+    def stop(self, session):
+        """Stop a session started by start() and write its profile"""
+        if session is None:
+            return None
+        with self._lock:
+            if self._sessions.get(session.thread_id) is not session:
+                return None
+            del self._sessions[session.thread_id]
+        return self._write(session)
+
+    @contextlib.contextmanager
+    def profile(self, name, force=False):
+        """Profile the enclosed block on this thread if it is selected; yields the session or None"""
+        session = self.start(name, force)
+        try:
+            yield session
+        finally:
+            self.stop(session)
+
+    def _ensure_sampler(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                sessions = list(self._sessions.values())
+                if not sessions:
+                    # Cleared under the lock start() sets it under, so a new session always wakes us
+                    self._wake.clear()
+            if not sessions:
+                self._wake.wait()
+                continue
+            frames = sys._current_frames()
+            for session in sessions:
+                frame = frames.get(session.thread_id)
+                if frame is not None:
+                    session.stacks[collapse_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval_seconds)
+
+    def _write(self, session):
+        """Write a session's samples as a collapsed-stack file and drop the oldest profiles"""
+        sample_count = sum(session.stacks.values())
+        if not sample_count:
+            return None
+        elapsed_ms = (time.perf_counter() - session.started) * 1000
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(self.directory, f"{session.name}_{stamp}_{session.thread_id % 100000}.folded")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in session.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            logging.warning(f"Could not write profile {path}: {str(e)}")
+            return None
+        with self._lock:
+            self.profiles_written += 1
+            self.samples += sample_count
+        logging.info(f"Wrote profile of {session.name} ({elapsed_ms:.0f} ms, {sample_count} samples) to {path}")
+        self._prune()
+        return path
+
+    def _prune(self):
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.folded')]
+        except FileNotFoundError:
+            return
+        paths = sorted((os.path.join(self.directory, name) for name in names), key=os.path.getmtime, reverse=True)
+        for path in paths[self.keep:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def status(self):
+        """Return the profiler settings and counts as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sampleRate": self.sample_rate,
+                "intervalMs": round(self.interval_seconds * 1000),
+                "header": self.header if self.allow_header else None,
+                "directory": self.directory,
+                "active": len(self._sessions),
+                "profilesWritten": self.profiles_written,
+                "samples": self.samples
+            }
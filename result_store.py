@@ -0,0 +1,122 @@
+"""
+Result Store - Keeps extracted case results out of the Flask session
+
+Each case result is split into named parts (case_data, updates, dollar_records, ...) that are
+stored as zlib-compressed JSON in a SQLite database keyed by case ID. The session only keeps
+the key, and each endpoint loads just the parts it needs.
+"""
+
+import os
+import json
+import zlib
+import hashlib
+import time
+import sqlite3
+import logging
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    result_id TEXT NOT NULL,
+    part TEXT NOT NULL,
+    data BLOB NOT NULL,
+    raw_size INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (result_id, part)
+)
+"""
+
+
+def fingerprint(*values):
+    """Short content hash of JSON-serializable values, used as an ETag for stored results"""
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class ResultStore:
+    """SQLite-backed store of compressed result parts"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(SCHEMA)
+        conn.commit()
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._local.conn = conn
+        return conn
+
+    def put(self, result_id, parts):
+        """Store (or replace) the given {part: value} mapping for a result"""
+        rows = []
+        for part, value in parts.items():
+            raw = json.dumps(value, default=str).encode('utf-8')
+            rows.append((str(result_id), part, zlib.compress(raw, 6), len(raw), time.time()))
+
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO results (result_id, part, data, raw_size, updated_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+        logging.info(f"Stored result parts for {result_id}: " +
+                     ", ".join(f"{row[1]} ({len(row[2])} of {row[3]} bytes)" for row in rows))
+
+    def get(self, result_id, part, default=None):
+        """Load a single part, or default if it is not stored"""
+        if result_id is None:
+            return default
+        row = self._connection().execute(
+            "SELECT data FROM results WHERE result_id = ? AND part = ?",
+            (str(result_id), part)
+        ).fetchone()
+        if row is None:
+            return default
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def has(self, result_id, part):
+        """Return True if the part is stored, without decompressing it"""
+        if result_id is None:
+            return False
+        row = self._connection().execute(
+            "SELECT 1 FROM results WHERE result_id = ? AND part = ?",
+            (str(result_id), part)
+        ).fetchone()
+        return row is not None
+
+    def result_ids(self, part='case_data'):
+        """Return the IDs of every result that has the given part, most recently updated first"""
+        rows = self._connection().execute(
+            "SELECT result_id FROM results WHERE part = ? ORDER BY updated_at DESC",
+            (part,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, result_id):
+        """Remove every part of a result"""
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM results WHERE result_id = ?", (str(result_id),))
+
+    def status(self):
+        """Return store details as a JSON-serializable dict"""
+        row = self._connection().execute(
+            "SELECT COUNT(DISTINCT result_id), COALESCE(SUM(LENGTH(data)), 0), COALESCE(SUM(raw_size), 0) FROM results"
+        ).fetchone()
+        return {
+            "path": self.path,
+            "results": row[0],
+            "storedBytes": row[1],
+            "rawBytes": row[2]
+        }
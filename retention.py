@@ -0,0 +1,178 @@
+"""
+Retention - Periodically trims debug output, exports and session files to size, count and age caps
+
+Each configured directory is treated as a set of top-level entries (files, or directories such
+as a columnar export, measured as a whole). Entries older than max_age_days are removed first,
+then the oldest entries until the directory is back under max_files and max_bytes. Entries a
+protect callback claims (e.g. files of running jobs) and names listed in exclude are never removed.
+"""
+
+import os
+import time
+import shutil
+import logging
+import threading
+
+
+def entry_stats(path):
+    """Return (total bytes, newest modification time) of a file or directory tree"""
+    if not os.path.isdir(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime
+    total = 0
+    newest = os.stat(path).st_mtime
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                stat = os.stat(os.path.join(root, filename))
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            newest = max(newest, stat.st_mtime)
+    return total, newest
+
+
+class RetentionRule:
+    """Caps for one directory; a cap of None is not enforced"""
+
+    def __init__(self, directory, max_bytes=None, max_files=None, max_age_days=None, exclude=()):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.max_age_seconds = max_age_days * 86400 if max_age_days is not None else None
+        self.exclude = set(exclude)
+        self.files_removed = 0
+        self.bytes_reclaimed = 0
+        self.current_files = 0
+        self.current_bytes = 0
+
+    def status(self):
+        return {
+            "maxBytes": self.max_bytes,
+            "maxFiles": self.max_files,
+            "maxAgeSeconds": self.max_age_seconds,
+            "files": self.current_files,
+            "bytes": self.current_bytes,
+            "filesRemoved": self.files_removed,
+            "bytesReclaimed": self.bytes_reclaimed
+        }
+
+
+class RetentionManager:
+    """Applies retention rules on a background thread every interval_seconds"""
+
+    def __init__(self, rules, interval_seconds=600, protect=None, extra_sweeps=()):
+        self.rules = rules
+        self.interval_seconds = interval_seconds
+        self.protect = protect or (lambda path: False)
+        self.extra_sweeps = list(extra_sweeps)
+        self.sweeps = 0
+        self.last_sweep_at = None
+        self.last_sweep_ms = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config, protect=None, extra_sweeps=()):
+        """Build the manager from the retention config section"""
+        rules = [
+            RetentionRule(
+                directory,
+                max_bytes=caps.get('max_bytes'),
+                max_files=caps.get('max_files'),
+                max_age_days=caps.get('max_age_days'),
+                exclude=caps.get('exclude', ())
+            )
+            for directory, caps in config.get('directories', {}).items()
+        ]
+        return cls(rules, config.get('interval_seconds', 600), protect=protect, extra_sweeps=extra_sweeps)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.exception(f"Retention sweep failed: {str(e)}")
+            self._stop.wait(self.interval_seconds)
+
+    def sweep(self):
+        """Apply every rule once; returns the bytes reclaimed"""
+        with self._lock:
+            started = time.time()
+            reclaimed = sum(self._apply(rule, started) for rule in self.rules)
+            for extra_sweep in self.extra_sweeps:
+                reclaimed += extra_sweep()
+            self.sweeps += 1
+            self.last_sweep_at = started
+            self.last_sweep_ms = round((time.time() - started) * 1000, 1)
+        if reclaimed:
+            logging.info(f"Retention sweep reclaimed {reclaimed} bytes in {self.last_sweep_ms} ms")
+        return reclaimed
+
+    def _apply(self, rule, now):
+        if not os.path.isdir(rule.directory):
+            return 0
+
+        entries = []
+        for name in os.listdir(rule.directory):
+            if name in rule.exclude:
+                continue
+            path = os.path.join(rule.directory, name)
+            try:
+                size, mtime = entry_stats(path)
+            except FileNotFoundError:
+                continue
+            entries.append((mtime, path, size))
+        entries.sort()
+
+        total_bytes = sum(size for _, _, size in entries)
+        total_files = len(entries)
+        reclaimed = 0
+        for mtime, path, size in entries:
+            expired = rule.max_age_seconds is not None and now - mtime > rule.max_age_seconds
+            over_count = rule.max_files is not None and total_files > rule.max_files
+            over_size = rule.max_bytes is not None and total_bytes > rule.max_bytes
+            if not (expired or over_count or over_size):
+                # Entries are oldest first, so nothing later is expired either
+                break
+            if self.protect(path):
+                continue
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError as e:
+                logging.warning(f"Retention could not remove {path}: {str(e)}")
+                continue
+            total_bytes -= size
+            total_files -= 1
+            reclaimed += size
+            rule.files_removed += 1
+            rule.bytes_reclaimed += size
+
+        rule.current_files = total_files
+        rule.current_bytes = total_bytes
+        if reclaimed:
+            logging.info(f"Retention removed {reclaimed} bytes from {rule.directory}")
+        return reclaimed
+
+    def status(self):
+        """Return per-directory usage and reclaimed totals as a JSON-serializable dict"""
+        return {
+            "intervalSeconds": self.interval_seconds,
+            "sweeps": self.sweeps,
+            "lastSweepAt": self.last_sweep_at,
+            "lastSweepMs": self.last_sweep_ms,
+            "bytesReclaimed": sum(rule.bytes_reclaimed for rule in self.rules),
+            "directories": {rule.directory: rule.status() for rule in self.rules}
+        }
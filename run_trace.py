@@ -0,0 +1,302 @@
+"""
+Run Trace - Structured per-run traces of case extractions, stored in SQLite
+
+A trace is started for each extraction and made current for the task running it. Stage timers,
+selector attempts and page waits record spans (name, kind, start and end relative to the run,
+outcome and attributes such as byte counts) into the current trace; outside a traced run they
+are no-ops. Finished traces are saved to a local SQLite database, which can be queried for the
+slowest runs over a time window and for the span waterfall of any run.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+import contextlib
+import contextvars
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    case_id TEXT,
+    job_id TEXT,
+    started_at REAL NOT NULL,
+    duration_ms REAL NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    attrs TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started_at);
+CREATE TABLE IF NOT EXISTS spans (
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    parent_seq INTEGER,
+    start_ms REAL NOT NULL,
+    duration_ms REAL,
+    status TEXT,
+    attrs TEXT,
+    PRIMARY KEY (run_id, seq)
+);
+"""
+
+_current = contextvars.ContextVar('run_trace', default=None)
+# Innermost open span of the task or thread; new spans become its children. Work handed to a
+# thread in a copy of the context is parented to the span that was open when it was handed off
+_current_span = contextvars.ContextVar('run_trace_span', default=None)
+
+
+class Span:
+    """One timed step of a run; attrs can be added until it ends"""
+
+    def __init__(self, trace, seq, name, kind, parent, attrs):
+        self.trace = trace
+        self.seq = seq
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end = None
+        self.status = None
+
+
+class RunTrace:
+    """Spans and run-level attributes of one extraction"""
+
+    def __init__(self, case_id=None, job_id=None):
+        self.run_id = uuid.uuid4().hex
+        self.case_id = str(case_id) if case_id is not None else None
+        self.job_id = job_id
+        self.started_at = time.time()
+        self.attrs = {}
+        self.spans = []
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def start_span(self, name, kind="stage", parent=None, **attrs):
+        with self._lock:
+            span = Span(self, len(self.spans), name, kind, parent, attrs)
+            self.spans.append(span)
+        return span
+
+    def end_span(self, span, status="ok", **attrs):
+        with self._lock:
+            if span.end is not None:
+                return
+            span.end = time.perf_counter()
+            span.status = status
+            span.attrs.update(attrs)
+
+    def add(self, key, amount=1):
+        """Add to a run-level counter such as responseBytes"""
+        with self._lock:
+            self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def elapsed_ms(self, at=None):
+        return ((at if at is not None else time.perf_counter()) - self._t0) * 1000
+
+
+def current():
+    """The trace of the run executing in this task or thread, or None"""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def activate(trace):
+    """Make trace current for the enclosed block"""
+    token = _current.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current.reset(token)
+
+
+def _open_ancestor(span):
+    while span is not None and span.end is not None:
+        span = span.parent
+    return span
+
+
+def start_span(name, kind="stage", **attrs):
+    """Start a child of the innermost open span in the current trace; returns None when no run is being traced"""
+    trace = _current.get()
+    if trace is None:
+        return None
+    parent = _open_ancestor(_current_span.get())
+    if parent is not None and parent.trace is not trace:
+        parent = None
+    span = trace.start_span(name, kind, parent, **attrs)
+    _current_span.set(span)
+    return span
+
+
+def end_span(span, status="ok", **attrs):
+    if span is None:
+        return
+    span.trace.end_span(span, status, **attrs)
+    # Spans ended out of order leave the innermost one open; otherwise return to the parent
+    if _current_span.get() is span:
+        _current_span.set(_open_ancestor(span.parent))
+
+
+def outcome(exc):
+    """Span status for an exception: 'timeout' for Playwright and asyncio timeouts, else 'error'"""
+    return "timeout" if "Timeout" in type(exc).__name__ else "error"
+
+
+@contextlib.contextmanager
+def span(name, kind="stage", **attrs):
+    """Record the enclosed block as a span; an exception marks it timeout or error and propagates"""
+    current_span = start_span(name, kind, **attrs)
+    try:
+        yield current_span
+    except BaseException as e:
+        end_span(current_span, outcome(e), error=str(e)[:200])
+        raise
+    end_span(current_span)
+
+
+class TraceStore:
+    """SQLite storage of finished run traces"""
+
+    def __init__(self, path, retention_days=14):
+        self.path = path
+        self.retention_seconds = retention_days * 86400 if retention_days else None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._saved = 0
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        # Databases created before spans recorded their parent
+        if "parent_seq" not in [row[1] for row in conn.execute("PRAGMA table_info(spans)")]:
+            conn.execute("ALTER TABLE spans ADD COLUMN parent_seq INTEGER")
+            conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._local.conn = conn
+        return conn
+
+    def save(self, trace, status, error=None):
+        """Store a finished trace; spans still open are saved as 'unfinished'"""
+        end = time.perf_counter()
+        rows = []
+        for item in trace.spans:
+            rows.append((
+                trace.run_id,
+                item.seq,
+                item.name,
+                item.kind,
+                item.depth,
+                item.parent.seq if item.parent is not None else None,
+                round(trace.elapsed_ms(item.start), 2),
+                round((item.end - item.start) * 1000, 2) if item.end is not None else None,
+                item.status or "unfinished",
+                json.dumps(item.attrs, default=str) if item.attrs else None
+            ))
+        conn = self._connection()
+        with self._write_lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, case_id, job_id, started_at, duration_ms, status, error, attrs) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (trace.run_id, trace.case_id, trace.job_id, trace.started_at, round(trace.elapsed_ms(end), 2),
+                 status, error, json.dumps(trace.attrs, default=str) if trace.attrs else None)
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO spans (run_id, seq, name, kind, depth, parent_seq, start_ms, duration_ms, status, attrs) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+            self._saved += 1
+            prune = self.retention_seconds is not None and self._saved % 50 == 1
+        if prune:
+            self.prune()
+        logging.info(f"Saved trace {trace.run_id} for case {trace.case_id}: {len(rows)} spans, {status}")
+
+    def prune(self):
+        """Delete runs older than the retention window"""
+        cutoff = time.time() - self.retention_seconds
+        conn = self._connection()
+        with self._write_lock:
+            conn.execute("DELETE FROM spans WHERE run_id IN (SELECT run_id FROM runs WHERE started_at < ?)", (cutoff,))
+            conn.execute("DELETE FROM runs WHERE started_at < ?", (cutoff,))
+            conn.commit()
+
+    @staticmethod
+    def _run_dict(row):
+        return {
+            "runId": row[0],
+            "caseId": row[1],
+            "jobId": row[2],
+            "startedAt": row[3],
+            "durationMs": row[4],
+            "status": row[5],
+            "error": row[6],
+            "attrs": json.loads(row[7]) if row[7] else {}
+        }
+
+    def slowest(self, limit=20, since_seconds=86400, status=None):
+        """The slowest runs started within the last since_seconds, slowest first"""
+        query = ("SELECT run_id, case_id, job_id, started_at, duration_ms, status, error, attrs FROM runs "
+                 "WHERE started_at >= ?")
+        params = [time.time() - since_seconds]
+        if status:
+            # Runs that raised were stored as 'error' before all failed runs were saved as 'failure'
+            statuses = [status, "error"] if status == "failure" else [status]
+            query += f" AND status IN ({', '.join('?' * len(statuses))})"
+            params.extend(statuses)
+        query += " ORDER BY duration_ms DESC LIMIT ?"
+        params.append(limit)
+        return [self._run_dict(row) for row in self._connection().execute(query, params).fetchall()]
+
+    def waterfall(self, run_id):
+        """A run with its spans in start order, or None if it is not stored"""
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT run_id, case_id, job_id, started_at, duration_ms, status, error, attrs FROM runs WHERE run_id = ?",
+            (run_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        run = self._run_dict(row)
+        run["spans"] = [
+            {
+                "seq": span_row[0],
+                "parentSeq": span_row[1],
+                "name": span_row[2],
+                "kind": span_row[3],
+                "depth": span_row[4],
+                "startMs": span_row[5],
+                "durationMs": span_row[6],
+                "status": span_row[7],
+                "attrs": json.loads(span_row[8]) if span_row[8] else {}
+            }
+            for span_row in conn.execute(
+                "SELECT seq, parent_seq, name, kind, depth, start_ms, duration_ms, status, attrs FROM spans "
+                "WHERE run_id = ? ORDER BY start_ms, seq",
+                (run_id,)
+            ).fetchall()
+        ]
+        return run
+
+    def status(self):
+        runs, spans = self._connection().execute(
+            "SELECT (SELECT COUNT(*) FROM runs), (SELECT COUNT(*) FROM spans)"
+        ).fetchone()
+        return {"path": self.path, "runs": runs, "spans": spans}
@@ -0,0 +1,234 @@
+"""
+Snapshot Store - Content-addressed, compressed storage for debug page dumps and screenshots
+
+Each captured page is hashed and stored once under objects/, compressed with zstandard when
+it is installed and gzip otherwise. A small SQLite index maps (name, case, stage, timestamp)
+to the content hash, so near-identical captures across runs cost a single index row.
+"""
+
+import os
+import sys
+import gzip
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    case_id TEXT,
+    stage TEXT,
+    hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_name ON snapshots (name, created_at);
+CREATE INDEX IF NOT EXISTS idx_snapshots_case ON snapshots (case_id, created_at);
+CREATE TABLE IF NOT EXISTS objects (
+    hash TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL
+);
+"""
+
+# Already-compressed formats are stored as-is
+RAW_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.zip')
+
+
+class SnapshotStore:
+    """Deduplicating store of debug captures"""
+
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, 'index.db'), timeout=10)
+            self._local.conn = conn
+        return conn
+
+    def _object_path(self, digest, codec):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.{codec}")
+
+    def _compress(self, name, data):
+        if name.lower().endswith(RAW_EXTENSIONS):
+            return 'raw', data
+        if zstandard is not None:
+            return 'zst', zstandard.ZstdCompressor(level=10).compress(data)
+        return 'gz', gzip.compress(data, compresslevel=6)
+
+    @staticmethod
+    def _decompress(codec, data):
+        if codec == 'zst':
+            return zstandard.ZstdDecompressor().decompress(data)
+        if codec == 'gz':
+            return gzip.decompress(data)
+        return data
+
+    def put(self, name, data, case_id=None, stage=None):
+        """Store a capture under name, writing its content only if it is not stored yet"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        conn = self._connection()
+
+        with self._write_lock:
+            row = conn.execute("SELECT codec FROM objects WHERE hash = ?", (digest,)).fetchone()
+            if row is None:
+                codec, stored = self._compress(name, data)
+                path = self._object_path(digest, codec)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(stored)
+                conn.execute("INSERT INTO objects (hash, codec, size, stored_size) VALUES (?, ?, ?, ?)",
+                             (digest, codec, len(data), len(stored)))
+            conn.execute(
+                "INSERT INTO snapshots (name, case_id, stage, hash, size, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, str(case_id) if case_id is not None else None, stage, digest, len(data), time.time())
+            )
+            conn.commit()
+        return digest
+
+    def get(self, name):
+        """Return the content of the latest capture stored under name, or None"""
+        row = self._connection().execute(
+            "SELECT o.hash, o.codec FROM snapshots s JOIN objects o ON s.hash = o.hash "
+            "WHERE s.name = ? ORDER BY s.created_at DESC LIMIT 1",
+            (name,)
+        ).fetchone()
+        if row is None:
+            return None
+        with open(self._object_path(row[0], row[1]), 'rb') as f:
+            return self._decompress(row[1], f.read())
+
+    def list(self, case_id=None):
+        """List the latest capture for each name, newest first"""
+        query = ("SELECT s.name, s.case_id, s.stage, s.hash, s.size, o.stored_size, MAX(s.created_at) "
+                 "FROM snapshots s JOIN objects o ON s.hash = o.hash")
+        params = ()
+        if case_id is not None:
+            query += " WHERE s.case_id = ?"
+            params = (str(case_id),)
+        query += " GROUP BY s.name ORDER BY MAX(s.created_at) DESC"
+        return [
+            {
+                "name": row[0],
+                "caseId": row[1],
+                "stage": row[2],
+                "hash": row[3],
+                "size": row[4],
+                "storedSize": row[5],
+                "createdAt": row[6]
+            }
+            for row in self._connection().execute(query, params).fetchall()
+        ]
+
+    def status(self):
+        """Return store totals as a JSON-serializable dict"""
+        conn = self._connection()
+        snapshots, logical = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM snapshots").fetchone()
+        objects, stored = conn.execute("SELECT COUNT(*), COALESCE(SUM(stored_size), 0) FROM objects").fetchone()
+        return {
+            "path": self.root,
+            "codec": "zstd" if zstandard is not None else "gzip",
+            "snapshots": snapshots,
+            "objects": objects,
+            "logicalBytes": logical,
+            "storedBytes": stored
+        }
+
+    def prune(self, max_age_seconds=None, max_bytes=None, keep_case_ids=()):
+        """
+        Forget captures older than max_age_seconds, then the oldest until stored objects fit in
+        max_bytes, and delete objects no capture refers to any more. Captures of keep_case_ids
+        are kept. Returns the stored bytes reclaimed.
+        """
+        conn = self._connection()
+        keep = [str(case_id) for case_id in keep_case_ids]
+        keep_clause = f" AND (case_id IS NULL OR case_id NOT IN ({','.join('?' * len(keep))}))" if keep else ""
+
+        with self._write_lock:
+            if max_age_seconds is not None:
+                conn.execute(f"DELETE FROM snapshots WHERE created_at < ?{keep_clause}",
+                             [time.time() - max_age_seconds] + keep)
+            if max_bytes is not None:
+                while True:
+                    stored = conn.execute(
+                        "SELECT COALESCE(SUM(stored_size), 0) FROM objects WHERE hash IN (SELECT hash FROM snapshots)"
+                    ).fetchone()[0]
+                    if stored <= max_bytes:
+                        break
+                    cursor = conn.execute(
+                        f"DELETE FROM snapshots WHERE id IN (SELECT id FROM snapshots WHERE 1 = 1{keep_clause} "
+                        "ORDER BY created_at LIMIT 50)",
+                        keep
+                    )
+                    if cursor.rowcount == 0:
+                        break
+
+            orphans = conn.execute(
+                "SELECT hash, codec, stored_size FROM objects WHERE hash NOT IN (SELECT hash FROM snapshots)"
+            ).fetchall()
+            reclaimed = 0
+            for digest, codec, stored_size in orphans:
+                try:
+                    os.remove(self._object_path(digest, codec))
+                except FileNotFoundError:
+                    pass
+                conn.execute("DELETE FROM objects WHERE hash = ?", (digest,))
+                reclaimed += stored_size
+            conn.commit()
+
+        if orphans:
+            logging.info(f"Pruned {len(orphans)} snapshot objects ({reclaimed} bytes)")
+        return reclaimed
+
+    def import_directory(self, directory, remove=False):
+        """Move existing .html and .png dumps from a directory into the store"""
+        imported = 0
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(('.html', '.png')):
+                continue
+            file_path = os.path.join(directory, filename)
+            with open(file_path, 'rb') as f:
+                self.put(filename, f.read())
+            imported += 1
+            if remove:
+                os.remove(file_path)
+        logging.info(f"Imported {imported} debug files from {directory}")
+        return imported
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manage the debug snapshot store")
+    parser.add_argument('--root', default=os.path.join('debug', 'snapshots'), help="Snapshot store directory")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help="Import existing .html/.png debug dumps")
+    import_parser.add_argument('directory')
+    import_parser.add_argument('--remove', action='store_true', help="Delete the files once imported")
+    subparsers.add_parser('status', help="Show store totals")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    store = SnapshotStore(args.root)
+    if args.command == 'import':
+        store.import_directory(args.directory, remove=args.remove)
+    else:
+        for key, value in store.status().items():
+            sys.stdout.write(f"{key}: {value}\n")
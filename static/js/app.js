@@ -32,7 +32,9 @@ const appState = {
     processing: false,
     caseData: null,
     dbData: null,
-    updates: []
+    updates: [],
+    caseFingerprint: null,
+    caseCachedAt: null
 };
 
 // Initialize the application
@@ -163,11 +165,21 @@ async function extractCaseData() {
     updateStatus('Retrieving case information...');
     
     try {
-        const response = await fetch('/api/case-data');
-        const data = await response.json();
+        // Extraction runs as a background job; a fresh cached result comes back directly
+        const response = await fetch('/api/case-data', { method: 'POST' });
+        let data = await response.json();
+        if (data.success && data.jobId) {
+            data = await waitForJob(data.jobId);
+        }
         
         if (data.success) {
-            updateStatus('Case information retrieved successfully!');
+            appState.caseFingerprint = data.fingerprint;
+            appState.caseCachedAt = data.cached ? data.cachedAt : null;
+            if (data.cached) {
+                updateStatus(`Using case information extracted at ${new Date(data.cachedAt).toLocaleTimeString()}`);
+            } else {
+                updateStatus('Case information retrieved successfully!');
+            }
             return data.data;
         } else {
             updateStatus(`Failed to retrieve case data: ${data.message}`);
@@ -179,6 +191,98 @@ async function extractCaseData() {
     }
 }
 
+// Wait for an extraction job, streaming its progress and updates when the browser supports it
+async function waitForJob(jobId) {
+    if (window.EventSource) {
+        const finished = await streamJobEvents(jobId);
+        if (finished) {
+            const response = await fetch(`/api/jobs/${jobId}`);
+            const data = await response.json();
+            return data.job && data.job.status === 'done' ? data.result : { success: false, message: data.message };
+        }
+    }
+    return pollJob(jobId);
+}
+
+// Follow a job's event stream, adding each update to the live table as it arrives.
+// Resolves true once the job has finished, or false if the stream failed and polling should take over
+function streamJobEvents(jobId) {
+    clearLiveUpdates();
+    return new Promise(resolve => {
+        const source = new EventSource(`/api/jobs/${jobId}/events`);
+        let jobFinished = false;
+        
+        source.addEventListener('stage', event => {
+            const data = JSON.parse(event.data);
+            if (data.message) {
+                updateStatus(data.message);
+            }
+            const stages = ['queued', 'login', 'case_page', 'updates', 'database', 'done'];
+            const index = stages.indexOf(data.stage);
+            if (index >= 0) {
+                updateProgress(20 + Math.round(20 * index / (stages.length - 1)));
+            }
+        });
+        source.addEventListener('update', event => {
+            addLiveUpdate(JSON.parse(event.data));
+        });
+        ['done', 'failed'].forEach(name => source.addEventListener(name, () => {
+            jobFinished = true;
+            source.close();
+            resolve(true);
+        }));
+        source.onerror = () => {
+            // The browser retries by itself; give up on streaming only if it closed the connection
+            if (!jobFinished && source.readyState === EventSource.CLOSED) {
+                resolve(false);
+            }
+            if (!appState.processing) {
+                source.close();
+                resolve(false);
+            }
+        };
+    });
+}
+
+// Clear the live updates table before a new extraction
+function clearLiveUpdates() {
+    document.querySelector('#live-updates-table tbody').innerHTML = '';
+    document.getElementById('live-updates').classList.remove('visible');
+}
+
+// Append one extracted update to the live updates table
+function addLiveUpdate(update) {
+    document.getElementById('live-updates').classList.add('visible');
+    document.querySelector('#live-updates-table tbody').appendChild(renderUpdateRow(update));
+}
+
+// Poll an extraction job until it finishes, returning its result
+async function pollJob(jobId) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        if (!appState.processing) {
+            throw new Error('Cancelled');
+        }
+        
+        const response = await fetch(`/api/jobs/${jobId}`);
+        const data = await response.json();
+        if (!data.job) {
+            return data;
+        }
+        
+        if (data.job.status === 'done') {
+            return data.result;
+        }
+        if (data.job.status === 'failed') {
+            return { success: false, message: data.message };
+        }
+        
+        // Case extraction covers 20-40% of the overall progress bar
+        updateStatus(data.job.message);
+        updateProgress(20 + Math.round(data.job.progress / 5));
+    }
+}
+
 // Query database via API
 async function queryDatabase() {
     updateStatus('Connecting to database...');
@@ -295,22 +399,7 @@ function displayResults() {
     });
     
     updatesWithDollarAmounts.forEach(update => {
-        let feeTypeDisplay = update.feeType;
-        
-        if (update.feeType !== 'N/A') {
-            // Find color for this fee type
-            const categoryColor = getCategoryColor(update.feeType);
-            feeTypeDisplay = `<span class="category-tag" style="background-color: ${categoryColor}">${update.feeType}</span>`;
-        }
-        
-        const row = document.createElement('tr');
-        row.innerHTML = `
-            <td>${update.date}</td>
-            <td>${update.details}</td>
-            <td>${update.feeType !== 'N/A' ? feeTypeDisplay : 'N/A'}</td>
-            <td>${update.amountStr}</td>
-        `;
-        updatesTableBody.appendChild(row);
+        updatesTableBody.appendChild(renderUpdateRow(update));
     });
     
     // Add category tag styles if not already added
@@ -331,6 +420,26 @@ function displayResults() {
     }
 }
 
+// Build a table row for an update
+function renderUpdateRow(update) {
+    let feeTypeDisplay = update.feeType;
+    
+    if (update.feeType !== 'N/A') {
+        // Find color for this fee type
+        const categoryColor = getCategoryColor(update.feeType);
+        feeTypeDisplay = `<span class="category-tag" style="background-color: ${categoryColor}">${update.feeType}</span>`;
+    }
+    
+    const row = document.createElement('tr');
+    row.innerHTML = `
+        <td>${update.date}</td>
+        <td>${update.details}</td>
+        <td>${update.feeType !== 'N/A' ? feeTypeDisplay : 'N/A'}</td>
+        <td>${update.amountStr}</td>
+    `;
+    return row;
+}
+
 // Helper function to get category color
 function getCategoryColor(category) {
     const categoryColors = {
@@ -513,19 +622,24 @@ function exportToPdf() {
 async function exportToExcel() {
     try {
         const response = await fetch('/api/export/excel');
-        const data = await response.json();
         
-        if (data.success) {
-            // Create a temporary link to download the file
-            const link = document.createElement('a');
-            link.href = data.file_url;
-            link.download = `JamiBilling_Case_${appState.caseData.caseId}.xlsx`;
-            document.body.appendChild(link);
-            link.click();
-            document.body.removeChild(link);
-        } else {
+        // Errors come back as JSON; a successful export is the workbook itself
+        if ((response.headers.get('Content-Type') || '').includes('application/json')) {
+            const data = await response.json();
             alert(`Export failed: ${data.message}`);
+            return;
         }
+        
+        // Download the workbook through a temporary object URL
+        const blob = await response.blob();
+        const url = URL.createObjectURL(blob);
+        const link = document.createElement('a');
+        link.href = url;
+        link.download = `JamiBilling_Case_${appState.caseData.caseId}.xlsx`;
+        document.body.appendChild(link);
+        link.click();
+        document.body.removeChild(link);
+        URL.revokeObjectURL(url);
     } catch (error) {
         console.error('Excel export error:', error);
         alert('An error occurred while exporting to Excel. Please try again.');
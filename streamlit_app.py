@@ -14,20 +14,43 @@ import time
 import asyncio
 import decimal
 import traceback
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
 # Try to import pypyodbc, but gracefully handle if it's not available
 try:
     import pypyodbc as pyodbc
 except ImportError:
     logging.warning("pypyodbc module not found, database functionality will be limited")
     pyodbc = None
-from flask import Flask, render_template, request, jsonify, session, send_file
+from flask import Flask, render_template, request, jsonify, session, send_file, Response
 from flask_session import Session
 from playwright.async_api import async_playwright
 from bs4 import BeautifulSoup
 from werkzeug.utils import secure_filename
-import openpyxl
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from fee_storage import create_fee_store
+from db_instrumentation import QueryStats
+from result_store import ResultStore, fingerprint
+from snapshot_store import SnapshotStore
+from extraction_jobs import JobManager
+from excel_export import write_case_workbook, write_batch_workbook, WorkbookCache
+from debug_capture import CapturePolicy
+from browser_tracing import BrowserTracer
+from profiling import SamplingProfiler
+import memory_profile
+from artifact_writer import ArtifactWriter
+from retention import RetentionManager
+from log_viewer import LogViewer, DebugFileListing, LEVELS as LOG_LEVELS
+from log_setup import configure_logging, log_context, job_id_var
+import metrics
+from metrics import time_stage, timed_stage
+import run_trace
+from run_trace import TraceStore
+import columnar_export
+import update_marks
 
-# Configure logging
+# Bootstrap logging until the config is loaded
 logging.basicConfig(
     filename='jami_billing.log',
     level=logging.INFO,
@@ -63,6 +86,10 @@ except Exception as e:
         }
     }
 
+# Structured JSON logging, written by a background listener thread
+logging_config = app_config.get('logging', {})
+log_listener = configure_logging(logging_config)
+
 # Load fee categories from the JSON file
 try:
     with open('backend/fee_categories.json', 'r') as f:
@@ -93,6 +120,103 @@ os.makedirs('debug', exist_ok=True)
 # Global event loop for asyncio
 loop = None
 
+# Thread pool for database fee lookups, so they can run while the browser is still scraping
+db_lookup_workers = 4
+db_executor = ThreadPoolExecutor(max_workers=db_lookup_workers, thread_name_prefix='db-lookup')
+
+# ODBC driver that last connected successfully
+db_driver_cache = {'driver': None}
+
+# Extracted case results live here; the session only keeps the result ID. Results younger
+# than freshness_seconds are served from the store instead of scraping RDN again
+results_config = app_config.get('results', {})
+result_store = ResultStore(results_config.get('path', os.path.join('data', 'results.db')))
+result_freshness_seconds = results_config.get('freshness_seconds', 900)
+
+# Debug page dumps and screenshots, stored compressed and deduplicated by content hash
+snapshot_store = SnapshotStore(app_config.get('snapshots', {}).get('path', os.path.join('debug', 'snapshots')))
+
+# Per-run extraction traces (stage, selector and wait spans) for the slowest-runs dashboard
+tracing_config = app_config.get('tracing', {})
+trace_store = TraceStore(tracing_config.get('path', os.path.join('data', 'traces.db')),
+                         retention_days=tracing_config.get('retention_days', 14))
+
+# Debug artifacts are written on a background thread so disk I/O stays off the event loop
+artifacts_config = app_config.get('artifacts', {})
+artifact_writer = ArtifactWriter(
+    max_pending=artifacts_config.get('max_pending', 256),
+    put_timeout_seconds=artifacts_config.get('put_timeout_ms', 0) / 1000
+)
+
+# Which debug screenshots and HTML dumps browser runs take
+capture_policy = CapturePolicy.from_config(app_config.get('debug_capture', {}))
+
+# Playwright traces of browser runs, saved only for failed or slow runs
+browser_tracer = BrowserTracer.from_config(app_config.get('playwright_tracing', {}))
+
+# Opt-in sampling profiler for hot paths; writes collapsed stacks under debug/profiles
+profiler = SamplingProfiler.from_config(app_config.get('profiling', {}))
+
+# Opt-in tracemalloc snapshots around pipeline stages, plus a rolling process RSS trend
+memory_profiler = memory_profile.configure(app_config.get('memory_profile', {}))
+
+def profile_request(name):
+    """Decorator profiling a sampled fraction of a route's requests, and any request sending the profiling header"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with profiler.profile(name, force=profiler.requested(request.headers)):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Background extraction jobs, each worker thread running its own event loop
+jobs_config = app_config.get('jobs', {})
+job_manager = JobManager(
+    workers=jobs_config.get('workers', 2),
+    retention_seconds=jobs_config.get('retention_seconds', 3600)
+)
+
+# Rendered single-case workbooks, keyed by a hash of the exported data
+workbook_cache = WorkbookCache(max_bytes=app_config.get('exports', {}).get('cache_bytes', 50 * 1024 * 1024))
+
+# Paginated reads of the application log and a cached listing of loose debug files
+log_viewer = LogViewer(logging_config.get('path', 'jami_billing.log'))
+debug_file_listing = DebugFileListing('debug')
+
+# Per-statement timing for every query run through the fee store
+db_query_stats = QueryStats(
+    slow_query_ms=app_config.get('db_instrumentation', {}).get('slow_query_ms', 500)
+)
+
+def active_case_ids():
+    return {str(job.case_id) for job in job_manager.jobs() if not job.finished}
+
+def retention_protected(path):
+    """Keep files written by tracked jobs and debug output of cases still being extracted"""
+    name = os.path.basename(path)
+    for job in job_manager.jobs():
+        if any(os.path.abspath(path) == os.path.abspath(artifact) for artifact in job.artifacts):
+            return True
+        if not job.finished and str(job.case_id) in name:
+            return True
+    return False
+
+# Periodic size, count and age caps for debug output, exports and session files
+retention_config = app_config.get('retention', {})
+snapshot_retention = retention_config.get('snapshots', {})
+retention_manager = RetentionManager.from_config(
+    retention_config,
+    protect=retention_protected,
+    extra_sweeps=[lambda: snapshot_store.prune(
+        max_age_seconds=snapshot_retention['max_age_days'] * 86400 if snapshot_retention.get('max_age_days') is not None else None,
+        max_bytes=snapshot_retention.get('max_bytes'),
+        keep_case_ids=active_case_ids()
+    )]
+)
+if retention_config.get('enabled', True):
+    retention_manager.start()
+
 def get_event_loop():
     """Get or create the event loop for async operations"""
     global loop
@@ -167,15 +291,13 @@ async def async_login(data):
             await page.goto(login_url)
             
             # Save page source for debugging
-            login_page_content = await page.content()
-            with open(os.path.join('debug', 'login_page.html'), 'w', encoding='utf-8') as f:
-                f.write(login_page_content)
+            await capture_html(page, 'login_page.html')
             
             # Take screenshot
-            await page.screenshot(path=os.path.join('debug', 'login_page.png'))
+            await capture_screenshot(page, 'login_page.png')
             
             # Save screenshot before filling
-            await page.screenshot(path=os.path.join('debug', 'before_fill.png'))
+            await capture_screenshot(page, 'before_fill.png')
             
             # Fill form fields using direct selectors for maximum performance
             logging.info("Filling login form with optimized approach")
@@ -238,7 +360,7 @@ async def async_login(data):
                     logging.error(f"Security code fallback failed: {str(e)}")
             
             # Take screenshot after filling the form
-            await page.screenshot(path=os.path.join('debug', 'after_fill.png'))
+            await capture_screenshot(page, 'after_fill.png')
             
             # Find and click login button - optimized approach with CAPTCHA handling
             logging.info("Checking for CAPTCHA before clicking login button")
@@ -248,10 +370,8 @@ async def async_login(data):
                 captcha_frame = await page.query_selector("iframe[src*='recaptcha'], iframe[title*='reCAPTCHA'], div.g-recaptcha")
                 if captcha_frame:
                     logging.info("CAPTCHA detected! Notifying user")
-                    html_content = await page.content()
-                    with open(os.path.join('debug', 'captcha_page.html'), 'w', encoding='utf-8') as f:
-                        f.write(html_content)
-                    await page.screenshot(path=os.path.join('debug', 'captcha_detected.png'))
+                    await capture_html(page, 'captcha_page.html', error=True)
+                    await capture_screenshot(page, 'captcha_detected.png', error=True)
                     
                     # If headless mode is on, we can't solve CAPTCHA
                     if os.environ.get('JAMI_HIDE_BROWSER', 'False').lower() == 'true':
@@ -309,12 +429,12 @@ async def async_login(data):
                         logging.info("Pressed Enter on last input field")
                     else:
                         logging.error("No input fields found to press Enter")
-                        await page.screenshot(path=os.path.join('debug', 'login_button_error.png'))
+                        await capture_screenshot(page, 'login_button_error.png', error=True)
                         await browser.close()
                         return False, "No login button found and no input fields to press Enter"
                 except Exception as e:
                     logging.error(f"Error submitting form: {str(e)}")
-                    await page.screenshot(path=os.path.join('debug', 'login_button_error.png'))
+                    await capture_screenshot(page, 'login_button_error.png', error=True)
                     await browser.close()
                     return False, f"Error submitting form: {str(e)}"
             
@@ -336,7 +456,7 @@ async def async_login(data):
                         logging.info(f"Navigation successful: {current_url}")
                 except Exception as e:
                     logging.warning(f"Navigation wait timed out, but proceeding: {str(e)}")
-                await page.screenshot(path=os.path.join('debug', 'after_login.png'))
+                await capture_screenshot(page, 'after_login.png')
                 
                 # Check for error messages and analyze page
                 current_url = page.url
@@ -376,16 +496,12 @@ async def async_login(data):
                                 else:
                                     logging.warning("Still on login page after clicking continue button")
                                     # Save the current page for analysis
-                                    html_content = await page.content()
-                                    with open(os.path.join('debug', 'login_analysis.html'), 'w', encoding='utf-8') as f:
-                                        f.write(html_content)
+                                    await capture_html(page, 'login_analysis.html', error=True)
                                     await browser.close()
                                     return False, "Login appears to have failed - still on login page"
                             else:
                                 # Save the current page for analysis
-                                html_content = await page.content()
-                                with open(os.path.join('debug', 'login_analysis.html'), 'w', encoding='utf-8') as f:
-                                    f.write(html_content)
+                                await capture_html(page, 'login_analysis.html')
                                 # Check if this appears to be a verification code / MFA page
                                 verification_elements = await page.query_selector_all("input[name='verificationCode'], input[name='code'], input[placeholder*='code'], input[placeholder*='verification'], input[type='number']")
                                 if verification_elements:
@@ -420,12 +536,12 @@ async def async_login(data):
                                                     # Store cookies and continue
                                                     cookies = await context.cookies()
                                                     session['cookies'] = cookies
-                                                    await page.screenshot(path=os.path.join('debug', 'after_2fa.png'))
+                                                    await capture_screenshot(page, 'after_2fa.png')
                                                     await browser.close()
                                                     return True, "Login with two-factor authentication successful"
                                                 else:
                                                     logging.error("Still on login page after verification attempt")
-                                                    await page.screenshot(path=os.path.join('debug', 'failed_2fa.png'))
+                                                    await capture_screenshot(page, 'failed_2fa.png', error=True)
                                                     await browser.close() 
                                                     return False, "Verification code appears to be invalid"
                                         except Exception as e:
@@ -435,7 +551,7 @@ async def async_login(data):
                                     else:
                                         # We need a verification code but don't have one
                                         logging.warning("Multi-factor authentication required")
-                                        await page.screenshot(path=os.path.join('debug', 'needs_2fa.png'))
+                                        await capture_screenshot(page, 'needs_2fa.png')
                                         await browser.close()
                                         return False, "Multi-factor authentication required - please provide a verification code"
                                 else:
@@ -465,7 +581,7 @@ async def async_login(data):
                             logging.warning(f"Timeout waiting for networkidle during navigation, continuing anyway: {str(e)}")
                             # Wait a reasonable time anyway
                             await page.wait_for_timeout(3000)
-                        await page.screenshot(path=os.path.join('debug', f'direct_case_{data.get("caseId")}.png'))
+                        await capture_screenshot(page, f'direct_case_{data.get("caseId")}.png')
                         
                         # Store cookies in session for later use
                         cookies = await context.cookies()
@@ -497,7 +613,7 @@ async def async_login(data):
                 
             except Exception as e:
                 logging.error(f"Login timed out or failed: {str(e)}")
-                await page.screenshot(path=os.path.join('debug', 'login_timeout.png'))
+                await capture_screenshot(page, 'login_timeout.png', error=True)
                 await browser.close()
                 return False, f"Login timed out or failed: {str(e)}"
                 
@@ -506,9 +622,156 @@ async def async_login(data):
             await browser.close()
             return False, f"Error during login: {str(e)}"
 
+def load_result(part, default=None):
+    """Load one part of the current session's case result from the result store"""
+    return result_store.get(session.get('result_id'), part, default)
+
+def case_data_payload(case_data, db_data, meta, cached):
+    """Build the case data response body, tagged with the result fingerprint"""
+    return {
+        "success": True,
+        "data": case_data,
+        "dbData": db_data,
+        "cached": cached,
+        "cachedAt": datetime.datetime.fromtimestamp(meta["extractedAt"]).isoformat(),
+        "fingerprint": meta["fingerprint"]
+    }
+
+def case_data_response(payload):
+    """Return a case data payload as JSON with the fingerprint as its ETag"""
+    response = jsonify(payload)
+    response.set_etag(payload["fingerprint"])
+    return response
+
+def extraction_error_payload(error_msg):
+    """Build the failure response for an extraction error"""
+    # Provide a more user-friendly message for timeout errors
+    if "Timeout" in error_msg:
+        return {
+            "success": False, 
+            "message": "The RDN system is taking too long to respond. Please try again or check RDN status.",
+            "technical_error": error_msg
+        }
+    return {"success": False, "message": f"Error extracting case data: {error_msg}"}
+
+def extraction_state():
+    """Copy the session values the browser run needs, since jobs run outside the request context"""
+    return {key: session.get(key) for key in ('cookies', 'username', 'password', 'security_code', 'definitive_client_name')}
+
+def remember_job(job):
+    """Record a job as belonging to the current session so its progress can be read back"""
+    session['job_ids'] = (session.get('job_ids', []) + [job.id])[-20:]
+
+def apply_session_updates(session_updates):
+    """Copy the session changes produced by an extraction into the current session"""
+    for key, value in session_updates.items():
+        session[key] = value
+
+def cached_case_data(case_id):
+    """Return (payload, session_updates) for a stored extraction that is still fresh, or None"""
+    meta = result_store.get(case_id, 'meta')
+    if not meta or time.time() - meta["extractedAt"] >= result_freshness_seconds:
+        metrics.RESULT_CACHE_LOOKUPS.inc(result="miss")
+        return None
+    metrics.RESULT_CACHE_LOOKUPS.inc(result="hit")
+
+    age = time.time() - meta["extractedAt"]
+    logging.info(f"Returning cached result for case {case_id} extracted {age:.0f} seconds ago")
+    session_updates = {"result_id": case_id}
+    db_data = meta.get("db_data")
+    if db_data:
+        session_updates.update(db_data=db_data, db_data_case_id=case_id)
+    return case_data_payload(result_store.get(case_id, 'case_data'), db_data, meta, cached=True), session_updates
+
+async def run_case_extraction(case_id, state, incremental=True, progress=None, on_update=None):
+    """
+    Extract a case from RDN and store the result.
+    Runs without a request context, so it can execute in a background job.
+
+    Returns:
+        tuple: (response payload, session updates to apply once the caller has a session)
+    """
+    trace = run_trace.RunTrace(case_id, job_id=job_id_var.get())
+    # The outcome is counted and the trace saved once, after the response is settled
+    status, error = "failure", None
+    try:
+        with log_context(case_id=case_id), run_trace.activate(trace), memory_profiler.track_run(case_id), \
+                time_stage("extraction") as extraction_timer:
+            success, result = await async_extract_case_data(case_id, state, incremental=incremental,
+                                                            progress=progress, on_update=on_update)
+            # A run that gave up without raising still failed the stage
+            extraction_timer.stop(failed=not success)
+        if not success:
+            error = result
+            return {"success": False, "message": result}, {}
+
+        # Filter out fees with zero amounts before storing the result
+        if "fees" in result["case_data"]:
+            result["case_data"]["fees"] = [fee for fee in result["case_data"]["fees"] if fee.get('amount', 0) > 0]
+            logging.info(f"Filtered fees to exclude zero amounts. Remaining fees: {len(result['case_data']['fees'])}")
+            
+        # Store case data, updates and dollar records in the result store; the session
+        # keeps only the result ID so later requests don't unpickle the whole history
+        result_store.put(case_id, {
+            "case_data": result["case_data"],
+            "updates": result["updates"],
+            "dollar_records": result.get("dollar_records", [])
+        })
+        if result.get("updates_hwm"):
+            result_store.put(case_id, {"updates_hwm": result["updates_hwm"]})
+        session_updates = {"result_id": case_id, "definitive_client_name": state.get('definitive_client_name')}
+
+        # The database lookup normally runs alongside the Updates tab scraping
+        db_data = result.get("db_data")
+        db_trace = result.get("db_trace")
+        if db_trace:
+            result_store.put(case_id, {"db_trace": db_trace})
+            trace.attrs.update(dbQueryCount=db_trace['queryCount'], dbQueryMs=round(db_trace['queryMs'], 1))
+            logging.info(f"Database time for case {case_id}: {db_trace['queryCount']} queries in {db_trace['queryMs']:.0f} ms, "
+                         f"{db_trace['connections']} connections in {db_trace['connectMs']:.0f} ms")
+        if db_data:
+            logging.info(f"Database fee from pipelined lookup: ${float(db_data['amount']):.2f}")
+        else:
+            # Fetch database data for this case now
+            logging.info("Case data extraction successful, auto-fetching database data")
+            try:
+                db_data = fetch_database_fee_data(result["case_data"])
+                if db_data:
+                    logging.info(f"Auto-fetched database fee: ${db_data['amount']:.2f}")
+            except Exception as e:
+                logging.error(f"Error during auto database fetch: {str(e)}")
+                # This is non-blocking, so we continue even if db fetch fails
+        if db_data:
+            session_updates.update(db_data=db_data, db_data_case_id=case_id)
+
+        meta = {
+            "extractedAt": time.time(),
+            "fingerprint": fingerprint(result["case_data"], result["updates"], result.get("dollar_records", [])),
+            "db_data": db_data
+        }
+        result_store.put(case_id, {"meta": meta})
+        payload = case_data_payload(result["case_data"], db_data, meta, cached=False)
+        status = "success"
+        trace.attrs.update(updates=len(result["updates"]), fees=len(result["case_data"].get("fees", [])))
+        return payload, session_updates
+
+    except Exception as e:
+        logging.exception(f"Error extracting case data: {str(e)}")
+        error = str(e)
+        return extraction_error_payload(str(e)), {}
+
+    finally:
+        metrics.EXTRACTIONS.inc(result=status)
+        # A trace store error must not change the response
+        try:
+            trace_store.save(trace, status, error)
+        except Exception as save_error:
+            logging.warning(f"Could not save trace for case {case_id}: {str(save_error)}")
+
 @app.route('/api/case-data', methods=['GET'])
+@profile_request("get_case_data")
 def get_case_data():
-    """Extract case data from RDN"""
+    """Extract case data from RDN, holding the request open until the browser run finishes"""
     logging.info("Case data request received")
     if 'username' not in session:
         logging.error("Not logged in")
@@ -516,60 +779,238 @@ def get_case_data():
     
     case_id = session.get('case_id')
     logging.info(f"Processing case ID: {case_id}")
+
+    # Serve a recent extraction of the same case unless the caller forces a re-scrape
+    force = request.args.get('force', 'false').lower() == 'true'
+    cached = None if force else cached_case_data(case_id)
+    if cached:
+        payload, session_updates = cached
+        apply_session_updates(session_updates)
+        if payload["fingerprint"] in request.if_none_match:
+            return '', 304
+        return case_data_response(payload)
     
-    try:
-        # Run the async case data extraction function in the event loop
-        loop = get_event_loop()
-        success, result = loop.run_until_complete(async_extract_case_data(case_id))
-        
-        if success:
-            # Filter out fees with zero amounts before storing in session
-            if "fees" in result["case_data"]:
-                result["case_data"]["fees"] = [fee for fee in result["case_data"]["fees"] if fee.get('amount', 0) > 0]
-                logging.info(f"Filtered fees to exclude zero amounts. Remaining fees: {len(result['case_data']['fees'])}")
-                
-            # Store case data and updates in session
-            session['case_data'] = result["case_data"]
-            session['updates'] = result["updates"]
+    # Run the async case data extraction function in the event loop
+    loop = get_event_loop()
+    incremental = results_config.get('incremental_updates', True) and request.args.get('full', 'false').lower() != 'true'
+    payload, session_updates = loop.run_until_complete(run_case_extraction(case_id, extraction_state(), incremental=incremental))
+    apply_session_updates(session_updates)
+    if not payload["success"]:
+        return jsonify(payload)
+    return case_data_response(payload)
+
+@app.route('/api/case-data', methods=['POST'])
+def start_case_data_job():
+    """Start a background extraction job for the current case and return its job ID"""
+    logging.info("Case data job request received")
+    if 'username' not in session:
+        logging.error("Not logged in")
+        return jsonify({"success": False, "message": "Not logged in"})
+
+    case_id = session.get('case_id')
+    options = request.get_json(silent=True) or {}
+    force = options.get('force', request.args.get('force', 'false').lower() == 'true')
+    full = options.get('full', request.args.get('full', 'false').lower() == 'true')
+
+    # A fresh stored extraction is returned straight away, without a job
+    cached = None if force else cached_case_data(case_id)
+    if cached:
+        payload, session_updates = cached
+        apply_session_updates(session_updates)
+        return case_data_response(payload)
+
+    state = extraction_state()
+    incremental = results_config.get('incremental_updates', True) and not full
+    profile_requested = profiler.requested(request.headers)
+
+    async def run_job(job):
+        # The job runs on a worker thread, so a profile of this request is taken there
+        with profiler.profile("case_extraction_job", force=profile_requested):
+            return await run_case_extraction(case_id, state, incremental=incremental, progress=job.progress,
+                                             on_update=lambda update: job.emit("update", update))
+
+    job = job_manager.submit(case_id, run_job)
+    remember_job(job)
+    return jsonify({"success": True, "jobId": job.id, "job": job.to_dict()}), 202
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """
+    Stream an extraction job's events as Server-Sent Events: 'stage' events, an 'update' event
+    for each fee update as it is extracted, and a final 'done' or 'failed' event. Clients fetch
+    /api/jobs/<job_id> afterwards for the full result.
+    """
+    job = job_manager.get(job_id)
+    if job is None or job_id not in session.get('job_ids', []):
+        return jsonify({"success": False, "message": "Job not found"}), 404
+
+    # Resume after the last event the browser received if it reconnects
+    start = request.headers.get('Last-Event-ID', type=int)
+    start = start + 1 if start is not None else 0
+
+    def generate():
+        index = start
+        while True:
+            events = job.events_since(index)
+            if not events:
+                if job.finished:
+                    return
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            for event, data in events:
+                yield f"id: {index}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+                index += 1
+                if event in ("done", "failed"):
+                    return
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Report the progress of an extraction job, including its result once it has finished"""
+    job = job_manager.get(job_id)
+    if job is None or job_id not in session.get('job_ids', []):
+        return jsonify({"success": False, "message": "Job not found"}), 404
+
+    response = {"success": True, "job": job.to_dict()}
+    if job.status == "done":
+        payload, session_updates = job.result
+        apply_session_updates(session_updates)
+        response["result"] = payload
+    elif job.status == "failed":
+        response["success"] = False
+        response["message"] = extraction_error_payload(job.error)["message"]
+    return jsonify(response)
+
+def snapshot_stage(name, case_id=None):
+    """Derive the capture stage from its name, e.g. 'updates_tab' from 'updates_tab_123.png'"""
+    stage = os.path.splitext(name)[0]
+    if case_id is not None:
+        stage = re.sub(r'_+', '_', stage.replace(str(case_id), '')).strip('_')
+    return stage
+
+async def capture_screenshot(page, name, case_id=None, error=False):
+    """Take a screenshot and store it in the snapshot store under name, if the capture policy allows"""
+    if not capture_policy.allows(error):
+        return
+    name = capture_policy.screenshot_name(name)
+    data = await page.screenshot(**capture_policy.screenshot_options(page))
+    trace = run_trace.current()
+    if trace is not None:
+        trace.add("screenshotBytes", len(data))
+    artifact_writer.submit(name, snapshot_store.put, name, data, case_id=case_id, stage=snapshot_stage(name, case_id))
+
+async def capture_html(page, name, case_id=None, error=False):
+    """Store the page's HTML under name, reading it only if the capture policy allows"""
+    if not capture_policy.allows(error):
+        return
+    content = await page.content()
+    artifact_writer.submit(name, snapshot_store.put, name, content, case_id=case_id, stage=snapshot_stage(name, case_id))
+
+def save_debug_html(name, content, case_id=None, error=False):
+    """Store already-read page HTML in the snapshot store under name, if the capture policy allows"""
+    if not capture_policy.allows(error):
+        return
+    artifact_writer.submit(name, snapshot_store.put, name, content, case_id=case_id, stage=snapshot_stage(name, case_id))
+
+async def close_browser(browser, browser_trace, failed=False):
+    """Stop the run's Playwright trace, linking it to the run trace if it was kept, then close the browser"""
+    path = await browser_tracer.finish(browser_trace, failed=failed)
+    trace = run_trace.current()
+    if path and trace is not None:
+        trace.attrs["playwrightTrace"] = path
+    await browser.close()
+
+def dollar_record_to_updates(record):
+    """Convert a dollar record from the Updates tab into classified update entries, one per dollar amount"""
+    updates = []
+    # Extract data from the record
+    details = record.get("details", "")
+    dollar_amounts = record.get("dollar_amount", [])
+    if not dollar_amounts:
+        return updates
+
+    # Every amount in a record shares its details text, so classify it once
+    fee_type_info = identify_fee_type(details)
+    if fee_type_info["category"] == "Unknown":
+        fee_type_info = {"category": "Other", "confidence": 0.5, "color": "#858796"}  # Default for unclassified updates
+    
+    # Only process records with dollar amounts
+    for amount_str in dollar_amounts:
+        try:
+            # Convert amount string to float
+            amount = float(amount_str.replace('$', '').replace(',', ''))
             
-            # Auto-fetch database data for this case
-            logging.info("Case data extraction successful, auto-fetching database data")
-            try:
-                db_data = auto_fetch_database_fees(result["case_data"])
-                if db_data:
-                    logging.info(f"Auto-fetched database fee: ${db_data['amount']:.2f}")
-                    # No need to store in session, auto_fetch_database_fees already does that
-            except Exception as e:
-                logging.error(f"Error during auto database fetch: {str(e)}")
-                # This is non-blocking, so we continue even if db fetch fails
+            # Create update entry compatible with existing code
+            update_entry = {
+                "date": record.get("update_date_time", "Unknown"),
+                "details": details,
+                "amount": amount,
+                "amountStr": amount_str,
+                "feeType": fee_type_info["category"],
+                "feeTypeConfidence": fee_type_info["confidence"],
+                "feeTypeColor": fee_type_info["color"],
+                "status": "Active",
+                "source": "rdn_data_scraper"
+            }
             
-            return jsonify({"success": True, "data": result["case_data"]})
-        else:
-            return jsonify({"success": False, "message": result})
-        
+            updates.append(update_entry)
+            logging.info(f"Added update entry with amount: {amount_str}")
+        except Exception as e:
+            logging.error(f"Error converting dollar amount '{amount_str}': {e}")
+    return updates
+
+@timed_stage("db_lookup")
+def traced_fee_lookup(case_data):
+    """Run fetch_database_fee_data, returning its result together with the queries it ran"""
+    with db_query_stats.capture() as capture:
+        db_data = fetch_database_fee_data(case_data)
+    return db_data, db_query_stats.summarize(capture)
+
+async def await_db_lookup(db_future):
+    """Wait for a database lookup started during extraction, returning (db_data, db_trace)"""
+    if db_future is None:
+        return None, None
+    try:
+        return await db_future
     except Exception as e:
-        error_msg = str(e)
-        logging.exception(f"Error extracting case data: {error_msg}")
-        
-        # Provide a more user-friendly message for timeout errors
-        if "Timeout" in error_msg:
-            return jsonify({
-                "success": False, 
-                "message": "The RDN system is taking too long to respond. Please try again or check RDN status.",
-                "technical_error": error_msg
-            })
-        else:
-            return jsonify({"success": False, "message": f"Error extracting case data: {error_msg}"})
+        logging.error(f"Background database lookup failed: {str(e)}")
+        return None, None
+
+async def async_extract_case_data(case_id, state, incremental=True, progress=None, on_update=None):
+    """
+    Async function to handle Playwright browser automation for case data extraction
+
+    state holds the login cookies, credentials and definitive client name copied from the
+    session; the run may update it. progress(stage, message) is called as stages are reached,
+    and on_update(update) for each fee update as soon as it is read from the Updates tab.
+    With incremental set, the Updates tab walk stops at the newest update stored for the case
+    and the new dollar records are merged into the stored history.
+    """
+    if progress is None:
+        progress = lambda stage, message=None: None
+    if on_update is None:
+        on_update = lambda update: None
+    if not capture_policy.start_run():
+        logging.info(f"Debug captures for case {case_id} limited to errors (capture level '{capture_policy.level}')")
 
-async def async_extract_case_data(case_id):
-    """Async function to handle Playwright browser automation for case data extraction"""
     async with async_playwright() as p:
         # Launch browser
         logging.info("Launching Playwright browser for case data extraction")
-        browser = await p.chromium.launch(
-            headless=os.environ.get('JAMI_HIDE_BROWSER', 'False').lower() == 'true'
-        )
-        
+        with time_stage("browser_launch"):
+            browser = await p.chromium.launch(
+                headless=os.environ.get('JAMI_HIDE_BROWSER', 'False').lower() == 'true'
+            )
+
+        # Database lookup future, started as soon as the case page has been parsed
+        db_future = None
+        browser_trace = None
+        progress("login", "Opening RDN session")
+
         try:
             # Create a new browser context
             context = await browser.new_context(
@@ -577,11 +1018,16 @@ async def async_extract_case_data(case_id):
                 user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36"
             )
             
+            browser_trace = await browser_tracer.start(context, f"case_{case_id}")
+            
             # Create a new page
             page = await context.new_page()
+            trace = run_trace.current()
+            if trace is not None:
+                page.on("response", lambda response: trace.add("responseBytes", int(response.headers.get("content-length") or 0)))
             
             # Check if we have cookies from previous login
-            cookies = session.get('cookies')
+            cookies = state.get('cookies')
             login_needed = True
             
             if cookies:
@@ -593,23 +1039,27 @@ async def async_extract_case_data(case_id):
                     # Go directly to case page
                     case_url = app_config['rdn']['case_url_template'].format(case_id=case_id)
                     logging.info(f"Navigating directly to case URL: {case_url}")
-                    await page.goto(case_url)
-                    
-                    # Wait briefly and check if we got redirected to login page
-                    try:
-                        await page.wait_for_load_state("networkidle", timeout=10000)  # Increased timeout
-                        logging.info("Session cookie navigation successful")
-                    except Exception as e:
-                        logging.warning(f"Timeout waiting for networkidle with cookies, continuing anyway: {str(e)}")
-                        # Wait a reasonable time anyway
-                        await page.wait_for_timeout(3000)
+                    with time_stage("case_page_load"):
+                        with run_trace.span("goto", kind="navigation", url=case_url):
+                            await page.goto(case_url)
+                        
+                        # Wait briefly and check if we got redirected to login page
+                        try:
+                            with run_trace.span("wait_for_load_state", kind="wait", state="networkidle", timeout_ms=10000):
+                                await page.wait_for_load_state("networkidle", timeout=10000)  # Increased timeout
+                            logging.info("Session cookie navigation successful")
+                        except Exception as e:
+                            logging.warning(f"Timeout waiting for networkidle with cookies, continuing anyway: {str(e)}")
+                            # Wait a reasonable time anyway
+                            with run_trace.span("wait_for_timeout", kind="sleep", ms=3000):
+                                await page.wait_for_timeout(3000)
                     current_url = page.url
                     
                     if "login" not in current_url.lower():
                         # Successfully used existing session
                         login_needed = False
                         logging.info("Successfully used existing session cookies")
-                        await page.screenshot(path=os.path.join('debug', f'direct_access_case_{case_id}.png'))
+                        await capture_screenshot(page, f'direct_access_case_{case_id}.png', case_id=case_id)
                     else:
                         logging.info("Redirected to login page, need to log in again")
                 except Exception as e:
@@ -617,170 +1067,176 @@ async def async_extract_case_data(case_id):
             
             # If we need to login first
             if login_needed:
-                login_url = app_config['rdn']['login_url']
-                logging.info(f"Navigating to login URL: {login_url}")
-                await page.goto(login_url)
+                with time_stage("login") as login_timer:
+                    login_url = app_config['rdn']['login_url']
+                    logging.info(f"Navigating to login URL: {login_url}")
+                    with run_trace.span("goto", kind="navigation", url=login_url):
+                        await page.goto(login_url)
                 
-                # Save screenshot before filling
-                await page.screenshot(path=os.path.join('debug', 'case_before_fill.png'))
+                    # Save screenshot before filling
+                    await capture_screenshot(page, 'case_before_fill.png', case_id=case_id)
                 
-                # Fill form fields using optimized approach
-                logging.info("Filling login form with optimized approach")
+                    # Fill form fields using optimized approach
+                    logging.info("Filling login form with optimized approach")
                 
-                # Define credentials from session
-                credentials = {
-                    "username": session.get('username'),
-                    "password": session.get('password'),
-                    "securityCode": session.get('security_code')
-                }
+                    # Define credentials from session
+                    credentials = {
+                        "username": state.get('username'),
+                        "password": state.get('password'),
+                        "securityCode": state.get('security_code')
+                    }
                 
-                # Use common selectors for login forms - structured for performance
-                field_selectors = {
-                    "username": ["#username", "[name=username]", "input[type=text]:nth-of-type(1)", "input:not([type=hidden]):nth-of-type(1)"],
-                    "password": ["#password", "[name=password]", "input[type=password]", "input:not([type=hidden]):nth-of-type(2)"],
-                    "securityCode": ["#security_code", "#securityCode", "#code", "[name=security_code]", "[name=securityCode]", "[name=code]", "input:not([type=hidden]):nth-of-type(3)"]
-                }
+                    # Use common selectors for login forms - structured for performance
+                    field_selectors = {
+                        "username": ["#username", "[name=username]", "input[type=text]:nth-of-type(1)", "input:not([type=hidden]):nth-of-type(1)"],
+                        "password": ["#password", "[name=password]", "input[type=password]", "input:not([type=hidden]):nth-of-type(2)"],
+                        "securityCode": ["#security_code", "#securityCode", "#code", "[name=security_code]", "[name=securityCode]", "[name=code]", "input:not([type=hidden]):nth-of-type(3)"]
+                    }
                 
-                security_code_filled = False
+                    security_code_filled = False
                 
-                # Try to fill all fields with minimal selector queries
-                for field, value in credentials.items():
-                    if not value:  # Skip empty values
-                        continue
-                        
-                    field_filled = False
-                    # Try each selector with minimal timeout
-                    for selector in field_selectors.get(field, []):
-                        try:
-                            element = await page.wait_for_selector(selector, timeout=50)
-                            if element:
-                                await element.fill(value)
-                                logging.info(f"{field} filled using {selector}")
-                                field_filled = True
-                                if field == "securityCode":
-                                    security_code_filled = True
-                                break
-                        except Exception:
+                    # Try to fill all fields with minimal selector queries
+                    for field, value in credentials.items():
+                        if not value:  # Skip empty values
                             continue
+                        
+                        field_filled = False
+                        # Try each selector with minimal timeout
+                        for selector in field_selectors.get(field, []):
+                            try:
+                                with run_trace.span("wait_for_selector", kind="selector", selector=selector, timeout_ms=50):
+                                    element = await page.wait_for_selector(selector, timeout=50)
+                                if element:
+                                    await element.fill(value)
+                                    logging.info(f"{field} filled using {selector}")
+                                    field_filled = True
+                                    if field == "securityCode":
+                                        security_code_filled = True
+                                    break
+                            except Exception:
+                                continue
                             
-                    # If field wasn't filled, try direct typing as last resort
-                    if not field_filled:
-                        try:
-                            # Use position-based fallback
-                            field_index = 0  # Default to first field
-                            if field == "password":
-                                field_index = 1
-                            elif field == "securityCode":
-                                field_index = 2
+                        # If field wasn't filled, try direct typing as last resort
+                        if not field_filled:
+                            try:
+                                # Use position-based fallback
+                                field_index = 0  # Default to first field
+                                if field == "password":
+                                    field_index = 1
+                                elif field == "securityCode":
+                                    field_index = 2
                                 
-                            # Get visible inputs and use indexed position
-                            inputs = await page.query_selector_all("input:not([type=hidden])")
-                            if len(inputs) > field_index:
-                                await inputs[field_index].click()
-                                await page.keyboard.type(value)
-                                logging.info(f"{field} typed into input #{field_index}")
-                                if field == "securityCode":
-                                    security_code_filled = True
-                        except Exception as e:
-                            logging.error(f"Failed to fill {field}: {str(e)}")
+                                # Get visible inputs and use indexed position
+                                inputs = await page.query_selector_all("input:not([type=hidden])")
+                                if len(inputs) > field_index:
+                                    await inputs[field_index].click()
+                                    await page.keyboard.type(value)
+                                    logging.info(f"{field} typed into input #{field_index}")
+                                    if field == "securityCode":
+                                        security_code_filled = True
+                            except Exception as e:
+                                logging.error(f"Failed to fill {field}: {str(e)}")
                 
-                if not security_code_filled:
-                    logging.warning("Security code field may not have been properly filled")
+                    if not security_code_filled:
+                        logging.warning("Security code field may not have been properly filled")
                 
-                # Take screenshot after filling the form
-                await page.screenshot(path=os.path.join('debug', 'case_after_fill.png'))
+                    # Take screenshot after filling the form
+                    await capture_screenshot(page, 'case_after_fill.png', case_id=case_id)
                 
-                # Check for CAPTCHA and handle login with optimized approach
-                logging.info("Checking for CAPTCHA before clicking login button")
+                    # Check for CAPTCHA and handle login with optimized approach
+                    logging.info("Checking for CAPTCHA before clicking login button")
                 
-                # Check for CAPTCHA and handle it
-                try:
-                    captcha_frame = await page.query_selector("iframe[src*='recaptcha'], iframe[title*='reCAPTCHA'], div.g-recaptcha")
-                    if captcha_frame:
-                        logging.info("CAPTCHA detected during case extraction! Notifying user")
-                        html_content = await page.content()
-                        with open(os.path.join('debug', 'case_captcha_page.html'), 'w', encoding='utf-8') as f:
-                            f.write(html_content)
-                        await page.screenshot(path=os.path.join('debug', 'case_captcha_detected.png'))
+                    # Check for CAPTCHA and handle it
+                    try:
+                        captcha_frame = await page.query_selector("iframe[src*='recaptcha'], iframe[title*='reCAPTCHA'], div.g-recaptcha")
+                        if captcha_frame:
+                            logging.info("CAPTCHA detected during case extraction! Notifying user")
+                            await capture_html(page, 'case_captcha_page.html', case_id=case_id, error=True)
+                            await capture_screenshot(page, 'case_captcha_detected.png', case_id=case_id, error=True)
                         
-                        # If headless mode is on, we can't solve CAPTCHA
-                        if os.environ.get('JAMI_HIDE_BROWSER', 'False').lower() == 'true':
-                            await browser.close()
-                            return False, "CAPTCHA detected during case extraction - manual login required. Please set JAMI_HIDE_BROWSER=False to show the browser and solve the CAPTCHA."
-                        else:
-                            # Wait for user to solve CAPTCHA manually
-                            logging.info("Browser is visible - waiting 60 seconds for user to solve CAPTCHA manually...")
-                            await page.wait_for_timeout(60000)  # Wait 60 seconds for user to solve
-                            logging.info("Continuing after CAPTCHA timeout")
-                except Exception as e:
-                    logging.warning(f"Error checking for CAPTCHA during case extraction: {str(e)}")
-                
-                # Try to submit form directly first
-                try:
-                    logging.info("Attempting to submit form using JavaScript")
-                    await page.evaluate("document.querySelector('form').submit()")
-                    logging.info("Form submitted via JavaScript")
-                    button_clicked = True
-                except Exception as e:
-                    logging.warning(f"JavaScript form submission failed in case extraction: {str(e)}")
-                    
-                    # Fall back to clicking buttons
-                    logging.info("Trying button click approach")
-                    # Try multiple button selectors in order of likelihood
-                    button_selectors = [
-                        "button.btn-success",  # The actual Login button class
-                        "button:has-text('Login')", 
-                        "button[type='submit']", 
-                        "input[type='submit']",
-                        "button:has-text('Sign In')",
-                        "button:has-text('Submit')",
-                        "input[type='button'][value='Login']",
-                        "form button"
-                    ]
-                    
-                    button_clicked = False
-                    for selector in button_selectors:
-                        try:
-                            button = await page.wait_for_selector(selector, timeout=50)
-                            if button:
-                                await button.click()
-                                logging.info(f"Clicked button using selector: {selector}")
-                                button_clicked = True
-                                break
-                        except Exception:
-                            continue
+                            # If headless mode is on, we can't solve CAPTCHA
+                            if os.environ.get('JAMI_HIDE_BROWSER', 'False').lower() == 'true':
+                                login_timer.stop(failed=True, status="captcha")
+                                await close_browser(browser, browser_trace, failed=True)
+                                return False, "CAPTCHA detected during case extraction - manual login required. Please set JAMI_HIDE_BROWSER=False to show the browser and solve the CAPTCHA."
+                            else:
+                                # Wait for user to solve CAPTCHA manually
+                                logging.info("Browser is visible - waiting 60 seconds for user to solve CAPTCHA manually...")
+                                with time_stage("captcha_wait"):
+                                    await page.wait_for_timeout(60000)  # Wait 60 seconds for user to solve
+                                logging.info("Continuing after CAPTCHA timeout")
+                    except Exception as e:
+                        logging.warning(f"Error checking for CAPTCHA during case extraction: {str(e)}")
                 
-                # If no button clicked, try pressing Enter as fallback
-                if not button_clicked:
+                    # Try to submit form directly first
                     try:
-                        inputs = await page.query_selector_all("input:not([type=hidden])")
-                        if inputs:
-                            await inputs[-1].press("Enter")
-                            logging.info("Pressed Enter on last input field")
-                        else:
-                            logging.warning("No input fields found to press Enter")
+                        logging.info("Attempting to submit form using JavaScript")
+                        await page.evaluate("document.querySelector('form').submit()")
+                        logging.info("Form submitted via JavaScript")
+                        button_clicked = True
                     except Exception as e:
-                        logging.error(f"Failed to submit form: {str(e)}")
+                        logging.warning(f"JavaScript form submission failed in case extraction: {str(e)}")
+                    
+                        # Fall back to clicking buttons
+                        logging.info("Trying button click approach")
+                        # Try multiple button selectors in order of likelihood
+                        button_selectors = [
+                            "button.btn-success",  # The actual Login button class
+                            "button:has-text('Login')", 
+                            "button[type='submit']", 
+                            "input[type='submit']",
+                            "button:has-text('Sign In')",
+                            "button:has-text('Submit')",
+                            "input[type='button'][value='Login']",
+                            "form button"
+                        ]
+                    
+                        button_clicked = False
+                        for selector in button_selectors:
+                            try:
+                                with run_trace.span("wait_for_selector", kind="selector", selector=selector, timeout_ms=50):
+                                    button = await page.wait_for_selector(selector, timeout=50)
+                                if button:
+                                    await button.click()
+                                    logging.info(f"Clicked button using selector: {selector}")
+                                    button_clicked = True
+                                    break
+                            except Exception:
+                                continue
                 
-                # Screenshot after button click
-                await page.screenshot(path=os.path.join('debug', 'case_after_button_click.png'))
+                    # If no button clicked, try pressing Enter as fallback
+                    if not button_clicked:
+                        try:
+                            inputs = await page.query_selector_all("input:not([type=hidden])")
+                            if inputs:
+                                await inputs[-1].press("Enter")
+                                logging.info("Pressed Enter on last input field")
+                            else:
+                                logging.warning("No input fields found to press Enter")
+                        except Exception as e:
+                            logging.error(f"Failed to submit form: {str(e)}")
                 
-                # Wait for navigation using more flexible approach
-                try:
-                    # Try waiting for any successful navigation away from login
-                    logging.info("Waiting for navigation after login in case extraction...")
+                    # Screenshot after button click
+                    await capture_screenshot(page, 'case_after_button_click.png', case_id=case_id)
+                
+                    # Wait for navigation using more flexible approach
+                    try:
+                        # Try waiting for any successful navigation away from login
+                        logging.info("Waiting for navigation after login in case extraction...")
                     
-                    # Just wait for load state instead of specific URL
-                    await page.wait_for_load_state("domcontentloaded", timeout=10000)
+                        # Just wait for load state instead of specific URL
+                        with run_trace.span("wait_for_load_state", kind="wait", state="domcontentloaded", timeout_ms=10000):
+                            await page.wait_for_load_state("domcontentloaded", timeout=10000)
                     
-                    # Check if we're still on the login page
-                    current_url = page.url
-                    if "login" in current_url.lower():
-                        logging.warning(f"Still on login page after button click: {current_url}")
-                    else:
-                        logging.info(f"Navigation successful: {current_url}")
-                except Exception as e:
-                    logging.warning(f"Navigation wait timed out, but proceeding: {str(e)}")
+                        # Check if we're still on the login page
+                        current_url = page.url
+                        if "login" in current_url.lower():
+                            logging.warning(f"Still on login page after button click: {current_url}")
+                        else:
+                            logging.info(f"Navigation successful: {current_url}")
+                    except Exception as e:
+                        logging.warning(f"Navigation wait timed out, but proceeding: {str(e)}")
+                    login_timer.stop(failed="login" in page.url.lower())
             
             # Now navigate to case page (either after login or directly with cookies)
             if not login_needed or (login_needed and "login" not in page.url.lower()):
@@ -788,35 +1244,44 @@ async def async_extract_case_data(case_id):
                 if not page.url or case_id not in page.url:
                     case_url = app_config['rdn']['case_url_template'].format(case_id=case_id)
                     logging.info(f"Navigating to case URL: {case_url}")
-                    await page.goto(case_url)
-                    
-                    # Wait for case page to load and take screenshot - extended timeout
-                    try:
-                        await page.wait_for_load_state("networkidle", timeout=15000)  # Increased to 15 seconds
-                        logging.info("Case page loaded successfully with networkidle state")
-                    except Exception as e:
-                        logging.warning(f"Timeout waiting for networkidle, but continuing: {str(e)}")
-                        # Still wait a few seconds to let the page load somewhat
-                        await page.wait_for_timeout(3000)
+                    with time_stage("case_page_load"):
+                        with run_trace.span("goto", kind="navigation", url=case_url):
+                            await page.goto(case_url)
+                        
+                        # Wait for case page to load and take screenshot - extended timeout
+                        try:
+                            with run_trace.span("wait_for_load_state", kind="wait", state="networkidle", timeout_ms=15000):
+                                await page.wait_for_load_state("networkidle", timeout=15000)  # Increased to 15 seconds
+                            logging.info("Case page loaded successfully with networkidle state")
+                        except Exception as e:
+                            logging.warning(f"Timeout waiting for networkidle, but continuing: {str(e)}")
+                            # Still wait a few seconds to let the page load somewhat
+                            with run_trace.span("wait_for_timeout", kind="sleep", ms=3000):
+                                await page.wait_for_timeout(3000)
                 
                 # Take a screenshot of the case page
-                await page.screenshot(path=os.path.join('debug', f'case_{case_id}.png'))
+                await capture_screenshot(page, f'case_{case_id}.png', case_id=case_id)
             else:
                 logging.error("Login failed or session expired, unable to access case page")
-                await browser.close()
+                await close_browser(browser, browser_trace, failed=True)
                 return False, "Login failed or session expired, unable to access case page"
             
             # No matter what happens with case extraction, we'll attempt to get some data
             try:
+                case_parse_timer = time_stage("case_parse")
+                case_parse_profile = profiler.start("case_parse")
                 # Extract page content for parsing
                 page_content = await page.content()
+                if case_parse_timer.span is not None:
+                    case_parse_timer.span.attrs["pageBytes"] = len(page_content)
                 
                 # Save page source for debugging
-                with open(os.path.join('debug', f'case_{case_id}.html'), 'w', encoding='utf-8') as f:
-                    f.write(page_content)
+                save_debug_html(f'case_{case_id}.html', page_content, case_id=case_id)
                 
                 soup = BeautifulSoup(page_content, 'html.parser')
                 
+                progress("case_page", "Reading case information")
+
                 # Initialize case data
                 case_data = {
                     "caseId": case_id,
@@ -827,7 +1292,7 @@ async def async_extract_case_data(case_id):
                 }
                 
                 # Take a screenshot of the current state
-                await page.screenshot(path=os.path.join('debug', f'case_extraction_start_{case_id}.png'))
+                await capture_screenshot(page, f'case_extraction_start_{case_id}.png', case_id=case_id)
                 
                 logging.info("Beginning case data extraction - this will proceed even with partial data")
             except Exception as e:
@@ -842,9 +1307,9 @@ async def async_extract_case_data(case_id):
                 }
             
             # Check if we already have a definitive client name from a previous extraction
-            if 'definitive_client_name' in session and session['definitive_client_name']:
-                logging.info(f"Using definitive client name from session: {session['definitive_client_name']}")
-                case_data["clientName"] = session['definitive_client_name']
+            if 'definitive_client_name' in state and state['definitive_client_name']:
+                logging.info(f"Using definitive client name from earlier run: {state['definitive_client_name']}")
+                case_data["clientName"] = state['definitive_client_name']
             
             # Extract client information using various selectors and patterns following server-upgradedv2.py
             logging.info("Extracting case information using multiple approaches")
@@ -871,7 +1336,7 @@ async def async_extract_case_data(case_id):
                             if text and not text.startswith("$"):
                                 case_data["clientName"] = text
                                 logging.info(f"Found client name using dt/dd next sibling: {text}")
-                                session['definitive_client_name'] = text
+                                state['definitive_client_name'] = text
                                 continue
                         
                         # If not found via next_sibling, try parent method
@@ -883,7 +1348,7 @@ async def async_extract_case_data(case_id):
                                 if text and not text.startswith("$"):
                                     case_data["clientName"] = text
                                     logging.info(f"Found client name using dt/dd parent method: {text}")
-                                    session['definitive_client_name'] = text
+                                    state['definitive_client_name'] = text
                     except Exception as e:
                         logging.error(f"Error finding client dd element: {str(e)}")
                 
@@ -932,7 +1397,7 @@ async def async_extract_case_data(case_id):
                                 if text and not text.startswith("$"):
                                     case_data["clientName"] = text
                                     logging.info(f"Found client name using col-auto pattern: {text}")
-                                    session['definitive_client_name'] = text
+                                    state['definitive_client_name'] = text
                                     break
                 
                 # Look for lien holder
@@ -1325,7 +1790,7 @@ async def async_extract_case_data(case_id):
                     # If client name found, set a flag to avoid overriding with incorrect values
                     if client_found:
                         # Save this as the definitive client name
-                        session['definitive_client_name'] = case_data["clientName"]
+                        state['definitive_client_name'] = case_data["clientName"]
                                     
                     # If still not found, try a more flexible approach but targeting the same structure
                     if case_data["clientName"] == "Not Found" or case_data["clientName"] == "Default Client":
@@ -1436,7 +1901,21 @@ async def async_extract_case_data(case_id):
                 case_data["repoType"] = "Involuntary Repo"
                 case_data["orderTo"] = "Involuntary Repo"
                 logging.info("Using default 'Involuntary Repo' as last resort fallback")
-            
+
+            # Client, lien holder and repo type are settled at this point, so start the
+            # database fee lookup in the background while the Updates tab is scraped
+            db_lookup_case = {
+                "caseId": case_id,
+                "clientName": case_data.get("clientName"),
+                "lienHolder": case_data.get("lienHolder"),
+                "repoType": case_data.get("repoType")
+            }
+            logging.info("Starting database fee lookup in background while updates are extracted")
+            db_future = asyncio.get_running_loop().run_in_executor(
+                # Run in a copy of this task's context so the lookup's span and log lines belong to this run
+                db_executor, contextvars.copy_context().run, traced_fee_lookup, db_lookup_case
+            )
+
             # Enhanced fee information extraction with more comprehensive analysis
             # Define the dollar pattern for matching
             dollar_pattern = r'\$(\d{1,3}(,\d{3})*(\.\d{2})?)'
@@ -1481,7 +1960,7 @@ async def async_extract_case_data(case_id):
                                 if dollar_amounts:
                                     amount_str = dollar_amounts[0]
                                     amount = float(dollar_amounts[0].replace('$', '').replace(',', ''))
-                                    logging.info(f"Found dollar amount in row: {amount_str}")
+                                    logging.debug("Found dollar amount in row: %s", amount_str)
                                     
                                     # Try to extract description
                                     description = ""
@@ -1668,178 +2147,201 @@ async def async_extract_case_data(case_id):
             
             logging.info(f"Found {len(case_data['fees'])} fees")
             
+            case_parse_timer.stop()
+            profiler.stop(case_parse_profile)
+            
             # Always try to return whatever data we've managed to extract, even if it's partial
             # Wrap the entire Updates tab section in a try-except
             updates = []
             try:
                 logging.info("Case information extraction complete, proceeding to Updates tab regardless of any missing data")
-                # First take a screenshot of the case page before clicking Updates tab
-                await page.screenshot(path=os.path.join('debug', f'before_updates_tab_{case_id}.png'))
+                progress("updates", "Reading updates")
+                with time_stage("updates_tab"):
+                    # First take a screenshot of the case page before clicking Updates tab
+                    await capture_screenshot(page, f'before_updates_tab_{case_id}.png', case_id=case_id)
                 
-                # Find and click on the "Updates" tab using approach from rdn_data_scraper.py
-                logging.info("Looking for Updates tab...")
-                try:
-                    # Try multiple methods to find the Updates tab
-                    updates_tab = await page.query_selector('a:has-text("Updates")')
-                    if updates_tab:
-                        await updates_tab.click()
-                        logging.info("Clicked on Updates tab using a:text selector")
-                    else:
-                        # Try alternate selector
-                        await page.click('text=Updates', exact=True)
-                        logging.info("Clicked on Updates tab using text=Updates selector")
-                except Exception as e:
-                    logging.warning(f"Error clicking Updates tab: {e}. Trying alternate methods...")
+                    # Find and click on the "Updates" tab using approach from rdn_data_scraper.py
+                    logging.info("Looking for Updates tab...")
                     try:
-                        # Try finding any tab/navigation elements
-                        nav_items = await page.query_selector_all('a.nav-link, a.tab-link, li.nav-item a')
-                        tab_clicked = False
-                        for item in nav_items:
-                            text = await item.inner_text()
-                            if "update" in text.lower():
-                                await item.click()
-                                logging.info(f"Clicked on tab with text: {text}")
-                                tab_clicked = True
-                                break
+                        # Try multiple methods to find the Updates tab
+                        updates_tab = await page.query_selector('a:has-text("Updates")')
+                        if updates_tab:
+                            await updates_tab.click()
+                            logging.info("Clicked on Updates tab using a:text selector")
+                        else:
+                            # Try alternate selector
+                            await page.click('text=Updates', exact=True)
+                            logging.info("Clicked on Updates tab using text=Updates selector")
+                    except Exception as e:
+                        logging.warning(f"Error clicking Updates tab: {e}. Trying alternate methods...")
+                        try:
+                            # Try finding any tab/navigation elements
+                            nav_items = await page.query_selector_all('a.nav-link, a.tab-link, li.nav-item a')
+                            tab_clicked = False
+                            for item in nav_items:
+                                text = await item.inner_text()
+                                if "update" in text.lower():
+                                    await item.click()
+                                    logging.info(f"Clicked on tab with text: {text}")
+                                    tab_clicked = True
+                                    break
                         
-                        if not tab_clicked:
-                            # List all available tabs for debugging
-                            all_tabs = await page.query_selector_all(".nav-link, .nav-item a, .tab, li a")
-                            logging.info(f"Found {len(all_tabs)} potential tabs to try")
+                            if not tab_clicked:
+                                # List all available tabs for debugging
+                                all_tabs = await page.query_selector_all(".nav-link, .nav-item a, .tab, li a")
+                                logging.info(f"Found {len(all_tabs)} potential tabs to try")
                             
-                            # Save all visible tabs to debug log
-                            tab_texts = []
-                            for i, tab in enumerate(all_tabs):
-                                try:
-                                    tab_text = await tab.text_content()
-                                    tab_texts.append(f"Tab {i}: '{tab_text}'")
+                                # Save all visible tabs to debug log
+                                tab_texts = []
+                                for i, tab in enumerate(all_tabs):
+                                    try:
+                                        tab_text = await tab.text_content()
+                                        tab_texts.append(f"Tab {i}: '{tab_text}'")
                                     
-                                    # Try clicking tabs that look like they might be updates
-                                    if tab_text and any(keyword in tab_text.lower() for keyword in ['update', 'history', 'activity', 'log']):
-                                        await tab.click()
-                                        tab_clicked = True
-                                        logging.info(f"Clicked tab with text: {tab_text}")
-                                        break
-                                except Exception as e:
-                                    logging.debug(f"Failed to process tab {i}: {str(e)}")
+                                        # Try clicking tabs that look like they might be updates
+                                        if tab_text and any(keyword in tab_text.lower() for keyword in ['update', 'history', 'activity', 'log']):
+                                            await tab.click()
+                                            tab_clicked = True
+                                            logging.info(f"Clicked tab with text: {tab_text}")
+                                            break
+                                    except Exception as e:
+                                        logging.debug(f"Failed to process tab {i}: {str(e)}")
                             
-                            logging.info(f"Available tabs: {', '.join(tab_texts)}")
+                                logging.info(f"Available tabs: {', '.join(tab_texts)}")
                             
-                            if not tab_clicked:
-                                logging.warning("Could not find Updates tab, will attempt to find update data on current page")
-                    except Exception as e2:
-                        logging.error(f"Failed to find Updates tab: {e2}")
+                                if not tab_clicked:
+                                    logging.warning("Could not find Updates tab, will attempt to find update data on current page")
+                        except Exception as e2:
+                            logging.error(f"Failed to find Updates tab: {e2}")
                 
-                except Exception as e:
-                    logging.warning(f"Error finding Updates tab: {str(e)}")
+                    except Exception as e:
+                        logging.warning(f"Error finding Updates tab: {str(e)}")
                 
-                # Wait for updates to load
-                try:
-                    await page.wait_for_load_state("networkidle", timeout=15000)  # Increased timeout
-                    logging.info("Updates tab content loaded successfully")
-                except Exception as e:
-                    logging.warning(f"Timeout waiting for networkidle in Updates tab, continuing anyway: {str(e)}")
-                    # Wait a reasonable time anyway
-                    await page.wait_for_timeout(3000)
-                await page.screenshot(path=os.path.join('debug', f'updates_tab_{case_id}.png'))
+                    # Wait for updates to load
+                    try:
+                        with run_trace.span("wait_for_load_state", kind="wait", state="networkidle", timeout_ms=15000):
+                            await page.wait_for_load_state("networkidle", timeout=15000)  # Increased timeout
+                        logging.info("Updates tab content loaded successfully")
+                    except Exception as e:
+                        logging.warning(f"Timeout waiting for networkidle in Updates tab, continuing anyway: {str(e)}")
+                        # Wait a reasonable time anyway
+                        with run_trace.span("wait_for_timeout", kind="sleep", ms=3000):
+                            await page.wait_for_timeout(3000)
+                    await capture_screenshot(page, f'updates_tab_{case_id}.png', case_id=case_id)
                 
-                # Store the current state in session for debugging
-                session['current_page'] = 'updates_tab'
+                # Record the current page for debugging
+                state['current_page'] = 'updates_tab'
                 
                 # Click on "ALL" in pagination if it exists - using approach from rdn_data_scraper.py
                 logging.info("Looking for the ALL pagination button...")
-                try:
-                    # Wait for the pagination to be visible first
-                    await page.wait_for_selector('nav[aria-label="Updates pagination"]', timeout=5000)
-                    
-                    # Use the exact selector from the provided HTML
-                    all_link = await page.query_selector('li.page-item a.page-link[data-page="ALL"]')
-                    if all_link:
-                        await all_link.click()
-                        logging.info("Clicked on 'ALL' pagination button")
-                        all_button_found = True
-                    else:
-                        # Try a more general selector
-                        all_link = await page.query_selector('a.page-link[data-page="ALL"]')
+                with time_stage("all_click") as all_click_timer:
+                    try:
+                        # Wait for the pagination to be visible first
+                        with run_trace.span("wait_for_selector", kind="selector", selector='nav[aria-label="Updates pagination"]', timeout_ms=5000):
+                            await page.wait_for_selector('nav[aria-label="Updates pagination"]', timeout=5000)
+                    
+                        # Use the exact selector from the provided HTML
+                        all_link = await page.query_selector('li.page-item a.page-link[data-page="ALL"]')
                         if all_link:
                             await all_link.click()
-                            logging.info("Clicked on 'ALL' pagination link (second method)")
+                            logging.info("Clicked on 'ALL' pagination button")
                             all_button_found = True
                         else:
-                            # Try by text content
-                            all_link = await page.query_selector('a.page-link:has-text("ALL")')
+                            # Try a more general selector
+                            all_link = await page.query_selector('a.page-link[data-page="ALL"]')
                             if all_link:
                                 await all_link.click()
-                                logging.info("Clicked on 'ALL' pagination link (text method)")
+                                logging.info("Clicked on 'ALL' pagination link (second method)")
                                 all_button_found = True
                             else:
-                                # Last attempt using a direct click
-                                await page.click('text=ALL', exact=True)
-                                logging.info("Clicked on 'ALL' text (fallback method)")
-                                all_button_found = True
+                                # Try by text content
+                                all_link = await page.query_selector('a.page-link:has-text("ALL")')
+                                if all_link:
+                                    await all_link.click()
+                                    logging.info("Clicked on 'ALL' pagination link (text method)")
+                                    all_button_found = True
+                                else:
+                                    # Last attempt using a direct click
+                                    await page.click('text=ALL', exact=True)
+                                    logging.info("Clicked on 'ALL' text (fallback method)")
+                                    all_button_found = True
                     
-                    # Wait for page to update after clicking ALL
-                    await page.wait_for_load_state('networkidle', timeout=15000)
-                    logging.info("Page loaded after clicking ALL")
+                        # Wait for page to update after clicking ALL
+                        with run_trace.span("wait_for_load_state", kind="wait", state='networkidle', timeout_ms=15000):
+                            await page.wait_for_load_state('networkidle', timeout=15000)
+                        logging.info("Page loaded after clicking ALL")
                     
-                    # Take screenshot after clicking ALL
-                    await page.screenshot(path=os.path.join('debug', f'after_all_button_click_{case_id}.png'))
+                        # Take screenshot after clicking ALL
+                        await capture_screenshot(page, f'after_all_button_click_{case_id}.png', case_id=case_id)
                     
-                    # After clicking ALL and page is loaded, we'll use the centralized extraction logic
-                    # We no longer need to perform extraction here as it's done in the main workflow
-                    logging.info("ALL pagination button clicked - extraction will be handled in main workflow")
+                        # After clicking ALL and page is loaded, we'll use the centralized extraction logic
+                        # We no longer need to perform extraction here as it's done in the main workflow
+                        logging.info("ALL pagination button clicked - extraction will be handled in main workflow")
                     
-                except Exception as e:
-                    logging.warning(f"'ALL' pagination link not found or not clickable: {e}")
-                    # Fall back to original approach
-                    logging.info("Falling back to original approach for 'All' button")
-                    all_button_found = False
-                    all_button_selectors = [
-                        "a:has-text('All')",
-                        "button:has-text('All')",
-                        ".pagination a:has-text('All')",
-                        ".page-item:has-text('All')",
-                        "li:has-text('All') a",
-                        "[data-page='all']",
-                        "a[href*='all']",
-                        ".show-all-button",
-                        ".view-all"
-                    ]
+                    except Exception as e:
+                        logging.warning(f"'ALL' pagination link not found or not clickable: {e}")
+                        # Fall back to original approach
+                        logging.info("Falling back to original approach for 'All' button")
+                        all_button_found = False
+                        all_button_selectors = [
+                            "a:has-text('All')",
+                            "button:has-text('All')",
+                            ".pagination a:has-text('All')",
+                            ".page-item:has-text('All')",
+                            "li:has-text('All') a",
+                            "[data-page='all']",
+                            "a[href*='all']",
+                            ".show-all-button",
+                            ".view-all"
+                        ]
                     
-                    for selector in all_button_selectors:
-                        try:
-                            all_button = await page.query_selector(selector)
-                            if all_button:
-                                logging.info(f"Found 'All' button with selector: {selector}")
-                                await page.screenshot(path=os.path.join('debug', f'before_all_button_click_{case_id}.png'))
+                        for selector in all_button_selectors:
+                            try:
+                                with run_trace.span("query_selector", kind="selector", selector=selector) as selector_span:
+                                    all_button = await page.query_selector(selector)
+                                    if selector_span is not None:
+                                        selector_span.attrs["found"] = all_button is not None
+                                if all_button:
+                                    logging.info(f"Found 'All' button with selector: {selector}")
+                                    await capture_screenshot(page, f'before_all_button_click_{case_id}.png', case_id=case_id)
                                 
-                                # Click the All button
-                                await all_button.click()
-                                logging.info("Clicked 'All' button")
+                                    # Click the All button
+                                    await all_button.click()
+                                    logging.info("Clicked 'All' button")
                                 
-                                # Wait for all updates to load
-                                try:
-                                    await page.wait_for_load_state("networkidle", timeout=20000)  # Longer timeout for all updates
-                                    logging.info("All updates loaded successfully")
-                                except Exception as e:
-                                    logging.warning(f"Timeout waiting for 'All' updates to load, continuing anyway: {str(e)}")
-                                    # Wait a longer time anyway since "All" could be a lot of data
-                                    await page.wait_for_timeout(5000)
+                                    # Wait for all updates to load
+                                    try:
+                                        with run_trace.span("wait_for_load_state", kind="wait", state="networkidle", timeout_ms=20000):
+                                            await page.wait_for_load_state("networkidle", timeout=20000)  # Longer timeout for all updates
+                                        logging.info("All updates loaded successfully")
+                                    except Exception as e:
+                                        logging.warning(f"Timeout waiting for 'All' updates to load, continuing anyway: {str(e)}")
+                                        # Wait a longer time anyway since "All" could be a lot of data
+                                        with run_trace.span("wait_for_timeout", kind="sleep", ms=5000):
+                                            await page.wait_for_timeout(5000)
                                 
-                                await page.screenshot(path=os.path.join('debug', f'after_all_button_click_{case_id}.png'))
-                                all_button_found = True
-                                break
-                        except Exception as e:
-                            logging.debug(f"Failed to interact with 'All' button using selector {selector}: {str(e)}")
+                                    await capture_screenshot(page, f'after_all_button_click_{case_id}.png', case_id=case_id)
+                                    all_button_found = True
+                                    break
+                            except Exception as e:
+                                logging.debug(f"Failed to interact with 'All' button using selector {selector}: {str(e)}")
                 
+                    all_click_timer.stop(failed=not all_button_found)
                 if all_button_found:
                     logging.info("Using 'All' view for update extraction")
                 
                 # Function to extract updates using the rdn_data_scraper approach for direct page element access
-                async def extract_dollar_records_with_playwright():
+                async def extract_dollar_records_with_playwright(stop_at=None):
                     """
                     This function implements the exact extraction logic from rdn_data_scraper.py
                     It directly extracts dollar records from the page using Playwright's query_selector_all
+
+                    Updates are listed newest first. If stop_at holds the fingerprint of the newest
+                    update seen on a previous run, the walk stops there and only newer sections are read.
+
+                    Returns:
+                        tuple: (dollar_records, updates, mark, reached_mark) where updates are the records
+                               converted (and classified) as they were read, and mark describes the newest update
                     """
                     logging.info("Starting dollar records extraction using rdn_data_scraper logic")
                     
@@ -1851,9 +2353,21 @@ async def async_extract_case_data(case_id):
                     # Find all update sections using dl elements (same as rdn_data_scraper.py)
                     logging.info("Collecting update data using direct page query...")
                     dl_elements = await page.query_selector_all("dl")
-                    logging.info(f"Found {len(dl_elements)} update sections")
+
+                    # Read every section's text in one round trip. Only real update sections are
+                    # read and fingerprinted; the case header <dl>s are identical on every run
+                    sections = await page.eval_on_selector_all("dl", update_marks.SECTIONS_SCRIPT)
+                    indices, mark, reached_mark = update_marks.plan_update_read(sections, stop_at=stop_at)
+                    update_count = sum(1 for section in sections if update_marks.is_update_section(section))
+                    logging.info(f"Found {update_count} update sections among {len(dl_elements)} dl elements")
+                    if reached_mark:
+                        logging.info(f"Reached known updates after {len(indices)} new sections, skipping the remaining {update_count - len(indices)}")
+                    elif stop_at:
+                        logging.info("Previous high-water mark not usable on this page, reading the full update history")
+                    dl_elements = [dl_elements[index] for index in indices if index < len(dl_elements)]
                     
                     dollar_records = []
+                    record_updates = []
                     
                     # Process each update section
                     for dl in dl_elements:
@@ -1927,14 +2441,18 @@ async def async_extract_case_data(case_id):
                                                 record[key] = value_text
                                 
                                 dollar_records.append(record)
-                                logging.info(f"Found record with dollar amount: {record.get('dollar_amount', 'unknown')}")
+                                logging.debug("Found record with dollar amount: %s", record.get('dollar_amount', 'unknown'))
+                                converted = dollar_record_to_updates(record)
+                                record_updates.extend(converted)
+                                for update in converted:
+                                    on_update(update)
                         
                         except Exception as e:
                             logging.error(f"Error processing a section: {e}")
                             continue
                     
                     logging.info(f"Extracted {len(dollar_records)} dollar records using direct page query")
-                    return dollar_records
+                    return dollar_records, record_updates, mark, reached_mark
                 
                 # Original implementation is commented out as we now use the rdn_data_scraper approach
                 # Function to extract updates from the current page (original implementation)
@@ -1944,11 +2462,10 @@ async def async_extract_case_data(case_id):
                     updates_content = await page.content()
                     
                     # Save the content to a debug file for this page
-                    with open(os.path.join('debug', f'updates_{case_id}_page{page_num}.html'), 'w', encoding='utf-8') as f:
-                        f.write(updates_content)
+                    save_debug_html(f'updates_{case_id}_page{page_num}.html', updates_content, case_id=case_id)
                     
                     # Take screenshot of the current page
-                    await page.screenshot(path=os.path.join('debug', f'updates_{case_id}_page{page_num}.png'))
+                    await capture_screenshot(page, f'updates_{case_id}_page{page_num}.png', case_id=case_id)
                     
                     # Add detailed information about the current state
                     current_url = page.url
@@ -1961,7 +2478,7 @@ async def async_extract_case_data(case_id):
                 # Simplified placeholder function that delegates to the new extraction method
                 async def extract_updates_from_page(page_num=1):
                     # Just take a screenshot for debugging
-                    await page.screenshot(path=os.path.join('debug', f'updates_{case_id}_page{page_num}.png'))
+                    await capture_screenshot(page, f'updates_{case_id}_page{page_num}.png', case_id=case_id)
                     logging.info(f"Using delegate to extract_dollar_records_with_playwright instead of page {page_num}")
                     
                     # Return empty list as we're now using extract_dollar_records_with_playwright
@@ -2192,7 +2709,7 @@ async def async_extract_case_data(case_id):
                                 if dollar_amounts:
                                     amount_str = dollar_amounts[0]
                                     amount = float(dollar_amounts[0].replace('$', '').replace(',', ''))
-                                    logging.info(f"Found dollar amount in amount column: {amount_str}")
+                                    logging.debug("Found dollar amount in amount column: %s", amount_str)
                                 else:
                                     # Try to find amount in details text
                                     details_text = row_data.get('details', '')
@@ -2200,7 +2717,7 @@ async def async_extract_case_data(case_id):
                                     if details_dollar_amounts:
                                         amount_str = details_dollar_amounts[0]
                                         amount = float(details_dollar_amounts[0].replace('$', '').replace(',', ''))
-                                        logging.info(f"Found dollar amount in details text: {amount_str}")
+                                        logging.debug("Found dollar amount in details text: %s", amount_str)
                                 
                                 # Only include updates with non-zero amounts
                                 if amount > 0:
@@ -2272,7 +2789,7 @@ async def async_extract_case_data(case_id):
                             if dollar_amounts:
                                 amount_str = dollar_amounts[0]
                                 amount = float(dollar_amounts[0].replace('$', '').replace(',', ''))
-                                logging.info(f"Found dollar amount: {amount_str}")
+                                logging.debug("Found dollar amount: %s", amount_str)
                             
                             # Only include updates with dollar amounts
                             if amount > 0:
@@ -2348,7 +2865,7 @@ async def async_extract_case_data(case_id):
                         if dollar_amounts:
                             amount_str = dollar_amounts[0]
                             amount = float(dollar_amounts[0].replace('$', '').replace(',', ''))
-                            logging.info(f"Found dollar amount: {amount_str}")
+                            logging.debug("Found dollar amount: %s", amount_str)
                         
                         # Only include updates with dollar amounts
                         if amount > 0:
@@ -2416,49 +2933,30 @@ async def async_extract_case_data(case_id):
                 logging.info("Using the extract_dollar_records_with_playwright function instead of pagination-based approach")
                 
                 # Extract dollar records using the new function
-                dollar_records = await extract_dollar_records_with_playwright()
-                
-                # Store the dollar records in session for future use
-                session['dollar_records'] = dollar_records
+                # In incremental mode, stop at the newest update seen on the previous run
+                # and merge the new records into the stored history
+                previous_mark = result_store.get(case_id, 'updates_hwm') if incremental else None
+                with time_stage("dollar_records"), profiler.profile("dollar_records"):
+                    dollar_records, updates, updates_hwm, reached_mark = await extract_dollar_records_with_playwright(
+                        stop_at=previous_mark["fingerprint"] if previous_mark else None
+                    )
+                if reached_mark:
+                    stored_records = result_store.get(case_id, 'dollar_records', [])
+                    logging.info(f"Merging {len(dollar_records)} new dollar records into {len(stored_records)} stored records")
+                    dollar_records = dollar_records + stored_records
+                    for record in stored_records:
+                        converted = dollar_record_to_updates(record)
+                        updates.extend(converted)
+                        for update in converted:
+                            on_update(update)
                 
                 # Save to JSON file just like rdn_data_scraper.py does
-                with open(os.path.join('debug', f'all_updates_{case_id}.json'), 'w') as f:
-                    json.dump(dollar_records, f, indent=4)
-                
-                logging.info(f"Saved {len(dollar_records)} dollar records to session and debug JSON file")
+                artifact_writer.write_json(os.path.join('debug', f'all_updates_{case_id}.json'), list(dollar_records), indent=4)
                 
-                # Convert dollar records to update format for backward compatibility
-                updates = []
-                for record in dollar_records:
-                    # Extract data from the record
-                    details = record.get("details", "")
-                    dollar_amounts = record.get("dollar_amount", [])
-                    
-                    # Only process records with dollar amounts
-                    if dollar_amounts:
-                        for amount_str in dollar_amounts:
-                            try:
-                                # Convert amount string to float
-                                amount = float(amount_str.replace('$', '').replace(',', ''))
-                                
-                                # Create update entry compatible with existing code
-                                update_entry = {
-                                    "date": record.get("update_date_time", "Unknown"),
-                                    "details": details,
-                                    "amount": amount,
-                                    "amountStr": amount_str,
-                                    "feeType": "Other",  # Default fee type
-                                    "feeTypeConfidence": 0.5,
-                                    "feeTypeColor": "#858796",  # Default color for "Other"
-                                    "status": "Active",
-                                    "source": "rdn_data_scraper"
-                                }
-                                
-                                updates.append(update_entry)
-                                logging.info(f"Added update entry with amount: {amount_str}")
-                            except Exception as e:
-                                logging.error(f"Error converting dollar amount '{amount_str}': {e}")
+                logging.info(f"Queued {len(dollar_records)} dollar records for the debug JSON file")
                 
+                # Records were converted to the update format (for backward compatibility) as they were
+                # read, so the streamed rows and the final result are the same classified entries
                 logging.info(f"Converted {len(updates)} dollar amounts to update format")
                 
                 # No need to process pagination as we're using the direct approach
@@ -2493,7 +2991,7 @@ async def async_extract_case_data(case_id):
                                 logging.info(f"Found pagination with selector: {selector}")
                                 
                                 # Take a screenshot of the pagination area
-                                await page.screenshot(path=os.path.join('debug', f'pagination_{case_id}.png'))
+                                await capture_screenshot(page, f'pagination_{case_id}.png', case_id=case_id)
                                 
                                 # Check if an 'All' link exists - we'll prioritize this approach
                                 all_link_selectors = [
@@ -2534,20 +3032,22 @@ async def async_extract_case_data(case_id):
                                                 logging.info(f"Found 'All' link with selector: {all_selector}. Clicking to view all records at once.")
                                                 
                                                 # Take screenshot before clicking
-                                                await page.screenshot(path=os.path.join('debug', f'before_all_click_{case_id}.png'))
+                                                await capture_screenshot(page, f'before_all_click_{case_id}.png', case_id=case_id)
                                                 
                                                 await all_link.click()
                                                 
                                                 # Wait for content to update
                                                 try:
-                                                    await page.wait_for_load_state("networkidle", timeout=15000)
+                                                    with run_trace.span("wait_for_load_state", kind="wait", state="networkidle", timeout_ms=15000):
+                                                        await page.wait_for_load_state("networkidle", timeout=15000)
                                                     logging.info("All view loaded successfully")
                                                 except Exception as e:
                                                     logging.warning(f"Timeout waiting for 'All' view, continuing anyway: {str(e)}")
-                                                    await page.wait_for_timeout(5000)  # Longer wait for All view
+                                                    with run_trace.span("wait_for_timeout", kind="sleep", ms=5000):
+                                                        await page.wait_for_timeout(5000)  # Longer wait for All view
                                                 
                                                 # Take screenshot of the All view
-                                                await page.screenshot(path=os.path.join('debug', f'all_view_after_click_{case_id}.png'))
+                                                await capture_screenshot(page, f'all_view_after_click_{case_id}.png', case_id=case_id)
                                                 
                                                 # Extract updates from this comprehensive page
                                                 all_updates = await extract_updates_from_page("all")
@@ -2626,12 +3126,14 @@ async def async_extract_case_data(case_id):
                                                     
                                                     # Wait for content to update
                                                     try:
-                                                        await page.wait_for_load_state("networkidle", timeout=10000)  # Increased timeout
+                                                        with run_trace.span("wait_for_load_state", kind="wait", state="networkidle", timeout_ms=10000):
+                                                            await page.wait_for_load_state("networkidle", timeout=10000)  # Increased timeout
                                                         logging.info(f"Pagination to page {page_num} successful")
                                                     except Exception as e:
                                                         logging.warning(f"Timeout waiting for networkidle during pagination, continuing anyway: {str(e)}")
                                                         # Wait a reasonable time anyway
-                                                        await page.wait_for_timeout(2000)
+                                                        with run_trace.span("wait_for_timeout", kind="sleep", ms=2000):
+                                                            await page.wait_for_timeout(2000)
                                                     
                                                     # Check if we landed on an "All" page after clicking
                                                     post_click_is_all = False
@@ -2653,7 +3155,7 @@ async def async_extract_case_data(case_id):
                                                     # Extract updates if this isn't an All page we've already processed
                                                     if not (post_click_is_all and is_all_processed):
                                                         # Take screenshot of the current page
-                                                        await page.screenshot(path=os.path.join('debug', f'page_{page_num}_{case_id}.png'))
+                                                        await capture_screenshot(page, f'page_{page_num}_{case_id}.png', case_id=case_id)
                                                         
                                                         # Extract updates from this page
                                                         page_updates = await extract_updates_from_page(page_num)
@@ -2700,12 +3202,14 @@ async def async_extract_case_data(case_id):
                                                         
                                                         # Wait for content to update
                                                         try:
-                                                            await page.wait_for_load_state("networkidle", timeout=10000)  # Increased timeout
+                                                            with run_trace.span("wait_for_load_state", kind="wait", state="networkidle", timeout_ms=10000):
+                                                                await page.wait_for_load_state("networkidle", timeout=10000)  # Increased timeout
                                                             logging.info(f"Navigation via Next button to page {page_num} successful")
                                                         except Exception as e:
                                                             logging.warning(f"Timeout waiting for networkidle during Next button pagination, continuing anyway: {str(e)}")
                                                             # Wait a reasonable time anyway
-                                                            await page.wait_for_timeout(2000)
+                                                            with run_trace.span("wait_for_timeout", kind="sleep", ms=2000):
+                                                                await page.wait_for_timeout(2000)
                                                         
                                                         # Check if we landed on an "All" page after clicking Next
                                                         post_next_is_all = False
@@ -2805,8 +3309,7 @@ async def async_extract_case_data(case_id):
                         logging.warning(f"Failed to sort updates by date: {str(e)}")
                     
                     # Save the full set of updates for debugging
-                    with open(os.path.join('debug', f'all_updates_{case_id}.json'), 'w', encoding='utf-8') as f:
-                        json.dump(updates, f, indent=2)
+                    artifact_writer.write_json(os.path.join('debug', f'all_updates_{case_id}.json'), list(updates))
                 
                 logging.info(f"Finished extracting updates. Total count: {len(updates)}")
                 
@@ -2814,8 +3317,9 @@ async def async_extract_case_data(case_id):
                 logging.exception(f"Error extracting updates: {str(e)}")
             
             # Return with successfully collected data, even if some portions failed
+            extraction_failed = case_data.get("clientName") == "Error extracting data" and case_data.get("lienHolder") == "Error extracting data"
             try:
-                await browser.close()
+                await close_browser(browser, browser_trace, failed=extraction_failed)
             except Exception as browser_close_error:
                 logging.error(f"Error closing browser: {str(browser_close_error)}")
             
@@ -2823,38 +3327,134 @@ async def async_extract_case_data(case_id):
             logging.info(f"Final updates count for return: {len(updates)}")
             if len(updates) == 0:
                 logging.warning("No updates found. This may be due to zero-filtering or extraction issues.")
-            
+
+            # Collect the database lookup that ran alongside the updates extraction
+            progress("database", "Waiting for fee lookup")
+            db_data, db_trace = await await_db_lookup(db_future)
+
             # Check for minimum viable data before considering it a success
             if case_data.get("clientName") != "Error extracting data" or case_data.get("lienHolder") != "Error extracting data":
                 # Make sure we always have at least the updates structure
                 if not updates:
                     logging.info("Creating empty updates structure to ensure UI gets updates data")
                     updates = []  # Ensure it's an empty list at minimum
-                
-                return True, {"case_data": case_data, "updates": updates}
+
+                return True, {"case_data": case_data, "updates": updates, "dollar_records": dollar_records if 'dollar_records' in locals() else [],
+                              "updates_hwm": updates_hwm if 'updates_hwm' in locals() else None,
+                              "db_data": db_data, "db_trace": db_trace}
             else:
                 # We have no useful data
                 return False, "Failed to extract any useful case data. Please try again."
             
         except Exception as e:
             logging.exception(f"Error extracting case data: {str(e)}")
+
+            # The case page parsing is timed and profiled without a with block; end it as failed
+            if 'case_parse_timer' in locals():
+                case_parse_timer.fail(e)
+                profiler.stop(case_parse_profile)
+            
+            # Capture the page as it was when the extraction failed
+            if 'page' in locals():
+                try:
+                    await capture_screenshot(page, f'extraction_error_{case_id}.png', case_id=case_id, error=True)
+                    await capture_html(page, f'extraction_error_{case_id}.html', case_id=case_id, error=True)
+                except Exception as capture_error:
+                    logging.warning(f"Could not capture failed page: {str(capture_error)}")
             
             # Always try to close the browser
             try:
-                await browser.close()
+                await close_browser(browser, browser_trace, failed=True)
             except Exception:
                 pass
+
+            # Settle a lookup that was already started, so its span and memory stage land in
+            # this run's trace before it is saved rather than after
+            db_data, db_trace = await await_db_lookup(db_future)
                 
             # Return partial data if we have any
             if 'case_data' in locals() and isinstance(case_data, dict) and len(case_data.get("fees", [])) > 0:
                 logging.warning("Returning partial data despite error")
-                return True, {"case_data": case_data, "updates": updates if 'updates' in locals() else []}
+                return True, {"case_data": case_data, "updates": updates if 'updates' in locals() else [],
+                              "dollar_records": dollar_records if 'dollar_records' in locals() else [],
+                              "updates_hwm": updates_hwm if 'updates_hwm' in locals() else None,
+                              "db_data": db_data, "db_trace": db_trace}
             else:
                 return False, f"Error extracting case data: {str(e)}"
 
+def connect_to_database():
+    """
+    Open a connection to the Azure SQL database using the first ODBC driver that works.
+    The working driver is remembered so later connections skip the driver search.
+    """
+    db_config = app_config['database']
+    
+    # Build connection string from config
+    server = db_config['server']
+    database = db_config['database']
+    username = db_config['username']
+    password = db_config['password']
+    connect_timeout = db_config.get('connect_timeout', 30)
+    
+    # Try several possible driver names, or only the one that worked last time
+    driver_names = [
+        "{ODBC Driver 18 for SQL Server}",
+        "{ODBC Driver 17 for SQL Server}",
+        "{SQL Server Native Client 11.0}",
+        "{SQL Server}",
+        "{FreeTDS}"
+    ]
+    if db_driver_cache['driver']:
+        driver_names = [db_driver_cache['driver']]
+    
+    last_error = None
+    for driver in driver_names:
+        conn_str = f"DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password};Encrypt=yes;TrustServerCertificate=yes;Connection Timeout={connect_timeout};"
+        try:
+            logging.info(f"Attempting connection with driver: {driver}")
+            conn = pyodbc.connect(conn_str)
+            if db_driver_cache['driver'] != driver:
+                logging.info(f"Successfully connected using driver: {driver}")
+                db_driver_cache['driver'] = driver
+            return conn
+        except Exception as driver_e:
+            last_error = driver_e
+            logging.warning(f"Failed to connect with driver {driver}: {str(driver_e)}")
+            # IM002 means the driver is not installed; anything else means the server itself
+            # could not be reached, and trying other drivers would just repeat the timeout
+            if 'IM002' not in str(driver_e):
+                break
+    
+    # Forget a cached driver that stopped working so the next attempt searches again
+    db_driver_cache['driver'] = None
+    raise last_error
+
+def get_db_connection():
+    """Open a database connection through the circuit breaker"""
+    return db_breaker.call(connect_to_database)
+
+def probe_database():
+    """Background probe used by the circuit breaker to detect when the database is back"""
+    conn = connect_to_database()
+    conn.close()
+
+# Circuit breaker around database access - trips after consecutive connection failures
+# and returns the default fee immediately until the background probe reaches the server
+circuit_config = app_config.get('circuit_breaker', {})
+db_breaker = CircuitBreaker(
+    'azure_sql',
+    failure_threshold=circuit_config.get('failure_threshold', 3),
+    probe=probe_database if pyodbc is not None else None,
+    probe_interval=circuit_config.get('probe_interval_seconds', 30)
+)
+
+# Fee rate storage selected by the "storage" section of config.json - Azure SQL by default,
+# or a local SQLite copy (optionally kept in sync with Azure as a read replica)
+fee_store = create_fee_store(app_config.get('storage', {}), get_db_connection, db_query_stats)
+
 def lookup_repo_fee(client_name, lienholder_name, fee_type_name):
     """
-    Lookup repo fee from database based on client name, lienholder name, and fee type.
+    Lookup repo fee from the configured fee store based on client name, lienholder name, and fee type.
     Based on the implementation from server-upgradedv2.py.
 
     Args:
@@ -2867,8 +3467,8 @@ def lookup_repo_fee(client_name, lienholder_name, fee_type_name):
     """
     logging.info(f'Looking up repo fee for: Client="{client_name}", Lienholder="{lienholder_name}", FeeType="{fee_type_name}"')
 
-    # Check if pyodbc is available
-    if pyodbc is None:
+    # Check if pyodbc is available when the rates live in Azure SQL
+    if pyodbc is None and fee_store.name == 'azure':
         logging.warning("Database functionality is disabled because pypyodbc module is not installed")
         # Return a mock result when database is not available
         return {
@@ -2881,281 +3481,39 @@ def lookup_repo_fee(client_name, lienholder_name, fee_type_name):
             'message': "Database functionality is disabled. Using default amount."
         }
 
-    # Make sure we're using the correct variable names
-    case_client_name = client_name
-    case_lienholder_name = lienholder_name
-    case_repo_type = fee_type_name
-    
-    # Get database config
     try:
-        db_config = app_config['database']
-        
-        # Build connection string from config
-        server = db_config['server']
-        database = db_config['database']
-        username = db_config['username']
-        password = db_config['password']
-        
-        # Build a proper pyodbc connection string specifically for Azure SQL Database
-        # Try several possible driver names that might exist on the system
-        driver_names = [
-            "{ODBC Driver 18 for SQL Server}",
-            "{ODBC Driver 17 for SQL Server}",
-            "{SQL Server Native Client 11.0}",
-            "{SQL Server}",
-            "{FreeTDS}"
-        ]
-        
-        # Default connection string in case all attempts fail
-        conn_str = None
-        
-        # Try connection with each driver
-        for driver in driver_names:
-            try:
-                test_conn_str = f"DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password};Encrypt=yes;TrustServerCertificate=yes;Connection Timeout=30;"
-                logging.info(f"Attempting connection with driver: {driver}")
-                pyodbc.connect(test_conn_str)
-                conn_str = test_conn_str
-                logging.info(f"Successfully connected using driver: {driver}")
-                break
-            except Exception as driver_e:
-                logging.warning(f"Failed to connect with driver {driver}: {str(driver_e)}")
-        
-        # If none of the drivers worked, use the last attempted connection string
-        if conn_str is None:
-            conn_str = f"DRIVER={{SQL Server}};SERVER={server};DATABASE={database};UID={username};PWD={password};"
-            logging.warning("All driver attempts failed. Using basic connection string as last resort.")
-            
-        # Log the final connection attempt
-        logging.info(f"Attempting final database connection to: {server}/{database}")
-        
-        # Connect to the database using the most appropriate connection string found
-        conn = pyodbc.connect(conn_str)
+        return fee_store.lookup_repo_fee(client_name, lienholder_name, fee_type_name)
+    except CircuitOpenError:
+        # The circuit breaker makes an unreachable server fail fast
+        logging.warning("Database circuit is open, returning default fee without contacting the server")
+        return {
+            'fd_id': f"MOCK-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}",
+            'client_name': client_name,
+            'lienholder_name': lienholder_name,
+            'fee_type': fee_type_name,
+            'amount': 350.00,
+            'is_fallback': True,
+            'message': "Database is currently unreachable. Using default amount."
+        }
     except Exception as e:
         logging.error(f"Could not connect to database: {str(e)}")
         return None
 
-    try:
-        cursor = conn.cursor()
-
-        # Step 1: Get foreign keys from names with enhanced diagnostics
-        logging.info("Getting foreign keys from names with enhanced diagnostics...")
-        
-        # Check the database structure first to ensure tables exist
-        try:
-            cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE='BASE TABLE'")
-            tables = cursor.fetchall()
-            table_names = [table[0] for table in tables]
-            logging.info(f"Database tables found: {', '.join(table_names[:10])}")
-            
-            # Check if our required tables exist
-            required_tables = ['RDN_Client', 'Lienholder', 'FeeType', 'FeeDetails2']
-            missing_tables = [table for table in required_tables if table not in table_names]
-            if missing_tables:
-                logging.error(f"Required tables missing: {', '.join(missing_tables)}")
-        except Exception as schema_e:
-            logging.warning(f"Could not check schema: {str(schema_e)}")
-        
-        # Get client ID - try exact match first, then partial match
-        try:
-            cursor.execute("SELECT TOP 1 id FROM dbo.RDN_Client WHERE client_name = ?", [case_client_name])
-            client_row = cursor.fetchone()
-            
-            if not client_row:
-                logging.warning(f"Client '{case_client_name}' not found with exact match, trying partial match...")
-                # Show sample clients for debugging
-                cursor.execute("SELECT TOP 5 id, client_name FROM dbo.RDN_Client")
-                sample_clients = cursor.fetchall()
-                if sample_clients:
-                    logging.info(f"Sample clients in database: {', '.join([c[1] for c in sample_clients])}")
-                
-                # Try partial match using keywords from client name
-                client_keywords = case_client_name.split()
-                if len(client_keywords) > 1:
-                    partial_name = f"%{client_keywords[0]}%{client_keywords[1]}%"
-                    cursor.execute("SELECT TOP 1 id, client_name FROM dbo.RDN_Client WHERE client_name LIKE ?", [partial_name])
-                    partial_match = cursor.fetchone()
-                    if partial_match:
-                        client_id = partial_match[0]
-                        logging.info(f"Found client via partial match: {partial_match[1]} (ID: {client_id})")
-                    else:
-                        logging.error(f"No client match found for '{case_client_name}', even with partial matching")
-                        return None
-                else:
-                    logging.error(f"Client name too short for effective partial matching: '{case_client_name}'")
-                    return None
-            else:
-                client_id = client_row[0]
-                logging.info(f"Found client via exact match (ID: {client_id})")
-        except Exception as client_e:
-            logging.error(f"Error during client lookup: {str(client_e)}")
-            return None
-
-        # Get lienholder ID - try exact match first, then partial match
-        try:
-            cursor.execute("SELECT TOP 1 id FROM dbo.Lienholder WHERE lienholder_name = ?", [case_lienholder_name])
-            lienholder_row = cursor.fetchone()
-            
-            if not lienholder_row:
-                logging.warning(f"Lienholder '{case_lienholder_name}' not found with exact match, trying partial match...")
-                # Show sample lienholders for debugging
-                cursor.execute("SELECT TOP 5 id, lienholder_name FROM dbo.Lienholder")
-                sample_lienholders = cursor.fetchall()
-                if sample_lienholders:
-                    logging.info(f"Sample lienholders in database: {', '.join([lh[1] for lh in sample_lienholders])}")
-                
-                # Try partial match using keywords from lienholder name
-                lienholder_keywords = case_lienholder_name.split()
-                if lienholder_keywords:
-                    partial_name = f"%{lienholder_keywords[0]}%"
-                    cursor.execute("SELECT TOP 1 id, lienholder_name FROM dbo.Lienholder WHERE lienholder_name LIKE ?", [partial_name])
-                    partial_match = cursor.fetchone()
-                    if partial_match:
-                        lienholder_id = partial_match[0]
-                        logging.info(f"Found lienholder via partial match: {partial_match[1]} (ID: {lienholder_id})")
-                    else:
-                        logging.warning(f"No lienholder match found for '{case_lienholder_name}', will use Standard fallback")
-                        lienholder_id = None  # We'll handle this in the fallback logic
-                else:
-                    logging.warning(f"Lienholder name too short for effective partial matching: '{case_lienholder_name}'")
-                    lienholder_id = None  # We'll handle this in the fallback logic
-            else:
-                lienholder_id = lienholder_row[0]
-                logging.info(f"Found lienholder via exact match (ID: {lienholder_id})")
-        except Exception as lienholder_e:
-            logging.error(f"Error during lienholder lookup: {str(lienholder_e)}")
-            lienholder_id = None  # We'll handle this in the fallback logic
-
-        # Get fee type ID - try exact match first, then partial match
-        try:
-            cursor.execute("SELECT TOP 1 id FROM dbo.FeeType WHERE fee_type_name = ?", [case_repo_type])
-            fee_type_row = cursor.fetchone()
-            
-            if not fee_type_row:
-                logging.warning(f"Fee type '{case_repo_type}' not found with exact match, trying partial match...")
-                # Show sample fee types for debugging
-                cursor.execute("SELECT TOP 5 id, fee_type_name FROM dbo.FeeType")
-                sample_fee_types = cursor.fetchall()
-                if sample_fee_types:
-                    logging.info(f"Sample fee types in database: {', '.join([ft[1] for ft in sample_fee_types])}")
-                
-                # Try partial match with keywords - 'Involuntary Repo' should match 'Involuntary' or 'Repo'
-                fee_keywords = case_repo_type.split()
-                if fee_keywords:
-                    partial_name = f"%{fee_keywords[0]}%"
-                    cursor.execute("SELECT TOP 1 id, fee_type_name FROM dbo.FeeType WHERE fee_type_name LIKE ?", [partial_name])
-                    partial_match = cursor.fetchone()
-                    if partial_match:
-                        fee_type_id = partial_match[0]
-                        logging.info(f"Found fee type via partial match: {partial_match[1]} (ID: {fee_type_id})")
-                    else:
-                        logging.error(f"No fee type match found for '{case_repo_type}', even with partial matching")
-                        return None
-                else:
-                    logging.error(f"Fee type name too short for effective partial matching: '{case_repo_type}'")
-                    return None
-            else:
-                fee_type_id = fee_type_row[0]
-                logging.info(f"Found fee type via exact match (ID: {fee_type_id})")
-        except Exception as fee_type_e:
-            logging.error(f"Error during fee type lookup: {str(fee_type_e)}")
-            return None
-
-        # Step 2: Check if a matching record exists and return it if found (primary logic)
-        if lienholder_id:
-            # Using parameterized query for safety
-            query = """
-                SELECT
-                    fd.fd_id,
-                    c.client_name,
-                    lh.lienholder_name,
-                    ft.fee_type_name,
-                    fd.amount
-                FROM dbo.FeeDetails2 fd
-                JOIN dbo.RDN_Client c ON fd.client_id = c.id
-                JOIN dbo.Lienholder lh ON fd.lh_id = lh.id
-                JOIN dbo.FeeType ft ON fd.ft_id = ft.id
-                WHERE fd.client_id = ? AND fd.lh_id = ? AND fd.ft_id = ?
-            """
-            logging.info(f"Executing primary lookup query with params: [{client_id}, {lienholder_id}, {fee_type_id}]")
-            cursor.execute(query, [client_id, lienholder_id, fee_type_id])
-            row = cursor.fetchone()
-
-            if row:
-                logging.info(f"Found matching fee record for specific lienholder '{case_lienholder_name}'")
-                return {
-                    'fd_id': row[0],
-                    'client_name': row[1],
-                    'lienholder_name': row[2],
-                    'fee_type': row[3],
-                    'amount': row[4],
-                    'is_fallback': False
-                }
-
-        # Step 3: If no record found, try with 'Standard' lienholder (fallback logic)
-        logging.info(f"No specific record found. Looking up 'Standard' lienholder as fallback...")
-        cursor.execute("SELECT TOP 1 id FROM dbo.Lienholder WHERE lienholder_name = ?", ['Standard'])
-        standard_row = cursor.fetchone()
-
-        if not standard_row:
-            logging.error("'Standard' lienholder not found in database")
-            return None
-
-        standard_lienholder_id = standard_row[0]
-
-        # Look up using Standard lienholder
-        fallback_query = """
-            SELECT
-                fd.fd_id,
-                c.client_name,
-                lh.lienholder_name,
-                ft.fee_type_name,
-                fd.amount
-            FROM dbo.FeeDetails2 fd
-            JOIN dbo.RDN_Client c ON fd.client_id = c.id
-            JOIN dbo.Lienholder lh ON fd.lh_id = lh.id
-            JOIN dbo.FeeType ft ON fd.ft_id = ft.id
-            WHERE fd.client_id = ? AND fd.lh_id = ? AND fd.ft_id = ?
-        """
-        logging.info(f"Executing fallback lookup query with params: [{client_id}, {standard_lienholder_id}, {fee_type_id}]")
-        cursor.execute(fallback_query, [client_id, standard_lienholder_id, fee_type_id])
-        fallback_row = cursor.fetchone()
-
-        if fallback_row:
-            logging.info(f"Found fallback fee using 'Standard' lienholder")
-            return {
-                'fd_id': fallback_row[0],
-                'client_name': fallback_row[1],
-                'lienholder_name': fallback_row[2] + " (Standard Fallback)",
-                'fee_type': fallback_row[3],
-                'amount': fallback_row[4],
-                'is_fallback': True,
-                'message': f"Lienholder '{case_lienholder_name}' specific fee not found. Using Standard amount."
-            }
-
-        logging.warning("No fee record found with either specific lienholder or fallback")
-        return None
-
-    except Exception as e:
-        logging.error(f"Error looking up repo fee: {str(e)}")
-        import traceback
-        logging.error(traceback.format_exc())
-        return None
-
-    finally:
-        if conn:
-            conn.close()
-
 @app.route('/api/query-database', methods=['GET'])
 def query_database():
     """Query Azure SQL database for fee information using config credentials"""
     logging.info("Database query request received")
-    if 'case_data' not in session:
+    case_data = load_result('case_data')
+    if case_data is None:
         logging.error("Case data not available")
         return jsonify({"success": False, "message": "Case data not available"})
-    
-    case_data = session.get('case_data')
-    
+
+    # Reuse the lookup that already ran during case extraction unless a refresh is requested
+    refresh = request.args.get('refresh', 'false').lower() == 'true'
+    if not refresh and 'db_data' in session and session.get('db_data_case_id') == case_data.get('caseId'):
+        logging.info("Returning database result already fetched during case extraction")
+        return jsonify({"success": True, "data": session.get('db_data')})
+
     try:
         # Get client information from case data
         client_name = case_data.get('clientName')
@@ -3201,6 +3559,7 @@ def query_database():
         
         # Store in session
         session['db_data'] = api_result
+        session['db_data_case_id'] = case_data.get('caseId')
         
         return jsonify({"success": True, "data": api_result})
         
@@ -3218,6 +3577,7 @@ def query_database():
         }
         
         session['db_data'] = mock_data
+        session['db_data_case_id'] = case_data.get('caseId')
         
         return jsonify({
             "success": True, 
@@ -3227,34 +3587,28 @@ def query_database():
 
 @app.route('/api/updates', methods=['GET'])
 def get_updates():
-    """Retrieve updates data from session"""
+    """Retrieve updates data from the result store"""
     logging.info("Updates data request received")
-    if 'updates' not in session:
+    updates = load_result('updates')
+    if updates is None:
         logging.error("Updates data not available")
         return jsonify({"success": False, "message": "Updates data not available"})
     
     # Return all updates - filtering will be handled in the frontend
     # This ensures we don't lose any data that might be needed
-    return jsonify({"success": True, "data": session.get('updates')})
+    return jsonify({"success": True, "data": updates})
 
-def auto_fetch_database_fees(case_data=None):
+def fetch_database_fee_data(case_data):
     """
-    Automatically fetch fee information from database using current case info
-    This function will be called after case information is extracted
-    
+    Look up the database fee for a case without touching the Flask session.
+    Safe to call from the db executor while the browser is still scraping.
+
     Args:
-        case_data (dict, optional): The case data containing client info. If None, uses session data.
-        
+        case_data (dict): The case data containing client, lien holder and repo type
+
     Returns:
-        dict: The database fee data, or None if not found
+        dict: The database fee data formatted for the frontend, or default data if not found
     """
-    # Get case data from session if not provided
-    if case_data is None:
-        if 'case_data' not in session:
-            logging.error("Case data not available for auto database fetch")
-            return None
-        case_data = session.get('case_data')
-    
     client_name = case_data.get('clientName')
     lienholder_name = case_data.get('lienHolder')
     repo_type = case_data.get('repoType', 'Involuntary Repo')
@@ -3288,16 +3642,13 @@ def auto_fetch_database_fees(case_data=None):
             # If there's a message, include it
             if 'message' in db_result:
                 api_result["message"] = db_result['message']
-                
-            # Store in session
-            session['db_data'] = api_result
             
             return api_result
         else:
             logging.warning("No matching fee data found in database")
             
             # Create mock data when no database match
-            mock_data = {
+            return {
                 "fdId": f"FD-{case_data.get('caseId', '0000')}",
                 "clientName": client_name,
                 "lienholderName": lienholder_name,
@@ -3307,17 +3658,12 @@ def auto_fetch_database_fees(case_data=None):
                 "message": "No matching database record found. Using default amount."
             }
             
-            # Store in session
-            session['db_data'] = mock_data
-            
-            return mock_data
-            
     except Exception as e:
         logging.error(f"Error in auto database fetch: {str(e)}")
         logging.error(traceback.format_exc())
         
         # Create mock data for exception cases
-        mock_data = {
+        return {
             "fdId": f"FD-{case_data.get('caseId', '0000')}",
             "clientName": client_name,
             "lienholderName": lienholder_name,
@@ -3326,17 +3672,40 @@ def auto_fetch_database_fees(case_data=None):
             "isFallback": True,
             "message": f"Database error: {str(e)}. Using default amount."
         }
+
+def auto_fetch_database_fees(case_data=None):
+    """
+    Automatically fetch fee information from database using current case info
+    This function will be called after case information is extracted
+    
+    Args:
+        case_data (dict, optional): The case data containing client info. If None, uses the stored case result.
         
-        # Store in session
-        session['db_data'] = mock_data
-        
-        return mock_data
+    Returns:
+        dict: The database fee data, or None if not found
+    """
+    # Get case data from the result store if not provided
+    if case_data is None:
+        case_data = load_result('case_data')
+        if case_data is None:
+            logging.error("Case data not available for auto database fetch")
+            return None
+    
+    db_data = fetch_database_fee_data(case_data)
+    
+    # Store in session
+    session['db_data'] = db_data
+    session['db_data_case_id'] = case_data.get('caseId')
+    
+    return db_data
 
 @app.route('/api/results', methods=['GET'])
 def get_results():
     """Retrieve all results data"""
     logging.info("Results request received")
-    if 'case_data' not in session or 'updates' not in session:
+    case_data = load_result('case_data')
+    updates = load_result('updates')
+    if case_data is None or updates is None:
         logging.error("Complete data not available")
         return jsonify({"success": False, "message": "Complete data not available"})
     
@@ -3348,20 +3717,16 @@ def get_results():
         db_data = session.get('db_data')
     
     # Include dollar records from rdn_data_scraper approach if available
-    dollar_records = session.get('dollar_records', [])
+    dollar_records = load_result('dollar_records', [])
     if dollar_records:
         logging.info(f"Including {len(dollar_records)} dollar records in results")
     
-    # Get case data and filter out fees with zero amounts
-    case_data = session.get('case_data', {})
+    # Filter out fees with zero amounts
     if "fees" in case_data:
-        case_data = case_data.copy()  # Create a copy to avoid modifying the session directly
         case_data["fees"] = [fee for fee in case_data["fees"] if fee.get('amount', 0) > 0]
         logging.info(f"Filtered case fees in results to exclude zero amounts. Remaining fees: {len(case_data['fees'])}")
     
     # Return all updates without filtering to ensure nothing is missing
-    updates = session.get('updates', [])
-    
     return jsonify({
         "success": True,
         "caseData": case_data,
@@ -3371,202 +3736,54 @@ def get_results():
     })
 
 @app.route('/api/export/excel', methods=['GET'])
+@profile_request("export_excel")
 def export_excel():
     """Generate Excel export of results"""
     logging.info("Excel export request received")
-    if 'case_data' not in session or 'db_data' not in session or 'updates' not in session:
+    case_data = load_result('case_data')
+    updates = load_result('updates')
+    if case_data is None or 'db_data' not in session or updates is None:
         logging.error("Complete data not available for export")
         return jsonify({"success": False, "message": "Complete data not available"})
     
-    # Get case data and filter out fees with zero amounts
-    case_data = session.get('case_data').copy()  # Create a copy to avoid modifying the session
+    # Filter out fees with zero amounts
     if "fees" in case_data:
         case_data["fees"] = [fee for fee in case_data["fees"] if fee.get('amount', 0) > 0]
         logging.info(f"Filtered case fees in export to exclude zero amounts. Remaining fees: {len(case_data['fees'])}")
     
     # Keep all updates to maintain consistency with the updates tab
-    updates = session.get('updates', [])
-    
     db_data = session.get('db_data')
     
     try:
-        # Create a file name
-        file_name = f"JamiBilling_Case_{case_data['caseId']}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        file_path = os.path.join('static', 'exports', file_name)
-        logging.info(f"Creating Excel export: {file_path}")
-        
-        # Create Excel workbook
-        workbook = openpyxl.Workbook()
-        
-        # Create summary sheet
-        summary_sheet = workbook.active
-        summary_sheet.title = "Summary"
-        
-        # Add headers
-        summary_sheet['A1'] = "Item"
-        summary_sheet['B1'] = "Value"
-        
-        # Add data
-        summary_data = [
-            ["Case ID", case_data['caseId']],
-            ["Client Name", case_data['clientName']],
-            ["Lien Holder", case_data['lienHolder']],
-            ["Order To", case_data['orderTo']],
-            ["", ""],
-            ["Database Information", ""],
-            ["Fee ID", db_data['fdId']],
-            ["Fee Type", db_data['feeTypeName']],
-            ["Amount", db_data['amount']],
-            ["", ""],
-            ["Total Fees", sum(fee['amount'] for fee in case_data['fees'])]
-        ]
-        
-        # Add rows to sheet
-        for i, row in enumerate(summary_data, 2):  # Start from row 2
-            summary_sheet[f'A{i}'] = row[0]
-            summary_sheet[f'B{i}'] = row[1]
-        
-        # Create enhanced fees sheet with all fee details
-        fees_sheet = workbook.create_sheet(title="Fees")
-        
-        # Add enhanced headers for more comprehensive fee data
-        fees_sheet['A1'] = "Description"
-        fees_sheet['B1'] = "Category"
-        fees_sheet['C1'] = "Amount"
-        fees_sheet['D1'] = "Status"
-        fees_sheet['E1'] = "Source"
-        fees_sheet['F1'] = "Confidence"
-        fees_sheet['G1'] = "Notes"
-        
-        # Add enhanced fee data with all available fields
-        for i, fee in enumerate(case_data['fees'], 2):  # Start from row 2
-            fees_sheet[f'A{i}'] = fee.get('description', '')
-            fees_sheet[f'B{i}'] = fee.get('category', '')
-            fees_sheet[f'C{i}'] = fee.get('amount', 0)
-            fees_sheet[f'D{i}'] = fee.get('status', '')
-            fees_sheet[f'E{i}'] = fee.get('source', '')
-            fees_sheet[f'F{i}'] = fee.get('confidence', '')
-            
-            # Compile any additional fee-specific data into notes
-            notes = []
-            if 'dailyRate' in fee:
-                notes.append(f"Daily Rate: {fee['dailyRate']}")
-            if 'storageDays' in fee:
-                notes.append(f"Storage Days: {fee['storageDays']}")
-            if 'vehicleYear' in fee and 'vehicleMake' in fee:
-                notes.append(f"Vehicle: {fee['vehicleYear']} {fee['vehicleMake']}")
-                
-            fees_sheet[f'G{i}'] = "; ".join(notes)
-        
-        # Apply formatting to make the sheet more readable
-        # Auto-adjust column widths to fit content
-        for col in ['A', 'B', 'D', 'E', 'G']:
-            max_length = 0
-            for cell in fees_sheet[col]:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)  # Cap at 50 characters
-            fees_sheet.column_dimensions[col].width = adjusted_width
-        
-        # Create an enhanced updates sheet with all available fields
-        updates_sheet = workbook.create_sheet(title="Updates")
-        
-        # Add enhanced headers
-        updates_sheet['A1'] = "Date"
-        updates_sheet['B1'] = "Details"
-        updates_sheet['C1'] = "Fee Type"
-        updates_sheet['D1'] = "Amount"
-        updates_sheet['E1'] = "Status"
-        updates_sheet['F1'] = "Confidence"
-        updates_sheet['G1'] = "Page"
-        updates_sheet['H1'] = "Additional Info"
-        
-        # Add enhanced update data with all available fields
-        for i, update in enumerate(updates, 2):  # Start from row 2
-            updates_sheet[f'A{i}'] = update.get('date', '')
-            updates_sheet[f'B{i}'] = update.get('details', '')
-            updates_sheet[f'C{i}'] = update.get('feeType', '')
-            updates_sheet[f'D{i}'] = update.get('amount', 0)
-            updates_sheet[f'E{i}'] = update.get('status', '')
-            updates_sheet[f'F{i}'] = update.get('feeTypeConfidence', '')
-            updates_sheet[f'G{i}'] = update.get('page', '')
-            
-            # Compile any additional data fields into notes
-            notes = []
-            if 'dailyRate' in update:
-                notes.append(f"Daily Rate: {update['dailyRate']}")
-            if 'storageDays' in update:
-                notes.append(f"Storage Days: {update['storageDays']}")
-            if 'vehicleYear' in update and 'vehicleMake' in update:
-                notes.append(f"Vehicle: {update['vehicleYear']} {update['vehicleMake']}")
-                
-            updates_sheet[f'H{i}'] = "; ".join(notes)
-        
-        # Apply formatting to make the sheet more readable
-        # Auto-adjust column widths
-        for col in ['A', 'B', 'C', 'E', 'H']:
-            max_length = 0
-            for cell in updates_sheet[col]:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)  # Cap at 50 characters
-            updates_sheet.column_dimensions[col].width = adjusted_width
-            
-        # Create a fee summary sheet to provide totals by fee category
-        summary_fees_sheet = workbook.create_sheet(title="Fee Summary")
-        
-        # Add headers
-        summary_fees_sheet['A1'] = "Fee Category"
-        summary_fees_sheet['B1'] = "Total Amount"
-        summary_fees_sheet['C1'] = "Count"
-        summary_fees_sheet['D1'] = "Details"
-        
-        # Group fees by category and calculate totals
-        fee_categories = {}
-        for fee in case_data['fees']:
-            category = fee.get('category', 'Unknown')
-            if category not in fee_categories:
-                fee_categories[category] = {
-                    'total': 0,
-                    'count': 0,
-                    'details': []
-                }
-            
-            fee_categories[category]['total'] += fee.get('amount', 0)
-            fee_categories[category]['count'] += 1
-            fee_categories[category]['details'].append(
-                f"{fee.get('description','')[:50]}... ({fee.get('amountStr', '')})"
-            )
-        
-        # Add fee category summary data
-        for i, (category, data) in enumerate(fee_categories.items(), 2):
-            summary_fees_sheet[f'A{i}'] = category
-            summary_fees_sheet[f'B{i}'] = data['total']
-            summary_fees_sheet[f'C{i}'] = data['count']
-            summary_fees_sheet[f'D{i}'] = "; ".join(data['details'][:3])  # Show top 3 fees
-            
-        # Format the summary sheet
-        for col in ['A', 'D']:
-            summary_fees_sheet.column_dimensions[col].width = 40
-        
-        # Save the Excel file
-        workbook.save(file_path)
-        logging.info("Excel file saved successfully")
+        # Identical data renders an identical workbook, so serve repeat downloads from the cache
+        file_name = f"JamiBilling_Case_{case_data['caseId']}.xlsx"
+        cache_key = fingerprint(case_data, db_data, updates)
+        content = workbook_cache.get(cache_key)
+        if content is None:
+            logging.info(f"Creating Excel export for case {case_data['caseId']}")
+            output = io.BytesIO()
+            with time_stage("export"):
+                write_case_workbook(output, case_data, db_data, updates)
+            metrics.EXPORTS.inc(format="xlsx")
+            content = output.getvalue()
+            workbook_cache.put(cache_key, content)
+        else:
+            logging.info(f"Serving cached Excel export for case {case_data['caseId']}")
         
-        # Return the file URL
-        file_url = f"/static/exports/{file_name}"
-        return jsonify({"success": True, "file_url": file_url})
+        response = send_file(
+            io.BytesIO(content),
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=file_name
+        )
+        response.set_etag(cache_key)
+        return response
         
     except Exception as e:
         logging.exception(f"Error generating Excel: {str(e)}")
         return jsonify({"success": False, "message": f"Error generating Excel: {str(e)}"})
 
+@timed_stage("classification")
 def identify_fee_type(text):
     """Identify fee type from text description"""
     if not text:
@@ -3640,35 +3857,74 @@ def view_debug_logs():
         return jsonify({"error": "Debug mode not enabled"}), 403
     
     try:
-        # Get list of debug files
+        offset = request.args.get('offset', 0, type=int)
+        limit = min(request.args.get('limit', 100, type=int), 1000)
+
+        # Page dumps and screenshots from the snapshot store
         debug_files = []
-        for filename in os.listdir('debug'):
-            if filename.endswith('.png') or filename.endswith('.html'):
-                file_path = os.path.join('debug', filename)
-                file_info = {
-                    'name': filename,
-                    'path': file_path,
-                    'size': os.path.getsize(file_path),
-                    'modified': datetime.datetime.fromtimestamp(os.path.getmtime(file_path)).strftime('%Y-%m-%d %H:%M:%S')
-                }
-                debug_files.append(file_info)
+        for snapshot in snapshot_store.list(case_id=request.args.get('case_id')):
+            debug_files.append({
+                'name': snapshot['name'],
+                'path': f"/debug-file/{snapshot['name']}",
+                'size': snapshot['size'],
+                'storedSize': snapshot['storedSize'],
+                'caseId': snapshot['caseId'],
+                'stage': snapshot['stage'],
+                'mtime': snapshot['createdAt']
+            })
+        stored_names = {f['name'] for f in debug_files}
+
+        # Loose files in debug/ (older dumps and JSON), from a cached directory scan
+        for debug_file in debug_file_listing.files():
+            if debug_file['name'] not in stored_names:
+                debug_files.append({
+                    'name': debug_file['name'],
+                    'path': os.path.join('debug', debug_file['name']),
+                    'size': debug_file['size'],
+                    'mtime': debug_file['mtime']
+                })
         
-        # Sort by modified date (newest first)
-        debug_files.sort(key=lambda x: x['modified'], reverse=True)
+        # Sort by modified date (newest first) and return the requested page
+        debug_files.sort(key=lambda x: x['mtime'], reverse=True)
+        page = debug_files[offset:offset + limit]
+        for debug_file in page:
+            debug_file['modified'] = datetime.datetime.fromtimestamp(debug_file.pop('mtime')).strftime('%Y-%m-%d %H:%M:%S')
         
-        # Get log file content
-        log_content = ""
-        if os.path.exists('jami_billing.log'):
-            with open('jami_billing.log', 'r') as f:
-                log_content = f.read()
+        # Only the end of the log; page through the rest with /api/logs
+        log_tail = log_viewer.tail(limit=max(1, min(request.args.get('log_lines', 200, type=int), 5000)))
+        log_content = "\n".join(
+            f"{entry['timestamp']} - {entry['logger']} - {entry['level']} - {entry['message']}"
+            for entry in log_tail['entries']
+        )
         
         return jsonify({
-            "debug_files": debug_files,
-            "log_content": log_content
+            "debug_files": page,
+            "total_files": len(debug_files),
+            "offset": offset,
+            "log_content": log_content,
+            "log_size": log_tail['size']
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/logs', methods=['GET'])
+def get_logs():
+    """Read application log entries by byte offset, or the last N, filtered by level and case ID"""
+    if not app.debug:
+        return jsonify({"error": "Debug mode not enabled"}), 403
+
+    level = request.args.get('level')
+    if level and level.upper() not in LOG_LEVELS:
+        return jsonify({"error": f"Unknown level '{level}'"}), 400
+    limit = max(1, min(request.args.get('limit', 200, type=int), 5000))
+    case_id = request.args.get('case_id')
+
+    if 'offset' in request.args:
+        result = log_viewer.page(offset=request.args.get('offset', 0, type=int), limit=limit, level=level, case_id=case_id)
+    else:
+        result = log_viewer.tail(limit=limit, level=level, case_id=case_id)
+    return jsonify({"success": True, **result})
+
 @app.route('/debug-file/<filename>', methods=['GET'])
 def get_debug_file(filename):
     """Get a specific debug file (only in development)"""
@@ -3678,6 +3934,20 @@ def get_debug_file(filename):
     try:
         # Ensure filename is safe and exists
         safe_filename = secure_filename(filename)
+
+        # Serve the latest capture from the snapshot store, falling back to older files on disk
+        content = snapshot_store.get(safe_filename)
+        if content is not None:
+            if filename.endswith('.png'):
+                mimetype = 'image/png'
+            elif filename.endswith('.jpg'):
+                mimetype = 'image/jpeg'
+            elif filename.endswith('.html'):
+                mimetype = 'text/html'
+            else:
+                mimetype = 'text/plain'
+            return send_file(io.BytesIO(content), mimetype=mimetype, download_name=safe_filename)
+
         file_path = os.path.join('debug', safe_filename)
         
         if not os.path.exists(file_path):
@@ -3693,25 +3963,247 @@ def get_debug_file(filename):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/debug-trace/<filename>', methods=['GET'])
+def get_debug_trace(filename):
+    """Download a saved Playwright trace (only in development)"""
+    if not app.debug:
+        return jsonify({"error": "Debug mode not enabled"}), 403
+
+    safe_filename = secure_filename(filename)
+    file_path = os.path.join(browser_tracer.directory, safe_filename)
+    if not safe_filename.endswith('.zip') or not os.path.exists(file_path):
+        return jsonify({"error": "Trace not found"}), 404
+    return send_file(file_path, mimetype='application/zip', as_attachment=True, download_name=safe_filename)
+
 @app.route('/healthcheck', methods=['GET'])
 def healthcheck():
     """Simple health check endpoint"""
     return jsonify({
         "status": "ok",
         "version": "1.0",
-        "timestamp": datetime.datetime.now().isoformat()
+        "timestamp": datetime.datetime.now().isoformat(),
+        "database": db_breaker.status(),
+        "storage": fee_store.status(),
+        "results": result_store.status(),
+        "snapshots": snapshot_store.status(),
+        "debugCapture": capture_policy.status(),
+        "playwrightTracing": browser_tracer.status(),
+        "profiling": profiler.status(),
+        "memoryProfile": memory_profiler.status(),
+        "artifacts": artifact_writer.status(),
+        "retention": retention_manager.status(),
+        "exportCache": workbook_cache.status(),
+        "traces": trace_store.status()
+    })
+
+@app.route('/api/db-stats', methods=['GET'])
+def db_stats():
+    """Aggregated per-statement timings, slow queries and the current case's DB trace"""
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({
+        "success": True,
+        "report": db_query_stats.report(limit=limit),
+        "caseTrace": load_result('db_trace')
     })
 
+@app.route('/api/traces/slowest', methods=['GET'])
+def slowest_traces():
+    """The slowest extraction runs over the last `hours` hours, optionally only those with a given status"""
+    limit = request.args.get('limit', 20, type=int)
+    hours = request.args.get('hours', 24, type=float)
+    status = request.args.get('status')
+    return jsonify({
+        "success": True,
+        "runs": trace_store.slowest(limit=limit, since_seconds=hours * 3600, status=status)
+    })
+
+@app.route('/api/traces/<run_id>', methods=['GET'])
+def trace_waterfall(run_id):
+    """The span waterfall of one extraction run"""
+    run = trace_store.waterfall(run_id)
+    if run is None:
+        return jsonify({"success": False, "message": f"No trace stored for run {run_id}"}), 404
+    return jsonify({"success": True, "run": run})
+
+@app.route('/api/memory', methods=['GET'])
+def memory_report():
+    """Memory profiler state: per-stage reports of recent runs, the RSS trend and the largest live allocation sites"""
+    if not memory_profiler.enabled:
+        return jsonify({"success": False, "message": "Memory profiling is not enabled (set JAMI_MEMORY_PROFILE=on)"}), 404
+    return jsonify({
+        "success": True,
+        **memory_profiler.status(history=True),
+        "topSites": memory_profiler.top_sites(limit=request.args.get('top', 20, type=int))
+    })
+
+# Component state read when /metrics is scraped
+metrics.REGISTRY.callback("jami_jobs_in_flight", "Queued or running background jobs",
+                          lambda: [({}, job_manager.in_flight())])
+metrics.REGISTRY.callback("jami_job_workers", "Background job worker threads",
+                          lambda: [({}, jobs_config.get('workers', 2))])
+metrics.REGISTRY.callback("jami_db_lookup_workers", "Database lookup thread pool size",
+                          lambda: [({}, db_lookup_workers)])
+metrics.REGISTRY.callback("jami_db_circuit_open", "1 while the database circuit breaker is open",
+                          lambda: [({}, 1 if db_breaker.status()["state"] == "open" else 0)])
+metrics.REGISTRY.callback("jami_workbook_cache_lookups_total", "Excel workbook cache lookups by outcome",
+                          lambda: [({"result": "hit"}, workbook_cache.hits), ({"result": "miss"}, workbook_cache.misses)],
+                          type="counter", labels=["result"])
+metrics.REGISTRY.callback("jami_workbook_cache_bytes", "Bytes held by the Excel workbook cache",
+                          lambda: [({}, workbook_cache.status()["bytes"])])
+metrics.REGISTRY.callback("jami_artifact_queue_pending", "Debug artifact writes waiting for the writer thread",
+                          lambda: [({}, artifact_writer.status()["pending"])])
+metrics.REGISTRY.callback("jami_artifacts_dropped_total", "Debug artifact writes dropped because the queue was full",
+                          lambda: [({}, artifact_writer.status()["dropped"])], type="counter")
+metrics.REGISTRY.callback("jami_process_resident_memory_bytes", "Resident set size of the app process",
+                          lambda: [({}, rss) for rss in [memory_profile.process_rss()] if rss is not None])
+metrics.REGISTRY.callback("jami_retention_reclaimed_bytes_total", "Bytes removed by retention sweeps",
+                          lambda: [({}, retention_manager.status()["bytesReclaimed"])], type="counter")
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Pipeline stage histograms, counters and component gauges in the Prometheus text format"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def stored_cases(case_ids, missing):
+    """Yield (case_data, db_data, updates) for each stored case, recording IDs without a result"""
+    for case_id in case_ids:
+        case_data = result_store.get(case_id, 'case_data')
+        if case_data is None:
+            missing.append(case_id)
+            continue
+        meta = result_store.get(case_id, 'meta') or {}
+        yield case_data, meta.get('db_data'), result_store.get(case_id, 'updates', [])
+
+async def run_batch_export(case_ids, file_name, progress):
+    """Write the consolidated workbook for a batch of stored case results"""
+    file_path = os.path.join('static', 'exports', file_name)
+    logging.info(f"Creating batch Excel export for {len(case_ids)} cases: {file_path}")
+    missing = []
+    with time_stage("export"):
+        written = write_batch_workbook(
+            file_path,
+            stored_cases(case_ids, missing),
+            on_case=lambda index, case_id: progress("export", f"Wrote case {case_id}", round(100 * index / len(case_ids)))
+        )
+    metrics.EXPORTS.inc(format="xlsx_batch")
+    if missing:
+        logging.warning(f"No stored result for cases: {', '.join(missing)}")
+    return {"success": True, "file_url": f"/static/exports/{file_name}", "cases": written, "missing": missing}, {}
+
+@app.route('/api/export/batch', methods=['POST'])
+def export_batch():
+    """Start a background job writing one workbook for a batch of previously extracted cases"""
+    logging.info("Batch Excel export request received")
+    if 'username' not in session:
+        logging.error("Not logged in")
+        return jsonify({"success": False, "message": "Not logged in"})
+
+    case_ids = [str(case_id).strip() for case_id in (request.get_json(silent=True) or {}).get('caseIds', []) if str(case_id).strip()]
+    if not case_ids:
+        return jsonify({"success": False, "message": "No case IDs given"})
+
+    file_name = f"JamiBilling_Batch_{len(case_ids)}_cases_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    job = job_manager.submit(
+        f"batch of {len(case_ids)}",
+        lambda job: run_batch_export(case_ids, file_name, job.progress),
+        artifacts=[os.path.join('static', 'exports', file_name)]
+    )
+    remember_job(job)
+    return jsonify({"success": True, "jobId": job.id, "job": job.to_dict()}), 202
+
+COLUMNAR_MIMETYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+@app.route('/api/export/<any(csv, parquet):fmt>', methods=['GET'])
+def export_columnar(fmt):
+    """Download one table (cases, fees or updates) of the current case as CSV or Parquet"""
+    table = request.args.get('table', 'updates')
+    if table not in columnar_export.TABLES:
+        return jsonify({"success": False, "message": f"Unknown table '{table}'"}), 400
+    case_data = load_result('case_data')
+    if case_data is None:
+        return jsonify({"success": False, "message": "Complete data not available"})
+
+    try:
+        with time_stage("export"):
+            content = columnar_export.render_table(
+                case_data['caseId'], case_data, load_result('meta'), load_result('updates', []), table, fmt
+            )
+    except RuntimeError as e:
+        logging.error(f"{fmt} export unavailable: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 501
+    metrics.EXPORTS.inc(format=fmt)
+    return send_file(
+        io.BytesIO(content),
+        mimetype=COLUMNAR_MIMETYPES[fmt],
+        as_attachment=True,
+        download_name=f"JamiBilling_Case_{case_data['caseId']}_{table}.{fmt}"
+    )
+
+async def run_columnar_export(case_ids, out_dir, fmt, partition_by, progress):
+    """Write CSV or Parquet tables for a batch of stored case results"""
+    logging.info(f"Creating {fmt} export for {len(case_ids)} cases: {out_dir}")
+    with time_stage("export"):
+        result = columnar_export.export_cases(
+            result_store,
+            case_ids,
+            out_dir,
+            fmt=fmt,
+            partition_by=partition_by,
+            chunk_size=app_config.get('exports', {}).get('columnar_chunk_size', 50),
+            on_chunk=lambda done, total: progress("export", f"Wrote {done} of {total} cases", round(100 * done / total))
+        )
+    metrics.EXPORTS.inc(format=f"{fmt}_batch")
+    if result["missing"]:
+        logging.warning(f"No stored result for cases: {', '.join(result['missing'])}")
+    return {
+        "success": True,
+        "files": ["/" + os.path.relpath(path).replace(os.sep, "/") for path in result["files"]],
+        "cases": result["cases"],
+        "missing": result["missing"]
+    }, {}
+
+@app.route('/api/export/columnar', methods=['POST'])
+def export_columnar_batch():
+    """Start a background job writing CSV or Parquet tables for a batch of previously extracted cases"""
+    logging.info("Columnar export request received")
+    if 'username' not in session:
+        logging.error("Not logged in")
+        return jsonify({"success": False, "message": "Not logged in"})
+
+    data = request.get_json(silent=True) or {}
+    fmt = data.get('format', 'parquet')
+    partition_by = data.get('partitionBy', [])
+    if fmt not in columnar_export.FORMATS:
+        return jsonify({"success": False, "message": f"Unknown format '{fmt}'"}), 400
+    if set(partition_by) - set(columnar_export.PARTITION_KEYS):
+        return jsonify({"success": False, "message": "partitionBy may only contain 'client' and 'date'"}), 400
+    if data.get('all'):
+        case_ids = result_store.result_ids()
+    else:
+        case_ids = [str(case_id).strip() for case_id in data.get('caseIds', []) if str(case_id).strip()]
+    if not case_ids:
+        return jsonify({"success": False, "message": "No case IDs given"})
+
+    out_dir = os.path.join('static', 'exports', 'columnar', f"{fmt}_{len(case_ids)}_cases_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    job = job_manager.submit(
+        f"{fmt} export of {len(case_ids)}",
+        lambda job: run_columnar_export(case_ids, out_dir, fmt, partition_by, job.progress),
+        artifacts=[out_dir]
+    )
+    remember_job(job)
+    return jsonify({"success": True, "jobId": job.id, "job": job.to_dict()}), 202
+
 @app.route('/api/dollar-records', methods=['GET'])
 def get_dollar_records():
     """Retrieve dollar records extracted using the rdn_data_scraper approach"""
     logging.info("Dollar records request received")
-    if 'dollar_records' not in session:
+    dollar_records = load_result('dollar_records')
+    if dollar_records is None:
         logging.error("Dollar records not available")
         return jsonify({"success": False, "message": "Dollar records not available"})
     
     # Return all dollar records
-    return jsonify({"success": True, "data": session.get('dollar_records')})
+    return jsonify({"success": True, "data": dollar_records})
 
 if __name__ == '__main__':
     # Create necessary directories
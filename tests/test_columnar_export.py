@@ -0,0 +1,29 @@
+"""
+Tests for the partitioned columnar export
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("pandas")
+
+import columnar_export
+
+
+def test_case_without_client_name_goes_to_the_unknown_partition(tmp_path):
+    rows = columnar_export.case_rows('1', {'caseId': '1', 'fees': []}, {'extractedAt': 0}, [])
+    writer = columnar_export.ColumnarWriter(str(tmp_path), 'csv', ('client',))
+
+    writer.write('cases', columnar_export.to_frame('cases', rows['cases']))
+
+    assert os.path.exists(os.path.join(str(tmp_path), 'cases', 'client=unknown', 'part-0000.csv'))
+
+
+def test_client_names_are_slugged_into_partition_directories(tmp_path):
+    rows = columnar_export.case_rows('2', {'caseId': '2', 'clientName': 'Acme Bank, N.A.', 'fees': []}, {'extractedAt': 0}, [])
+    writer = columnar_export.ColumnarWriter(str(tmp_path), 'csv', ('client',))
+
+    writer.write('cases', columnar_export.to_frame('cases', rows['cases']))
+
+    assert os.path.exists(os.path.join(str(tmp_path), 'cases', 'client=Acme_Bank_N_A', 'part-0000.csv'))
@@ -0,0 +1,38 @@
+"""
+Tests for paged and tailed reads of the application log
+"""
+
+import log_viewer
+
+
+def write_log(tmp_path, count):
+    path = tmp_path / "app.log"
+    path.write_text("".join(f"2025-05-06 10:29:{index:02d},000 - root - INFO - line {index}\n" for index in range(count)))
+    return log_viewer.LogViewer(str(path), index_path=str(tmp_path / "app.log.index"))
+
+
+def test_pages_follow_on_until_the_end(tmp_path):
+    viewer = write_log(tmp_path, 5)
+
+    first = viewer.page(offset=0, limit=3)
+    rest = viewer.page(offset=first["nextOffset"], limit=3)
+
+    assert [entry["message"] for entry in first["entries"] + rest["entries"]] == [f"line {index}" for index in range(5)]
+    assert rest["nextOffset"] is None
+
+
+def test_empty_page_has_no_next_offset(tmp_path):
+    viewer = write_log(tmp_path, 5)
+
+    result = viewer.page(offset=0, limit=0)
+
+    assert result["entries"] == []
+    assert result["nextOffset"] is None
+
+
+def test_tail_with_a_non_positive_limit_is_empty(tmp_path):
+    viewer = write_log(tmp_path, 5)
+
+    assert viewer.tail(limit=2)["entries"][0]["message"] == "line 3"
+    assert viewer.tail(limit=0)["entries"] == []
+    assert viewer.tail(limit=-2)["entries"] == []
@@ -0,0 +1,111 @@
+"""
+Regression tests for the incremental Updates tab high-water mark, run against saved page dumps
+
+The dumps live in tests/fixtures rather than debug/, which retention sweeps on every app start.
+"""
+
+import os
+import html.parser
+
+import pytest
+
+import update_marks
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+class SectionParser(html.parser.HTMLParser):
+    """Collects each top-level <dl> as the sections dict the browser script returns"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.sections = []
+        self._depth = 0
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip += 1
+        if tag == 'dl':
+            if self._depth == 0:
+                self.sections.append({"text": "", "isUpdate": False})
+            self._depth += 1
+        if self._depth and 'update-text-black' in (dict(attrs).get('class') or '').split():
+            self.sections[-1]["isUpdate"] = True
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style') and self._skip:
+            self._skip -= 1
+        if tag == 'dl' and self._depth:
+            self._depth -= 1
+
+    def handle_data(self, data):
+        if self._depth and not self._skip:
+            self.sections[-1]["text"] += " " + data
+
+
+def load_sections(name):
+    path = os.path.join(FIXTURES_DIR, name)
+    parser = SectionParser()
+    with open(path, encoding='utf-8', errors='replace') as f:
+        parser.feed(f.read())
+    for section in parser.sections:
+        section["isUpdate"] = section["isUpdate"] or bool(update_marks.UPDATE_TIME_PATTERN.search(
+            update_marks.normalize_text(section["text"])))
+    return parser.sections
+
+
+@pytest.mark.parametrize("name, first_update, newest_time", [
+    ("page_before_pagination.html", 5, "05/06/2025 10:29 AM"),
+    ("case_2168698538.html", 12, "05/06/2025 10:29 AM"),
+])
+def test_mark_is_taken_from_the_newest_update_not_the_case_header(name, first_update, newest_time):
+    sections = load_sections(name)
+    indices, mark, reached = update_marks.plan_update_read(sections)
+
+    assert indices[0] == first_update
+    assert all(section["isUpdate"] for section in (sections[index] for index in indices))
+    assert mark["updateDateTime"] == newest_time
+    assert not reached
+
+
+def test_unchanged_page_reads_no_sections_on_the_next_run():
+    sections = load_sections("page_before_pagination.html")
+    _, mark, _ = update_marks.plan_update_read(sections)
+
+    indices, next_mark, reached = update_marks.plan_update_read(sections, stop_at=mark["fingerprint"])
+    assert indices == []
+    assert reached
+    assert next_mark == mark
+
+
+def test_new_update_is_read_and_older_ones_come_from_the_store():
+    sections = load_sections("page_before_pagination.html")
+    previous_run = [section for index, section in enumerate(sections) if index != 5]
+    _, previous_mark, _ = update_marks.plan_update_read(previous_run)
+
+    indices, mark, reached = update_marks.plan_update_read(sections, stop_at=previous_mark["fingerprint"])
+    assert indices == [5]
+    assert reached
+    assert mark["fingerprint"] != previous_mark["fingerprint"]
+
+
+def test_mark_taken_from_the_case_header_forces_a_full_read():
+    sections = load_sections("page_before_pagination.html")
+    header_mark = update_marks.fingerprint(update_marks.normalize_text(sections[0]["text"]))
+
+    indices, mark, reached = update_marks.plan_update_read(sections, stop_at=header_mark)
+    assert indices == [5, 6, 7, 8, 9]
+    assert not reached
+    assert mark["updateDateTime"] is not None
+
+
+def test_updates_not_listed_newest_first_are_read_in_full():
+    sections = load_sections("page_before_pagination.html")
+    reordered = sections[:5] + sections[5:][::-1]
+    _, newest_first_mark, _ = update_marks.plan_update_read(sections)
+
+    indices, mark, reached = update_marks.plan_update_read(reordered, stop_at=newest_first_mark["fingerprint"])
+    assert indices == [5, 6, 7, 8, 9]
+    assert not reached
+    assert mark == newest_first_mark
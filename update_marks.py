@@ -0,0 +1,79 @@
+"""
+Update Marks - Finds the update sections of an RDN Updates tab and the incremental high-water mark
+
+The page holds many <dl> sections, and only some of them are updates: the case header (client
+phone, debtor, vehicle), addresses and LPR hits are <dl>s too and never change between runs.
+Only sections with an "Update(d) Date/Time" field or an .update-text-black details block count
+as updates. The high-water mark is the newest of them, and a previous mark is only used to stop
+early when the updates are confirmed to be listed newest first.
+"""
+
+import re
+import datetime
+
+from result_store import fingerprint
+
+UPDATE_TIME_PATTERN = re.compile(r'Updated? Date/Time\s*(\d{1,2}/\d{1,2}/\d{4}\s+\d{1,2}:\d{2}\s*[AP]M)', re.IGNORECASE)
+
+# Reads every <dl> in one round trip: its text and whether it looks like an update section
+SECTIONS_SCRIPT = """els => els.map(e => ({
+    text: e.innerText,
+    isUpdate: /Updated? Date\\/Time/i.test(e.innerText) || !!e.querySelector('.update-text-black')
+}))"""
+
+
+def normalize_text(text):
+    return ' '.join((text or '').split())
+
+
+def update_time(text):
+    """Return (raw text, datetime) of a section's update date/time, or (None, None)"""
+    match = UPDATE_TIME_PATTERN.search(normalize_text(text))
+    if not match:
+        return None, None
+    raw = match.group(1)
+    try:
+        return raw, datetime.datetime.strptime(raw, '%m/%d/%Y %I:%M %p')
+    except ValueError:
+        return raw, None
+
+
+def is_update_section(section):
+    return bool(section.get("isUpdate")) or UPDATE_TIME_PATTERN.search(normalize_text(section.get("text"))) is not None
+
+
+def plan_update_read(sections, stop_at=None):
+    """
+    Decide which <dl> sections to read
+
+    Args:
+        sections (list): One dict per <dl> in page order, with text and isUpdate
+        stop_at (str): Fingerprint of the newest update seen on a previous run
+
+    Returns:
+        tuple: (indices of the sections to read, mark of the newest update or None,
+                whether the previous mark was reached so the rest can be taken from the store)
+    """
+    updates = []
+    for index, section in enumerate(sections):
+        if is_update_section(section):
+            raw, parsed = update_time(section.get("text"))
+            updates.append((index, fingerprint(normalize_text(section.get("text"))), raw, parsed))
+    if not updates:
+        return [], None, False
+
+    times = [parsed for _, _, _, parsed in updates if parsed is not None]
+    newest_first = all(earlier >= later for earlier, later in zip(times, times[1:]))
+    if newest_first:
+        newest = updates[0]
+    else:
+        # Fall back to the latest timestamp; undated sections sort last
+        newest = max(updates, key=lambda update: update[3] or datetime.datetime.min)
+    mark = {"fingerprint": newest[1], "updateDateTime": newest[2]}
+
+    indices = [index for index, _, _, _ in updates]
+    if stop_at and newest_first:
+        fingerprints = [update[1] for update in updates]
+        if stop_at in fingerprints:
+            return indices[:fingerprints.index(stop_at)], mark, True
+    return indices, mark, False